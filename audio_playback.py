@@ -0,0 +1,209 @@
+"""
+Preview audio output for the video player.
+
+Audio is decoded ahead through the video's decoder (its read_audio) into a
+bounded buffer and played through a sounddevice output stream. The stream
+callback counts the frames handed to the device and the device's reported
+output latency, which makes the audio the playback master clock: the video
+player asks position() which frame should be on screen and drops or repeats
+frames to follow it.
+"""
+
+import collections
+import threading
+
+class AudioPlayback:
+    def __init__(self, sample_rate=48000, channels=2, block_size=512, buffer_seconds=2.0):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_size = block_size
+        self.max_buffered = int(buffer_seconds * sample_rate)
+
+        self.decoder = None
+        self._stream = None
+        self._reader = None
+        self._generation = 0
+        # Position the reader should restart decoding at, set by seek() and picked up off the Tk thread
+        self._restart_at = None
+        self._closed = False
+
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+        self._chunks = collections.deque()
+        self._chunk_offset = 0
+        self._buffered = 0
+        self._eof = False
+
+        # Clock state, updated from the audio callback
+        self._start_position = 0.0
+        self._frames_played = 0
+        self._callback_time = None
+        self._callback_frames = 0
+        self._output_delay = 0.0
+        self._paused = True
+
+    @staticmethod
+    def available():
+        """Whether an audio output device can be used."""
+        try:
+            import sounddevice
+            sounddevice.query_devices(kind="output")
+            return True
+        except Exception:
+            return False
+
+    def open(self, decoder):
+        """Prepare playback of the audio track of the file `decoder` has open."""
+        import sounddevice as sd
+
+        self.close()
+        self.decoder = decoder
+        self._closed = False
+        self._stream = sd.OutputStream(
+            samplerate=self.sample_rate, channels=self.channels, dtype="float32",
+            blocksize=self.block_size, latency="low", callback=self._callback
+        )
+        self._stream.start()
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def close(self):
+        """Stop playback and release the device."""
+        with self._lock:
+            self._closed = True
+            self._generation += 1
+            self._space.notify_all()
+        if self._reader:
+            self._reader.join(timeout=1)
+            self._reader = None
+        if self._stream:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        self.decoder = None
+
+    def play(self, position):
+        """Start (or restart) audio at `position` seconds."""
+        self.seek(position)
+        with self._lock:
+            self._paused = False
+
+    def pause(self):
+        with self._lock:
+            self._paused = True
+            self._callback_time = None
+
+    def seek(self, position):
+        """
+        Restart decoding at `position`; output resumes as soon as the first
+        block arrives. Only hands the position to the reader thread, which
+        stops the old decode and starts the new one, so it returns at once.
+        """
+        if not self.decoder:
+            return
+        with self._lock:
+            self._chunks.clear()
+            self._chunk_offset = 0
+            self._buffered = 0
+            self._eof = False
+            self._start_position = max(0.0, position)
+            self._frames_played = 0
+            self._callback_time = None
+            self._generation += 1
+            self._restart_at = max(0.0, position)
+            self._space.notify_all()
+
+    def position(self):
+        """Current audible position in seconds, or None before any audio has been output."""
+        with self._lock:
+            if self._callback_time is None or self._stream is None:
+                if self._frames_played == 0:
+                    return None
+                return self._start_position + self._frames_played / self.sample_rate
+            # Frames handed to the device before the latest callback, plus time elapsed since,
+            # minus the time the latest buffer still needs to reach the speaker
+            elapsed = self._stream.time - self._callback_time - self._output_delay
+            elapsed = min(elapsed, self._callback_frames / self.sample_rate)
+            played = self._frames_played - self._callback_frames
+            return max(self._start_position, self._start_position + played / self.sample_rate + elapsed)
+
+    def _read_loop(self):
+        """
+        Decode ahead until the buffer is full, then wait for the callback to
+        drain it. A seek bumps the generation; the decode in progress is then
+        dropped and closed here, on the thread that reads from it.
+        """
+        chunks = None
+        generation = None
+        try:
+            while True:
+                with self._lock:
+                    while not self._closed and self._restart_at is None and chunks is None:
+                        self._space.wait()
+                    if self._closed:
+                        return
+                    position = self._restart_at
+                    self._restart_at = None
+                    if position is not None:
+                        generation = self._generation
+                if position is not None:
+                    if chunks is not None:
+                        chunks.close()
+                    chunks = self.decoder.read_audio(position, sample_rate=self.sample_rate, channels=self.channels,
+                                                     chunk_frames=self.block_size * 8)
+
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    chunk = None
+                except Exception as e:
+                    print(f"Preview audio decode failed: {e}")
+                    chunk = None
+                if chunk is None:
+                    chunks.close()
+                    chunks = None
+                    with self._lock:
+                        if generation == self._generation:
+                            self._eof = True
+                    continue
+
+                with self._lock:
+                    while (self._buffered >= self.max_buffered and generation == self._generation
+                           and not self._closed):
+                        self._space.wait(0.1)
+                    # After a seek the chunk belongs to the old position; the next pass restarts
+                    if generation == self._generation:
+                        self._chunks.append(chunk)
+                        self._buffered += len(chunk)
+        finally:
+            if chunks is not None:
+                chunks.close()
+
+    def _callback(self, outdata, frames, time_info, status):
+        """sounddevice callback: copy buffered audio out and advance the clock."""
+        written = 0
+        with self._lock:
+            if not self._paused:
+                while written < frames and self._chunks:
+                    chunk = self._chunks[0]
+                    available = len(chunk) - self._chunk_offset
+                    count = min(available, frames - written)
+                    outdata[written:written + count] = chunk[self._chunk_offset:self._chunk_offset + count]
+                    written += count
+                    self._chunk_offset += count
+                    if self._chunk_offset >= len(chunk):
+                        self._chunks.popleft()
+                        self._chunk_offset = 0
+                self._buffered -= written
+                if written:
+                    self._frames_played += written
+                    self._callback_frames = written
+                    self._callback_time = time_info.currentTime
+                    self._output_delay = max(0.0, time_info.outputBufferDacTime - time_info.currentTime)
+                self._space.notify_all()
+        outdata[written:] = 0
+
+    @property
+    def finished(self):
+        with self._lock:
+            return self._eof and not self._chunks
@@ -1,25 +1,43 @@
 import os
-import requests
-import numpy as np
 import re
 import tempfile
+import threading
+from perf_trace import tracer
 
-# Try to import audio libraries, handle gracefully if not available
-try:
-    import sounddevice as sd
-    import scipy.io.wavfile as wavfile
-    AUDIO_AVAILABLE = True
-except (ImportError, OSError) as e:
-    AUDIO_AVAILABLE = False
-    print(f"Audio recording not available: {e}")
-    # Create dummy modules to prevent import errors
-    class DummyModule:
-        def __getattr__(self, name):
-            def dummy_func(*args, **kwargs):
-                raise RuntimeError("Audio recording is not available on this system")
-            return dummy_func
-    sd = DummyModule()
-    wavfile = DummyModule()
+# Audio libraries are imported on first use (see probe_audio) so that loading
+# this module does not pull in sounddevice/scipy or probe audio backends.
+AUDIO_AVAILABLE = None  # None until probe_audio() has run
+sd = None
+wavfile = None
+_probe_lock = threading.Lock()
+
+class DummyModule:
+    """Stand-in for audio modules that could not be imported."""
+    def __getattr__(self, name):
+        def dummy_func(*args, **kwargs):
+            raise RuntimeError("Audio recording is not available on this system")
+        return dummy_func
+
+def probe_audio():
+    """Import the audio libraries once and return whether recording is available."""
+    global AUDIO_AVAILABLE, sd, wavfile
+    
+    with _probe_lock:
+        if AUDIO_AVAILABLE is None:
+            try:
+                import sounddevice as _sd
+                import scipy.io.wavfile as _wavfile
+                sd = _sd
+                wavfile = _wavfile
+                AUDIO_AVAILABLE = True
+            except (ImportError, OSError) as e:
+                print(f"Audio recording not available: {e}")
+                # Create dummy modules to prevent import errors
+                sd = DummyModule()
+                wavfile = DummyModule()
+                AUDIO_AVAILABLE = False
+    
+    return AUDIO_AVAILABLE
 
 class AudioProcessor:
     def __init__(self):
@@ -35,6 +53,10 @@ class AudioProcessor:
         if not token:
             return False
         
+        import numpy as np
+        import requests
+        probe_audio()
+        
         headers = {"Authorization": f"Bearer {token}"}
         
         # Create a small test audio file
@@ -70,11 +92,14 @@ class AudioProcessor:
     
     def record_audio(self, duration=5, samplerate=16000):
         """Record audio for the specified duration and save as WAV."""
-        if not AUDIO_AVAILABLE:
+        import numpy as np
+        
+        if not probe_audio():
             raise RuntimeError("Audio recording is not available on this system")
         
-        recording = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=1, dtype=np.float32)
-        sd.wait()  # Wait for recording to complete
+        with tracer.span("audio.record", "audio"):
+            recording = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=1, dtype=np.float32)
+            sd.wait()  # Wait for recording to complete
         
         # Create temporary file
         temp_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
@@ -87,12 +112,15 @@ class AudioProcessor:
         if not self.api_token:
             raise Exception("API token not set")
         
+        import requests
+        
         headers = {"Authorization": f"Bearer {self.api_token}"}
         
         with open(audio_file, "rb") as f:
             data = f.read()
         
-        response = requests.post(self.api_url, headers=headers, data=data, timeout=60)
+        with tracer.span("audio.transcribe_http", "audio"):
+            response = requests.post(self.api_url, headers=headers, data=data, timeout=60)
         
         if response.status_code != 200:
             raise Exception(f"API request failed with status {response.status_code}: {response.text}")
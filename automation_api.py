@@ -0,0 +1,392 @@
+"""
+Local automation API for a running editor.
+
+Serves JSON over HTTP on localhost so scripts can load videos, seek, set
+markers and submit cut jobs without going through the Tk dialogs. Job and
+player events are streamed as Server-Sent Events from GET /events.
+
+Endpoints:
+    GET    /status              current video, position and markers
+    POST   /load      {"path"}  load a video into the player
+    POST   /seek      {"position"}
+    POST   /markers   {"start", "end"}
+    POST   /jobs      {"start", "end", "output", "input"?, "loudness"?}  queue a cut job
+                                (loudness: integrated LUFS to normalize to)
+    GET    /jobs                list jobs
+    GET    /jobs/<id>           job details
+    DELETE /jobs/<id>           cancel a job
+    GET    /events              event stream (text/event-stream)
+    GET    /memory              memory budget and usage per subsystem
+
+Every request needs an `Authorization: Bearer <token>` header. The token
+is VIDEO_EDITOR_API_TOKEN, or a random one generated at start and shown in
+the editor's log. Requests must be addressed to a loopback Host and must
+not carry an Origin header, so web pages cannot reach the API (directly or
+through DNS rebinding), and POST bodies must be application/json. Job
+outputs are confined to the export directory (VIDEO_EDITOR_EXPORT_DIR,
+default ~/.video_editor/exports); relative output paths are taken from it.
+"""
+
+import hmac
+import http.server
+import itertools
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from utils import user_data_path
+
+LOOPBACK_HOSTS = {"127.0.0.1", "localhost", "::1"}
+
+class JobCancelled(Exception):
+    pass
+
+class EventHub:
+    """Fan-out of events to any number of stream subscribers."""
+
+    def __init__(self, max_queued=1000):
+        self.max_queued = max_queued
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.max_queued)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        message = (event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # A slow client loses events rather than stalling the editor
+                pass
+
+class Job:
+    def __init__(self, job_id, input_video, start_time, end_time, output_path, loudness_target=None):
+        self.id = job_id
+        self.input_video = input_video
+        self.start_time = start_time
+        self.end_time = end_time
+        self.output_path = output_path
+        self.loudness_target = loudness_target
+        self.status = "queued"
+        self.progress = 0.0
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.cancel_requested = False
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "input": self.input_video,
+            "start": self.start_time,
+            "end": self.end_time,
+            "output": self.output_path,
+            "loudness": self.loudness_target,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+class JobManager:
+    """Queue of cut jobs executed by a small pool of worker threads."""
+
+    def __init__(self, processor_factory, events, workers=2, max_finished=1000):
+        self.processor_factory = processor_factory
+        self.events = events
+        self.max_finished = max_finished
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        for _ in range(workers):
+            threading.Thread(target=self._worker_loop, daemon=True).start()
+
+    def submit(self, input_video, start_time, end_time, output_path, loudness_target=None):
+        if start_time < 0 or end_time <= start_time:
+            raise ValueError("Start time must be less than end time")
+        if not os.path.exists(input_video):
+            raise ValueError(f"Input file not found: {input_video}")
+
+        with self._lock:
+            job = Job(next(self._ids), input_video, start_time, end_time, output_path, loudness_target)
+            self.jobs[job.id] = job
+            self._prune()
+        self._queue.put(job)
+        self.events.publish("job", job.to_dict())
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a job. Queued jobs never start; running jobs stop at the next encoded frame."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return None
+            if job.status in ("queued", "running"):
+                job.cancel_requested = True
+                if job.status == "queued":
+                    self._finish(job, "cancelled")
+        return job
+
+    def list(self):
+        with self._lock:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def _prune(self):
+        # Forget the oldest finished jobs so long-running instances stay bounded
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job.id]
+
+    def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.finished = time.time()
+        self.events.publish("job", job.to_dict())
+
+    def _worker_loop(self):
+        processor = None
+        while True:
+            job = self._queue.get()
+            # Checked and set under the lock so a cancel cannot slip in between
+            with self._lock:
+                if job.cancel_requested:
+                    continue
+                job.status = "running"
+            self.events.publish("job", job.to_dict())
+            if processor is None:
+                # Created on the first job so starting the API loads nothing heavy
+                processor = self.processor_factory()
+            last_reported = [0.0]
+
+            def progress_callback(progress):
+                if job.cancel_requested:
+                    raise JobCancelled()
+                job.progress = progress
+                # Throttle the event stream to whole-percent steps
+                if progress - last_reported[0] >= 0.01 or progress >= 1.0:
+                    last_reported[0] = progress
+                    self.events.publish("progress", {"id": job.id, "progress": progress})
+
+            # Each worker has its own processor, so the job's target cannot leak into another job
+            processor.loudness_target = job.loudness_target
+            try:
+                processor.edit_video(job.input_video, job.start_time, job.end_time,
+                                     job.output_path, progress_callback)
+                self._finish(job, "done")
+            except Exception as e:
+                if job.cancel_requested:
+                    if os.path.exists(job.output_path):
+                        os.remove(job.output_path)
+                    self._finish(job, "cancelled")
+                else:
+                    self._finish(job, "failed", str(e))
+
+class AutomationRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def _authorized(self):
+        """Reject requests from browsers (Origin or a non-loopback Host) and without the token."""
+        host = self.headers.get("Host", "")
+        hostname = host[1:].partition("]")[0] if host.startswith("[") else host.rpartition(":")[0] or host
+        if hostname not in LOOPBACK_HOSTS or self.headers.get("Origin") is not None:
+            self._reply(403, {"error": "Forbidden"})
+            return False
+        expected = f"Bearer {self.server.api.token}".encode()
+        if not hmac.compare_digest(self.headers.get("Authorization", "").encode(), expected):
+            self._reply(401, {"error": "Unauthorized"})
+            return False
+        return True
+
+    def _job_id(self):
+        try:
+            return int(self.path.rstrip("/").split("/")[-1])
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        api = self.server.api
+        if self.path == "/status":
+            self._reply(200, api.call_ui(api.gui.get_automation_status))
+        elif self.path == "/jobs":
+            self._reply(200, {"jobs": api.jobs.list()})
+        elif self.path.startswith("/jobs/"):
+            job = api.jobs.jobs.get(self._job_id())
+            if job:
+                self._reply(200, job.to_dict())
+            else:
+                self._reply(404, {"error": "Job not found"})
+        elif self.path == "/events":
+            self._stream_events()
+        elif self.path == "/memory":
+            from memory_governor import governor
+            self._reply(200, governor.usage())
+        else:
+            self._reply(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._reply(415, {"error": "Content-Type must be application/json"})
+            return
+        api = self.server.api
+        gui = api.gui
+        try:
+            data = self._read_json()
+            if self.path in ("/load", "/seek", "/markers"):
+                if self.path == "/load":
+                    api.call_ui(gui.load_video_file, data["path"])
+                elif self.path == "/seek":
+                    api.call_ui(gui.video_player.seek, float(data["position"]))
+                else:
+                    api.call_ui(gui.set_markers, data.get("start"), data.get("end"))
+                status = api.call_ui(gui.get_automation_status)
+                api.events.publish("player", status)
+                self._reply(200, status)
+            elif self.path == "/jobs":
+                status = api.call_ui(gui.get_automation_status)
+                input_video = data.get("input") or status["video"]
+                if not input_video:
+                    raise ValueError("No input video given and none loaded")
+                start = float(data.get("start", status["start"]))
+                end = float(data.get("end", status["end"]))
+                loudness = data.get("loudness")
+                job = api.jobs.submit(input_video, start, end, api.export_path(data["output"]),
+                                      None if loudness is None else float(loudness))
+                self._reply(201, job.to_dict())
+            else:
+                self._reply(404, {"error": "Not found"})
+        except (KeyError, TypeError, ValueError) as e:
+            self._reply(400, {"error": f"Bad request: {e}"})
+        except Exception as e:
+            self._reply(500, {"error": str(e)})
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        if self.path.startswith("/jobs/"):
+            job = self.server.api.jobs.cancel(self._job_id())
+            if job:
+                self._reply(200, job.to_dict())
+                return
+        self._reply(404, {"error": "Job not found"})
+
+    def _stream_events(self):
+        events = self.server.api.events
+        subscriber = events.subscribe()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=15)
+                    self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+                except queue.Empty:
+                    # Keep-alive comment so idle connections are not dropped
+                    self.wfile.write(b": ping\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            events.unsubscribe(subscriber)
+
+    def log_message(self, format, *args):
+        pass
+
+class AutomationServer:
+    def __init__(self, gui, port=8770, token=None, job_workers=2, export_dir=None):
+        self.gui = gui
+        self.port = port
+        # Without a configured token, a random one is shown in the editor's log
+        self.token = token or secrets.token_urlsafe(24)
+        self.export_dir = os.path.realpath(
+            export_dir or os.getenv("VIDEO_EDITOR_EXPORT_DIR") or user_data_path("exports"))
+        self.events = EventHub()
+        self.jobs = JobManager(self._create_processor, self.events, job_workers)
+
+        self._server = None
+
+    def _create_processor(self):
+        from video_processor import VideoProcessor
+        return VideoProcessor(render_workers=self.gui.video_processor.render_workers)
+
+    def export_path(self, output):
+        """Resolve a job's output path, which must lie inside the export directory."""
+        if not isinstance(output, str) or not output.strip():
+            raise ValueError("Output path is required")
+        path = os.path.realpath(os.path.join(self.export_dir, os.path.expanduser(output)))
+        if os.path.commonpath([path, self.export_dir]) != self.export_dir or path == self.export_dir:
+            raise ValueError(f"Output must be inside the export directory {self.export_dir}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def call_ui(self, func, *args, timeout=10):
+        """Run func on the Tk thread and wait for its result."""
+        done = threading.Event()
+        result = {}
+
+        def run():
+            try:
+                result["value"] = func(*args)
+            except Exception as e:
+                result["error"] = e
+            finally:
+                done.set()
+
+        self.gui.ui_bus.call_soon(run)
+        if not done.wait(timeout):
+            raise Exception("Timed out waiting for the editor")
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
+
+    def start(self):
+        """Start serving on localhost in a background thread."""
+        # Bound to loopback only; the API is not meant to be reachable remotely
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", self.port), AutomationRequestHandler)
+        self._server.daemon_threads = True
+        self._server.api = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.port
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the Video Editor GUI.
+
+Generates synthetic test videos with ffmpeg, then measures video loading,
+seeking, decoding, frame rendering, exporting and the voice command
+pipeline. Results are written as JSON and can be compared against a
+previous run to catch regressions. Runs without a display.
+
+Usage:
+    python benchmark.py --output results.json
+    python benchmark.py --quick --baseline results.json
+"""
+
+import argparse
+import contextlib
+import http.server
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from unittest import mock
+from utils import find_ffmpeg
+
+# Synthetic fixtures: (name, width, height, fps, gop, duration, audio)
+# An fps of "vfr" produces variable frame timing by dropping frames.
+FIXTURES = [
+    ("240p_30fps_gop12_audio", 320, 240, 30, 12, 10, True),
+    ("720p_30fps_gop30_audio", 1280, 720, 30, 30, 10, True),
+    ("720p_60fps_gop250_noaudio", 1280, 720, 60, 250, 10, False),
+    ("1080p_24fps_gop48_audio", 1920, 1080, 24, 48, 10, True),
+    ("1080p_30fps_intra_noaudio", 1920, 1080, 30, 1, 5, False),
+    ("720p_vfr_gop60_audio", 1280, 720, "vfr", 60, 10, True),
+    ("720p_30fps_gop30_long", 1280, 720, 30, 30, 60, True),
+]
+
+QUICK_FIXTURES = ["240p_30fps_gop12_audio", "720p_vfr_gop60_audio"]
+
+# Metrics where a larger value is an improvement; everything else is a latency
+HIGHER_IS_BETTER = ("decode_fps", "export_speed")
+
+def generate_fixture(ffmpeg, fixture_dir, spec):
+    """Create a synthetic video for the given spec if it does not exist yet."""
+    name, width, height, fps, gop, duration, audio = spec
+    path = os.path.join(fixture_dir, f"{name}.mp4")
+    if os.path.exists(path):
+        return path
+
+    rate = 30 if fps == "vfr" else fps
+    cmd = [ffmpeg, "-y", "-loglevel", "error",
+           "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={rate}:duration={duration}"]
+    if audio:
+        cmd += ["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration}"]
+
+    if fps == "vfr":
+        # Drop an irregular subset of frames so timestamps are not evenly spaced
+        cmd += ["-vf", r"select='not(eq(mod(n\,7)\,3))*not(eq(mod(n\,11)\,5))'", "-fps_mode", "vfr"]
+
+    cmd += ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0"]
+    if audio:
+        cmd += ["-c:a", "aac", "-shortest"]
+    cmd.append(path)
+
+    subprocess.check_call(cmd)
+    return path
+
+def summarize(samples):
+    """Return mean and percentile statistics in milliseconds."""
+    ordered = sorted(samples)
+
+    def percentile(p):
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index] * 1000
+
+    return {
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "max_ms": ordered[-1] * 1000,
+        "samples": len(ordered),
+    }
+
+class HeadlessWidget:
+    """Minimal stand-in for the Tk widgets VideoPlayer touches."""
+    def __init__(self, *args, **kwargs):
+        self.image = None
+
+    def grid(self, *args, **kwargs):
+        pass
+
+    def config(self, **kwargs):
+        pass
+
+    configure = config
+
+    def winfo_width(self):
+        return 960
+
+    def winfo_height(self):
+        return 540
+
+    def after(self, delay, callback=None, *args):
+        # Playback scheduling is not benchmarked; drop the callback
+        return None
+
+@contextlib.contextmanager
+def make_player(headless):
+    """
+    VideoPlayer backed by a hidden Tk root or stub widgets, released on exit.
+    Preview audio stays off so results do not depend on the host's sound device.
+    """
+    import video_player
+
+    if not headless:
+        try:
+            import tkinter as tk
+            root = tk.Tk()
+            root.withdraw()
+            frame = tk.Frame(root, width=960, height=540)
+        except Exception as e:
+            print(f"No display available ({e}), using stub widgets")
+        else:
+            player = video_player.VideoPlayer(frame, audio_enabled=False)
+            try:
+                yield player
+            finally:
+                player.release()
+                root.destroy()
+            return
+
+    from PIL import ImageTk
+    # Stub out the label and (without a Tk interpreter) the PhotoImage blit, for this player only
+    with mock.patch.object(video_player.tk, "Label", HeadlessWidget), \
+            mock.patch.object(ImageTk, "PhotoImage", lambda image: image):
+        player = video_player.VideoPlayer(HeadlessWidget(), audio_enabled=False)
+        try:
+            yield player
+        finally:
+            player.release()
+
+def bench_player(path, headless, seeks, decode_frames, render_frames):
+    """Measure load, seek, decode and render for one video."""
+    results = {}
+    with make_player(headless) as player:
+        start = time.perf_counter()
+        player.load_video(path)
+        results["load_video_ms"] = (time.perf_counter() - start) * 1000
+
+        # Random seeks across the file, same sequence every run
+        rng = random.Random(1234)
+        duration = player.get_duration()
+        samples = []
+        for _ in range(seeks):
+            target = rng.uniform(0, max(duration - 0.1, 0))
+            start = time.perf_counter()
+            player.seek(target)
+            samples.append(time.perf_counter() - start)
+        results["seek"] = summarize(samples)
+
+        # Sustained decode straight from the decoder backend
+        results["decoder"] = player.decoder.name
+        player.decoder.seek_frame(0)
+        decoded = 0
+        start = time.perf_counter()
+        while decoded < decode_frames:
+            if player.decoder.read_frame() is None:
+                break
+            decoded += 1
+        elapsed = time.perf_counter() - start
+        results["decode_fps"] = decoded / elapsed if elapsed > 0 else 0
+
+        # Full per-frame path: decode, colour convert, resize, image creation
+        player.decoder.seek_frame(0)
+        samples = []
+        for _ in range(render_frames):
+            start = time.perf_counter()
+            player.display_current_frame()
+            samples.append(time.perf_counter() - start)
+        results["render_frame"] = summarize(samples)
+
+    return results
+
+def bench_export(path, output_dir, segment):
+    """Measure VideoProcessor.edit_video throughput."""
+    from video_processor import VideoProcessor
+
+    processor = VideoProcessor()
+    info = processor.get_video_info(path)
+    end_time = min(segment, info["duration"] - 0.1)
+    output_path = os.path.join(output_dir, "export_" + os.path.basename(path))
+
+    start = time.perf_counter()
+    processor.edit_video(path, 0, end_time, output_path)
+    elapsed = time.perf_counter() - start
+
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    return {
+        "export_ms": elapsed * 1000,
+        # Seconds of output produced per second of wall time
+        "export_speed": end_time / elapsed if elapsed > 0 else 0,
+    }
+
+class StubTranscriptionHandler(http.server.BaseHTTPRequestHandler):
+    """Local stand-in for the Hugging Face inference endpoint."""
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = json.dumps({"text": "CUT FROM 10 TO 30 SECONDS"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def bench_voice_pipeline(work_dir, iterations):
+    """Measure parse_time_codes and transcription against a stub backend."""
+    from audio_processor import AudioProcessor
+
+    processor = AudioProcessor()
+    commands = [
+        "cut from 10 to 30 seconds",
+        "please go from 5 to 95 seconds now",
+        "start 12 end 40",
+        "begin 3 finish 8",
+        "nothing useful here",
+    ]
+    samples = []
+    for i in range(iterations):
+        command = commands[i % len(commands)]
+        start = time.perf_counter()
+        processor.parse_time_codes(command)
+        samples.append(time.perf_counter() - start)
+    results = {"parse_time_codes": summarize(samples)}
+
+    # Five seconds of 16 kHz silence, the size of a recorded command
+    audio_file = os.path.join(work_dir, "command.wav")
+    with wave.open(audio_file, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(b"\x00\x00" * 16000 * 5)
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubTranscriptionHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        processor.api_url = f"http://127.0.0.1:{server.server_address[1]}/"
+        processor.set_api_token("benchmark")
+        samples = []
+        for _ in range(max(1, iterations // 50)):
+            start = time.perf_counter()
+            command = processor.transcribe_audio(audio_file)
+            processor.parse_time_codes(command)
+            samples.append(time.perf_counter() - start)
+        results["transcription_pipeline"] = summarize(samples)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return results
+
+def flatten(results, prefix=""):
+    """Flatten nested results into {'fixture.metric.stat': value}."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not name.endswith(".samples"):
+            flat[name] = value
+    return flat
+
+def compare(results, baseline, threshold):
+    """Compare two result sets and return a list of regressions."""
+    current = flatten(results["benchmarks"])
+    previous = flatten(baseline["benchmarks"])
+    regressions = []
+
+    for name, value in sorted(current.items()):
+        old = previous.get(name)
+        if not old:
+            continue
+        change = (value - old) / old
+        higher_is_better = any(part in name for part in HIGHER_IS_BETTER)
+        worse = -change if higher_is_better else change
+        if worse > threshold:
+            regressions.append((name, old, value, change))
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Video Editor performance benchmarks")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write JSON results")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before flagging (0.10 = 10%%)")
+    parser.add_argument("--fixture-dir", default=os.path.join(tempfile.gettempdir(), "video_editor_bench"),
+                        help="Where synthetic videos are generated and cached")
+    parser.add_argument("--quick", action="store_true", help="Run a small subset of fixtures")
+    parser.add_argument("--fixtures", nargs="*", help="Names of fixtures to run")
+    parser.add_argument("--headless", action="store_true", help="Use stub widgets even if a display is available")
+    parser.add_argument("--skip-export", action="store_true", help="Skip the edit_video benchmark")
+    parser.add_argument("--seeks", type=int, default=50)
+    parser.add_argument("--decode-frames", type=int, default=300)
+    parser.add_argument("--render-frames", type=int, default=100)
+    args = parser.parse_args()
+
+    os.makedirs(args.fixture_dir, exist_ok=True)
+    ffmpeg = find_ffmpeg()
+
+    selected = args.fixtures or (QUICK_FIXTURES if args.quick else [spec[0] for spec in FIXTURES])
+    specs = [spec for spec in FIXTURES if spec[0] in selected]
+    unknown = set(selected) - {spec[0] for spec in specs}
+    if unknown:
+        print(f"Unknown fixtures: {', '.join(sorted(unknown))}")
+        sys.exit(2)
+
+    benchmarks = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for spec in specs:
+            name = spec[0]
+            print(f"Benchmarking {name}...")
+            path = generate_fixture(ffmpeg, args.fixture_dir, spec)
+            result = bench_player(path, args.headless, args.seeks, args.decode_frames, args.render_frames)
+            if not args.skip_export:
+                result.update(bench_export(path, work_dir, segment=5))
+            benchmarks[name] = result
+
+        print("Benchmarking voice command pipeline...")
+        benchmarks["voice"] = bench_voice_pipeline(work_dir, iterations=1000)
+
+    results = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "platform": f"{platform.system()} {platform.release()}",
+        "python": platform.python_version(),
+        "benchmarks": benchmarks,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for name, old, new, change in regressions:
+                print(f"  {name}: {old:.3f} -> {new:.3f} ({change:+.1%})")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
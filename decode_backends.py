@@ -0,0 +1,508 @@
+"""
+Pluggable video decoders shared by the player and the processor.
+
+Every backend exposes the same operations: open, probe, seek to a
+timestamp, read (or skip) the next frame as a BGR array, and stream the
+audio of a range. Frame rate, frame count and duration come from one
+ffprobe pass whichever backend decodes, so the player, the processor and
+exports all agree on where a timestamp falls.
+
+Backends:
+    opencv   cv2.VideoCapture
+    pyav     PyAV (libav bindings), with threaded decoding
+    ffmpeg   an ffmpeg subprocess writing raw frames to a pipe
+
+The first time a codec/resolution combination is opened, it is opened with
+the default backend while each available backend is timed on a seek plus a
+short decode run in the background; the fastest is remembered in
+~/.video_editor/decode_backends.json and used from the next open on. Set
+VIDEO_EDITOR_DECODER to a backend name to skip the selection.
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+from utils import find_ffmpeg, find_ffprobe, probe_media, user_data_path
+
+def ffmpeg_audio(path, start_time=0.0, end_time=None, sample_rate=48000, channels=2, chunk_frames=4096):
+    """Audio of a range decoded by an ffmpeg subprocess, as float32 chunks shaped (frames, channels)."""
+    import numpy as np
+
+    command = [find_ffmpeg(), "-v", "error", "-ss", f"{start_time:.6f}", "-i", path]
+    if end_time is not None:
+        command += ["-t", f"{end_time - start_time:.6f}"]
+    command += ["-vn", "-ac", str(channels), "-ar", str(sample_rate), "-f", "f32le", "-"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    frame_bytes = 4 * channels
+    leftover = b""
+    completed = False
+    try:
+        while True:
+            data = process.stdout.read(chunk_frames * frame_bytes)
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % frame_bytes
+            leftover = data[usable:]
+            if usable:
+                yield np.frombuffer(data[:usable], dtype=np.float32).reshape(-1, channels)
+        completed = True
+    finally:
+        # Closed early (a seek, or the consumer stopped): ffmpeg would otherwise block on the pipe
+        if not completed:
+            process.kill()
+        process.stdout.close()
+        if process.wait() != 0 and completed:
+            raise Exception(f"Audio decode failed for {os.path.basename(path)}")
+
+class DecodeBackend:
+    name = None
+    # Whether the backend reads through source_io itself (so callers need no Prefetcher)
+    reads_ahead = False
+
+    def __init__(self):
+        self.path = None
+        self.info = None
+
+    @staticmethod
+    def available():
+        return False
+
+    def open(self, path, info=None):
+        """Open a file. `info` is a probe result to reuse, if the caller has one."""
+        if info is None and find_ffprobe():
+            info = probe_media(path)
+        self._open(path)
+        self.path = path
+        native = self._native_probe()
+        # Fill in anything ffprobe could not tell us from the decoder itself
+        self.info = dict(native, **{key: value for key, value in (info or {}).items() if value})
+
+    def probe(self):
+        """Duration, fps, frame count, size, codec and audio presence."""
+        return dict(self.info)
+
+    @property
+    def fps(self):
+        return self.info["fps"] or 30.0
+
+    @property
+    def frame_count(self):
+        return self.info["frame_count"]
+
+    @property
+    def duration(self):
+        return self.info["duration"] or self.frame_count / self.fps
+
+    def frame_at(self, timestamp):
+        """Index of the frame shown at `timestamp` seconds."""
+        return max(0, min(int(round(timestamp * self.fps)), max(self.frame_count - 1, 0)))
+
+    def seek_frame(self, index):
+        """Position so the next read returns frame `index`."""
+        self.seek(index / self.fps)
+
+    def seek(self, timestamp):
+        raise NotImplementedError
+
+    def read_frame(self):
+        """Next frame as a BGR array, or None at the end."""
+        raise NotImplementedError
+
+    def grab(self):
+        """Skip the next frame without converting it; False at the end."""
+        return self.read_frame() is not None
+
+    def read_audio(self, start_time=0.0, end_time=None, sample_rate=48000, channels=2, chunk_frames=4096):
+        """
+        Audio between two timestamps (to the end if end_time is None) as
+        float32 chunks shaped (frames, channels). Each call decodes
+        independently of the video position, so it can run on another thread.
+        """
+        return ffmpeg_audio(self.path, start_time, end_time, sample_rate, channels, chunk_frames)
+
+    def close(self):
+        pass
+
+    def _open(self, path):
+        raise NotImplementedError
+
+    def _native_probe(self):
+        raise NotImplementedError
+
+class OpenCVBackend(DecodeBackend):
+    name = "opencv"
+
+    @staticmethod
+    def available():
+        try:
+            import cv2
+            return True
+        except ImportError:
+            return False
+
+    def _open(self, path):
+        import cv2
+
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            raise Exception("Could not open video file")
+
+    def _native_probe(self):
+        import cv2
+
+        fps = self._cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return {
+            "duration": frame_count / fps if fps > 0 else 0,
+            "fps": fps,
+            "frame_count": frame_count,
+            "width": int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "codec": None,
+            "has_audio": False,
+            "rotation": 0,
+        }
+
+    def seek(self, timestamp):
+        import cv2
+
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, self.frame_at(timestamp))
+
+    def read_frame(self):
+        ret, frame = self._cap.read()
+        return frame if ret else None
+
+    def grab(self):
+        return self._cap.grab()
+
+    def close(self):
+        self._cap.release()
+
+class PyAVBackend(DecodeBackend):
+    name = "pyav"
+    reads_ahead = True
+
+    @staticmethod
+    def available():
+        try:
+            import av
+            return True
+        except ImportError:
+            return False
+
+    def _open(self, path):
+        import av
+        from source_io import open_source
+
+        # PyAV reads through a file object, so it gets read-ahead (and staging on network storage)
+        self._source = open_source(path)
+        try:
+            self._container = av.open(self._source)
+        except Exception:
+            self._source.close()
+            raise
+        if not self._container.streams.video:
+            self._container.close()
+            self._source.close()
+            raise Exception("No video stream")
+        self._stream = self._container.streams.video[0]
+        self._stream.thread_type = "AUTO"
+        time_base = self._stream.time_base
+        self._start = float(self._stream.start_time * time_base) if self._stream.start_time else 0.0
+        self._frames = self._container.decode(self._stream)
+        self._skip_before = None
+
+    def _native_probe(self):
+        import av
+
+        stream = self._stream
+        fps = float(stream.average_rate or 0)
+        duration = self._container.duration / av.time_base if self._container.duration else 0
+        return {
+            "duration": duration,
+            "fps": fps,
+            "frame_count": stream.frames or int(round(duration * fps)),
+            "width": stream.codec_context.width,
+            "height": stream.codec_context.height,
+            "codec": stream.codec_context.name,
+            "has_audio": bool(self._container.streams.audio),
+            "rotation": 0,
+        }
+
+    def seek(self, timestamp):
+        target = self.frame_at(timestamp) / self.fps
+        offset = int((target + self._start) / self._stream.time_base)
+        # Land on the keyframe before the target, then decode forward to it
+        self._container.seek(offset, stream=self._stream, backward=True, any_frame=False)
+        self._frames = self._container.decode(self._stream)
+        self._skip_before = target - 0.5 / self.fps
+
+    def _next(self):
+        for frame in self._frames:
+            if self._skip_before is not None and frame.time is not None and frame.time - self._start < self._skip_before:
+                continue
+            self._skip_before = None
+            return frame
+        return None
+
+    def read_frame(self):
+        frame = self._next()
+        return frame.to_ndarray(format="bgr24") if frame is not None else None
+
+    def grab(self):
+        return self._next() is not None
+
+    def read_audio(self, start_time=0.0, end_time=None, sample_rate=48000, channels=2, chunk_frames=4096):
+        import av
+        import numpy as np
+        from source_io import open_source
+
+        # A container of its own, so audio can be read while the video decodes on another thread
+        source = open_source(self.path)
+        try:
+            container = av.open(source)
+            try:
+                if not container.streams.audio:
+                    return
+                stream = container.streams.audio[0]
+                stream_start = float(stream.start_time * stream.time_base) if stream.start_time else 0.0
+                if start_time > 0:
+                    container.seek(int((start_time + stream_start) / stream.time_base), stream=stream, backward=True)
+                resampler = av.AudioResampler(format="flt", layout="stereo" if channels == 2 else "mono",
+                                              rate=sample_rate)
+                # Samples to drop before start_time (seeks land on packet boundaries) and to emit in total
+                skip = None
+                remaining = None if end_time is None else int(round((end_time - start_time) * sample_rate))
+
+                def frames():
+                    for frame in container.decode(stream):
+                        yield frame
+                    yield None  # flushes the resampler
+
+                for frame in frames():
+                    if skip is None and frame is not None and frame.time is not None:
+                        skip = max(0, int(round((start_time - (frame.time - stream_start)) * sample_rate)))
+                    for resampled in resampler.resample(frame):
+                        samples = resampled.to_ndarray().reshape(-1, channels)
+                        if skip:
+                            dropped = min(skip, len(samples))
+                            samples = samples[dropped:]
+                            skip -= dropped
+                        if remaining is not None:
+                            samples = samples[:remaining]
+                            remaining -= len(samples)
+                        if len(samples):
+                            yield np.ascontiguousarray(samples, dtype=np.float32)
+                        if remaining == 0:
+                            return
+            finally:
+                container.close()
+        finally:
+            source.close()
+
+    def close(self):
+        self._container.close()
+        self._source.close()
+
+class FFmpegPipeBackend(DecodeBackend):
+    name = "ffmpeg"
+
+    @staticmethod
+    def available():
+        try:
+            find_ffmpeg()
+        except Exception:
+            return False
+        # Frame size has to be known up front to split the raw stream
+        return find_ffprobe() is not None
+
+    def _open(self, path):
+        if not os.path.exists(path):
+            raise Exception("Could not open video file")
+        self._process = None
+        self._path = path
+
+    def _native_probe(self):
+        # Everything comes from ffprobe, which available() requires
+        return {"duration": 0, "fps": 0, "frame_count": 0, "width": 0, "height": 0, "codec": None, "has_audio": False,
+                "rotation": 0}
+
+    def _start_at(self, timestamp):
+        self._stop()
+        self._process = subprocess.Popen([
+            find_ffmpeg(), "-v", "error", "-ss", f"{timestamp:.6f}", "-i", self._path,
+            "-an", "-sn", "-f", "rawvideo", "-pix_fmt", "bgr24", "-"
+        ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=self._frame_bytes() * 4)
+
+    def _frame_size(self):
+        """Width and height of the frames ffmpeg writes; it autorotates, so quarter turns swap them."""
+        width, height = self.info["width"], self.info["height"]
+        if round(self.info.get("rotation") or 0) % 180 == 90:
+            return height, width
+        return width, height
+
+    def _frame_bytes(self):
+        width, height = self._frame_size()
+        return width * height * 3
+
+    def _stop(self):
+        if self._process:
+            self._process.kill()
+            self._process.stdout.close()
+            self._process.wait()
+            self._process = None
+
+    def seek(self, timestamp):
+        self._start_at(self.frame_at(timestamp) / self.fps)
+
+    def _read_bytes(self):
+        if self._process is None:
+            self._start_at(0.0)
+        frame_bytes = self._frame_bytes()
+        data = self._process.stdout.read(frame_bytes)
+        return data if len(data) == frame_bytes else None
+
+    def read_frame(self):
+        import numpy as np
+
+        data = self._read_bytes()
+        if data is None:
+            return None
+        width, height = self._frame_size()
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+
+    def grab(self):
+        return self._read_bytes() is not None
+
+    def close(self):
+        self._stop()
+
+BACKENDS = [OpenCVBackend, PyAVBackend, FFmpegPipeBackend]
+
+def available_backends():
+    return [backend for backend in BACKENDS if backend.available()]
+
+class BackendSelector:
+    """Picks the fastest backend per codec and resolution, benchmarking each combination once."""
+
+    # Combinations being benchmarked, shared by every selector in the process
+    _benchmarking = set()
+    _benchmarking_lock = threading.Lock()
+
+    def __init__(self, cache_path=None, sample_frames=48):
+        if cache_path is None:
+            cache_path = user_data_path("decode_backends.json")
+        self.cache_path = cache_path
+        self.sample_frames = sample_frames
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, key, result):
+        with self._lock:
+            cache = self._load()
+            cache[key] = result
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}.partial"
+            with open(temp_path, "w") as f:
+                json.dump(cache, f, indent=2)
+            os.replace(temp_path, self.cache_path)
+
+    @staticmethod
+    def key(info):
+        return f"{info.get('codec') or 'unknown'}/{info.get('width')}x{info.get('height')}"
+
+    def benchmark(self, backend_class, path, info):
+        """Seconds to open, seek to the middle and decode sample_frames frames."""
+        started = time.perf_counter()
+        backend = backend_class()
+        backend.open(path, info)
+        try:
+            backend.seek(backend.duration / 2)
+            for _ in range(self.sample_frames):
+                if backend.read_frame() is None:
+                    break
+        finally:
+            backend.close()
+        return time.perf_counter() - started
+
+    def benchmark_all(self, path, info, candidates):
+        """Time every candidate on `path` and remember the fastest for its codec and resolution."""
+        key = self.key(info)
+        try:
+            timings = {}
+            for backend in candidates:
+                try:
+                    timings[backend.name] = self.benchmark(backend, path, info)
+                except Exception:
+                    continue
+            if timings:
+                winner = min(timings, key=timings.get)
+                self._save(key, {"backend": winner, "seconds": timings})
+                return winner
+            return None
+        finally:
+            with self._benchmarking_lock:
+                self._benchmarking.discard(key)
+
+    def select(self, path, info=None):
+        """
+        Backend classes to try for `path`, best first.
+
+        Never blocks on a benchmark: an unknown codec/resolution gets the
+        default order now, and is benchmarked in the background for next time.
+        """
+        candidates = available_backends()
+        if not candidates:
+            raise Exception("No video decoder available. Install opencv-python, av or ffmpeg.")
+
+        forced = os.getenv("VIDEO_EDITOR_DECODER")
+        if forced:
+            chosen = [backend for backend in candidates if backend.name == forced]
+            return chosen + [backend for backend in candidates if backend not in chosen]
+        if len(candidates) == 1 or not info:
+            return candidates
+
+        key = self.key(info)
+        winner = self._load().get(key, {}).get("backend")
+        if winner not in [backend.name for backend in candidates]:
+            with self._benchmarking_lock:
+                start = key not in self._benchmarking
+                self._benchmarking.add(key)
+            if start:
+                threading.Thread(target=self.benchmark_all, args=(path, info, candidates), daemon=True).start()
+            return candidates
+
+        return sorted(candidates, key=lambda backend: backend.name != winner)
+
+def probe(path):
+    """Media properties, identical to what an opened decoder reports."""
+    if find_ffprobe():
+        return probe_media(path)
+    decoder = open_decoder(path)
+    try:
+        return decoder.probe()
+    finally:
+        decoder.close()
+
+def open_decoder(path, selector=None):
+    """Open `path` with the best available backend, falling back to the others on failure."""
+    info = probe_media(path) if find_ffprobe() else None
+    errors = []
+    for backend_class in (selector or BackendSelector()).select(path, info):
+        backend = backend_class()
+        try:
+            backend.open(path, info)
+            return backend
+        except Exception as e:
+            errors.append(f"{backend_class.name}: {e}")
+    raise Exception(f"Could not open video file ({'; '.join(errors)})")
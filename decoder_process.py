@@ -0,0 +1,379 @@
+"""
+Out-of-process video decoding for the player.
+
+The decoder subprocess owns the decode backend, converts and resizes each
+frame for display, and writes it into a multiprocessing.shared_memory ring.
+The GUI reads frames straight out of shared memory and only talks to the
+decoder through a small command pipe, so decoding never holds the GUI
+process's GIL and a crashing codec only takes down the subprocess.
+"""
+
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+from memory_governor import PRIORITY_PLAYBACK, governor
+from perf_trace import tracer
+from video_player import VideoPlayer
+
+def _fit_size(frame_width, frame_height, max_width, max_height):
+    """Largest size that fits in the box while keeping aspect ratio, no upscaling."""
+    scale = min(max_width / frame_width, max_height / frame_height, 1.0)
+    return max(1, int(frame_width * scale)), max(1, int(frame_height * scale))
+
+def _decoder_main(shm_name, slot_count, slot_size, max_size, free_slots, control_conn, status_queue):
+    """Decoder subprocess: handle commands and fill the shared-memory ring."""
+    import cv2
+    import numpy as np
+    from decode_backends import open_decoder
+    from source_io import Prefetcher
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    decoder = None
+    prefetcher = None
+    fps = 30.0
+    total_frames = 0
+    frame_index = 0
+    playing = False
+    rate = 1.0
+    target_size = max_size
+    next_slot = 0
+    next_due = time.monotonic()
+
+    def write_frame(frame, index, wait):
+        """Copy a display-ready frame into the next free slot."""
+        nonlocal next_slot
+        # While playing, drop the frame if the GUI has not freed a slot in time
+        if not free_slots.acquire(timeout=0.5 if wait else 0.02):
+            return False
+        height, width = frame.shape[:2]
+        new_width, new_height = _fit_size(width, height, *target_size)
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if (new_width, new_height) != (width, height):
+            rgb = cv2.resize(rgb, (new_width, new_height), interpolation=cv2.INTER_AREA)
+
+        slot = next_slot
+        next_slot = (next_slot + 1) % slot_count
+        view = np.ndarray((new_height, new_width, 3), dtype=np.uint8, buffer=shm.buf, offset=slot * slot_size)
+        view[:] = rgb
+        del view
+        status_queue.put(("frame", slot, index, new_width, new_height))
+        return True
+
+    def decode_next(wait):
+        nonlocal frame_index, playing
+        frame = decoder.read_frame()
+        if frame is None:
+            playing = False
+            status_queue.put(("eof", frame_index))
+            return
+        write_frame(frame, frame_index, wait)
+        frame_index += 1
+        if prefetcher and total_frames:
+            prefetcher.update(frame_index / total_frames)
+
+    try:
+        while True:
+            # Block on commands while paused; poll between frames while playing
+            timeout = max(0.0, next_due - time.monotonic()) if playing else 0.1
+            if control_conn.poll(timeout):
+                command, *args = control_conn.recv()
+
+                if command == "quit":
+                    break
+                elif command == "open":
+                    if decoder:
+                        decoder.close()
+                        decoder = None
+                    if prefetcher:
+                        prefetcher.close()
+                        prefetcher = None
+                    try:
+                        decoder = open_decoder(args[0])
+                        if not decoder.reads_ahead:
+                            prefetcher = Prefetcher(args[0])
+                    except Exception as e:
+                        status_queue.put(("error", str(e)))
+                        continue
+                    fps = decoder.fps
+                    total_frames = decoder.frame_count
+                    frame_index = 0
+                    playing = False
+                    status_queue.put(("opened", fps, total_frames))
+                    decode_next(wait=True)
+                elif command == "size":
+                    target_size = (min(args[0], max_size[0]), min(args[1], max_size[1]))
+                elif command == "seek" and decoder:
+                    frame_index = max(0, min(int(args[0]), total_frames - 1))
+                    decoder.seek_frame(frame_index)
+                    decode_next(wait=not playing)
+                    next_due = time.monotonic()
+                elif command == "play" and decoder:
+                    playing = True
+                    next_due = time.monotonic()
+                elif command == "pause":
+                    playing = False
+                elif command == "rate":
+                    rate = max(0.1, float(args[0]))
+                continue
+
+            if playing and decoder and time.monotonic() >= next_due:
+                decode_next(wait=False)
+                next_due += 1.0 / (fps * rate)
+                # Do not try to catch up after a long stall
+                next_due = max(next_due, time.monotonic() - 0.5)
+    finally:
+        if decoder:
+            decoder.close()
+        if prefetcher:
+            prefetcher.close()
+        shm.close()
+
+class ProcessVideoPlayer(VideoPlayer):
+    """VideoPlayer whose decoding runs in a separate process."""
+
+    def __init__(self, parent_frame, position_callback=None, slot_count=4,
+                 max_size=(1920, 1080), poll_ms=5, max_restarts=3):
+        super().__init__(parent_frame, position_callback)
+        self.slot_count = slot_count
+        self.max_size = max_size
+        self.slot_size = max_size[0] * max_size[1] * 3
+        self.poll_ms = poll_ms
+        self.max_restarts = max_restarts
+        self.error_callback = None
+
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._shm = None
+        self._free_slots = None
+        self._control = None
+        self._status = None
+        self._poll_id = None
+        self._restarts = 0
+        self._closing = False
+
+    def _start_process(self):
+        """Create the shared-memory ring and launch the decoder subprocess."""
+        self._closing = False
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slot_size * self.slot_count)
+        self._ring_pool = governor.register("player.decoder_ring", PRIORITY_PLAYBACK)
+        self._ring_pool.report(self.slot_size * self.slot_count)
+        self._free_slots = self._context.Semaphore(self.slot_count)
+        self._status = self._context.Queue()
+        self._control, child_conn = self._context.Pipe()
+        self._process = self._context.Process(
+            target=_decoder_main,
+            args=(self._shm.name, self.slot_count, self.slot_size, self.max_size,
+                  self._free_slots, child_conn, self._status),
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+
+        if self._poll_id is None:
+            self._poll_id = self.parent_frame.after(self.poll_ms, self._poll)
+
+    def _stop_process(self):
+        """Shut down the subprocess and free the ring."""
+        if self._process:
+            try:
+                self._control.send(("quit",))
+            except (OSError, ValueError):
+                pass
+            self._process.join(timeout=1)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+        if self._control:
+            self._control.close()
+            self._control = None
+        if self._shm:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+            self._ring_pool.close()
+
+    def _send(self, *command):
+        try:
+            self._control.send(command)
+        except (OSError, ValueError, AttributeError):
+            # The decoder died; _poll notices and restarts it
+            pass
+
+    def _send_display_size(self):
+        width = self.parent_frame.winfo_width()
+        height = self.parent_frame.winfo_height()
+        if width <= 1 or height <= 1:
+            width, height = 640, 480
+        self._send("size", width, height)
+
+    def load_video(self, video_path):
+        """Load a video file in the decoder process."""
+        try:
+            from decode_backends import probe
+
+            # Read properties here so the caller gets them synchronously
+            info = probe(video_path)
+            self.fps = info["fps"] or 30.0
+            self.total_frames = info["frame_count"]
+            self.duration = info["duration"] or (self.total_frames / self.fps)
+
+            if not self._process or not self._process.is_alive():
+                self._start_process()
+
+            self.video_path = video_path
+            self.current_frame = 0
+            self.is_playing = False
+            self._restarts = 0
+            self._send_display_size()
+            self._send("open", video_path)
+            return True
+
+        except Exception as e:
+            raise Exception(f"Failed to load video: {str(e)}")
+
+    def play(self):
+        """Start video playback."""
+        if not self.video_path:
+            raise Exception("No video loaded")
+        self.is_playing = True
+        self._send_display_size()
+        self._send("play")
+
+    def pause(self):
+        """Pause video playback."""
+        self.is_playing = False
+        self._send("pause")
+
+    def stop(self):
+        """Stop video playback and reset to beginning."""
+        self.is_playing = False
+        if self.video_path:
+            self._send("pause")
+            self.seek(0)
+
+    def seek(self, position_seconds):
+        """Seek to specific position in seconds."""
+        if not self.video_path:
+            return
+        target_frame = int(position_seconds * self.fps)
+        self.current_frame = max(0, min(target_frame, self.total_frames - 1))
+        self._send_display_size()
+        self._send("seek", self.current_frame)
+
+    def get_position(self):
+        """Get current position in seconds."""
+        if not self.video_path or self.fps <= 0:
+            return 0
+        return self.current_frame / self.fps
+    
+    def set_rate(self, rate):
+        """Set playback speed multiplier (forward only)."""
+        self.playback_rate = abs(rate)
+        self._send("rate", self.playback_rate)
+
+    def shuttle(self, direction):
+        # The decoder process only plays forward; reverse shuttle steps back a frame
+        if direction < 0:
+            self.step(-1)
+        else:
+            super().shuttle(direction)
+
+    def shuttle_slower(self, direction):
+        if direction < 0:
+            self.step(-1)
+        else:
+            super().shuttle_slower(direction)
+
+    def step(self, frames):
+        """Pause and move by a number of frames."""
+        if not self.video_path or self.fps <= 0:
+            return
+        self.pause()
+        self.seek((self.current_frame + frames) / self.fps)
+
+    def _poll(self):
+        """Pick up decoder messages and show the newest frame (Tk thread)."""
+        self._poll_id = None
+        latest = None
+        try:
+            while True:
+                message = self._status.get_nowait()
+                if message[0] == "frame":
+                    if latest:
+                        # Superseded before it was shown
+                        self._free_slots.release()
+                        tracer.count("player.dropped_frames")
+                    latest = message
+                elif message[0] == "eof":
+                    self.is_playing = False
+                elif message[0] == "error":
+                    self._report_error(message[1])
+        except (queue.Empty, OSError, ValueError):
+            pass
+
+        if latest:
+            self._show_slot(*latest[1:])
+
+        if self._process and not self._process.is_alive() and not self._closing:
+            self._handle_crash()
+
+        # _handle_crash may already have scheduled a poll for the new process
+        if self._process and not self._closing and self._poll_id is None:
+            self._poll_id = self.parent_frame.after(self.poll_ms, self._poll)
+
+    def _show_slot(self, slot, index, width, height):
+        """Blit a frame straight out of the shared-memory ring."""
+        from PIL import Image, ImageTk
+
+        with tracer.span("player.blit", "player"):
+            start = slot * self.slot_size
+            view = self._shm.buf[start:start + width * height * 3]
+            image = Image.frombuffer("RGB", (width, height), view, "raw", "RGB", 0, 1)
+            photo = ImageTk.PhotoImage(image)
+            # PhotoImage holds its own copy, so the slot can be reused now
+            del image, view
+            self._free_slots.release()
+            self.video_label.config(image=photo, text="")
+            self.video_label.image = photo  # Keep a reference
+        tracer.frame_presented()
+
+        self.current_frame = index
+        if self.position_callback:
+            position = index / self.fps if self.fps > 0 else 0
+            self.position_callback(position, self.duration)
+
+    def _handle_crash(self):
+        """Restart a dead decoder and restore the previous position."""
+        exit_code = self._process.exitcode
+        self._stop_process()
+        if self._restarts >= self.max_restarts or not self.video_path:
+            self.is_playing = False
+            self._report_error(f"Decoder process exited with code {exit_code}")
+            return
+
+        self._restarts += 1
+        self._report_error(f"Decoder process exited with code {exit_code}, restarting")
+        was_playing = self.is_playing
+        self._start_process()
+        self._send_display_size()
+        self._send("open", self.video_path)
+        self._send("seek", self.current_frame)
+        if was_playing:
+            self._send("play")
+
+    def _report_error(self, message):
+        if self.error_callback:
+            self.error_callback(message)
+        else:
+            print(f"Decoder error: {message}")
+
+    def release(self):
+        """Release video resources and stop the decoder process."""
+        self._closing = True
+        self.is_playing = False
+        if self._poll_id is not None:
+            self.parent_frame.after_cancel(self._poll_id)
+            self._poll_id = None
+        self._stop_process()
+        self.video_path = None
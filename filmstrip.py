@@ -0,0 +1,240 @@
+"""
+Timeline filmstrip thumbnails.
+
+Thumbnails are taken at keyframes only, and decoded by ffmpeg at thumbnail
+size, so each one costs a single keyframe decode and never touches the
+player's decoder. A small thread pool extracts them in coarse-to-fine
+order: first a handful spread over the whole video, then the gaps between
+them. The strip is usable right away and sharpens as the workers fill it in.
+
+All thumbnails of a video are packed into one image atlas. The atlas is
+saved to a single cache file, after an index of each thumbnail's time and
+tile offset, so reopening a video loads its filmstrip with one read.
+"""
+
+import bisect
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import struct
+import subprocess
+import threading
+from memory_governor import PRIORITY_THUMBNAILS, governor
+from utils import find_ffmpeg, find_ffprobe, probe_keyframes, probe_media, user_data_path
+
+CACHE_MAGIC = b"FSTR"
+ATLAS_COLUMNS = 16
+
+def coarse_to_fine(count):
+    """Indices 0..count-1 ordered so every prefix is spread evenly over the range."""
+    step = 1
+    while step < count:
+        step *= 2
+    order = []
+    seen = set()
+    while step >= 1:
+        for index in range(0, count, step):
+            if index not in seen:
+                seen.add(index)
+                order.append(index)
+        step //= 2
+    return order
+
+def extract_thumbnail(ffmpeg, video_path, timestamp, width, height):
+    """Decode the keyframe at (or just before) `timestamp` as a width x height RGB image."""
+    from PIL import Image
+
+    data = subprocess.run([
+        ffmpeg, "-v", "error", "-noaccurate_seek", "-ss", f"{timestamp:.6f}",
+        "-skip_frame", "nokey", "-i", video_path, "-frames:v", "1", "-an",
+        "-vf", f"scale={width}:{height}", "-pix_fmt", "rgb24", "-f", "rawvideo", "-"
+    ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+    if len(data) < width * height * 3:
+        return None
+    return Image.frombytes("RGB", (width, height), data[:width * height * 3])
+
+class Filmstrip:
+    def __init__(self, video_path, duration, cache_dir=None, thumb_width=160, max_thumbnails=240, workers=None):
+        if cache_dir is None:
+            cache_dir = user_data_path("filmstrips")
+        self.video_path = video_path
+        self.duration = duration
+        self.cache_dir = cache_dir
+        self.thumb_width = thumb_width
+        self.thumb_height = None
+        self.max_thumbnails = max_thumbnails
+        self.workers = workers or min(4, os.cpu_count() or 2)
+
+        self.times = []
+        self._atlas = None
+        self._done = []  # sorted (time, slot) of finished thumbnails
+        self._new = 0
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        # The atlas is small and needed for hover previews, so it is counted but never shrunk
+        self._pool = governor.register("thumbnails.filmstrip", PRIORITY_THUMBNAILS)
+
+    def _cache_path(self):
+        stat = os.stat(self.video_path)
+        identity = f"{os.path.abspath(self.video_path)}|{stat.st_size}|{stat.st_mtime_ns}|{self.thumb_width}"
+        return os.path.join(self.cache_dir, hashlib.sha1(identity.encode()).hexdigest() + ".strip")
+
+    def start(self, update_callback=None):
+        """Load the cached strip and extract any missing thumbnails in the background."""
+        threading.Thread(target=self._run, args=(update_callback,), daemon=True).start()
+
+    def cancel(self):
+        """Stop extracting and leave the memory budget; thumbnails finished so far are kept in the cache."""
+        self._cancelled.set()
+        self._pool.close()
+
+    @property
+    def complete(self):
+        return bool(self.times) and len(self._done) == len(self.times)
+
+    def _run(self, update_callback):
+        try:
+            loaded = self._load()
+            if update_callback and self._done:
+                update_callback()
+            if loaded and self.complete:
+                return
+            if not loaded:
+                self._plan()
+
+            ffmpeg = find_ffmpeg()
+            done_slots = {slot for _, slot in self._done}
+            pending = [slot for slot in coarse_to_fine(len(self.times)) if slot not in done_slots]
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {
+                    executor.submit(self._extract, ffmpeg, slot): slot for slot in pending
+                }
+                # Results are applied in completion order; the submission order keeps them coarse to fine
+                for future in concurrent.futures.as_completed(futures):
+                    if self._cancelled.is_set():
+                        for other in futures:
+                            other.cancel()
+                        break
+                    if future.result() and update_callback:
+                        update_callback()
+        except Exception as e:
+            print(f"Filmstrip generation failed: {e}")
+        finally:
+            if self._new:
+                try:
+                    self._save()
+                except OSError as e:
+                    print(f"Could not save filmstrip cache: {e}")
+
+    def _plan(self):
+        """Pick thumbnail times and size the atlas."""
+        from PIL import Image
+
+        aspect = 16 / 9
+        keyframes = []
+        if find_ffprobe():
+            info = probe_media(self.video_path)
+            if info["width"] and info["height"]:
+                aspect = info["width"] / info["height"]
+            keyframes = probe_keyframes(self.video_path)
+
+        count = self.max_thumbnails
+        if keyframes:
+            if len(keyframes) <= count:
+                times = keyframes
+            else:
+                # Keyframe nearest each evenly spaced point
+                times = set()
+                for i in range(count):
+                    t = (i + 0.5) * self.duration / count
+                    index = bisect.bisect_left(keyframes, t)
+                    neighbours = keyframes[max(0, index - 1):index + 1]
+                    times.add(min(neighbours, key=lambda k: abs(k - t)))
+                times = sorted(times)
+        else:
+            times = [(i + 0.5) * self.duration / count for i in range(count)]
+
+        self.thumb_height = max(2, int(round(self.thumb_width / aspect / 2)) * 2)
+        rows = (len(times) + ATLAS_COLUMNS - 1) // ATLAS_COLUMNS
+        with self._lock:
+            self.times = times
+            self._atlas = Image.new("RGB", (ATLAS_COLUMNS * self.thumb_width, max(rows, 1) * self.thumb_height))
+            self._done = []
+        self._pool.report(self._atlas.width * self._atlas.height * 3)
+
+    def _tile_offset(self, slot):
+        return (slot % ATLAS_COLUMNS) * self.thumb_width, (slot // ATLAS_COLUMNS) * self.thumb_height
+
+    def _extract(self, ffmpeg, slot):
+        if self._cancelled.is_set():
+            return False
+        image = extract_thumbnail(ffmpeg, self.video_path, self.times[slot], self.thumb_width, self.thumb_height)
+        if image is None:
+            return False
+        with self._lock:
+            self._atlas.paste(image, self._tile_offset(slot))
+            bisect.insort(self._done, (self.times[slot], slot))
+            self._new += 1
+        return True
+
+    def nearest(self, position):
+        """Finished thumbnail closest to `position` seconds, or None."""
+        with self._lock:
+            if not self._done:
+                return None
+            index = bisect.bisect_left(self._done, (position, -1))
+            candidates = self._done[max(0, index - 1):index + 1]
+            _, slot = min(candidates, key=lambda entry: abs(entry[0] - position))
+            x, y = self._tile_offset(slot)
+            return self._atlas.crop((x, y, x + self.thumb_width, y + self.thumb_height))
+
+    def _save(self):
+        """Write the index and atlas to the cache file."""
+        with self._lock:
+            index = {
+                "times": self.times,
+                "width": self.thumb_width,
+                "height": self.thumb_height,
+                "columns": ATLAS_COLUMNS,
+                "entries": [[time, slot, *self._tile_offset(slot)] for time, slot in self._done],
+            }
+            atlas = io.BytesIO()
+            self._atlas.save(atlas, format="JPEG", quality=85)
+
+        header = json.dumps(index).encode()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_path = self._cache_path()
+        temp_path = cache_path + ".partial"
+        with open(temp_path, "wb") as f:
+            f.write(CACHE_MAGIC + struct.pack("<I", len(header)) + header)
+            f.write(atlas.getvalue())
+        os.replace(temp_path, cache_path)
+        self._new = 0
+
+    def _load(self):
+        """Restore a previously saved strip; False if there is none (or it is unusable)."""
+        from PIL import Image
+
+        try:
+            with open(self._cache_path(), "rb") as f:
+                data = f.read()
+            if data[:4] != CACHE_MAGIC:
+                return False
+            header_length = struct.unpack("<I", data[4:8])[0]
+            index = json.loads(data[8:8 + header_length])
+            if index["width"] != self.thumb_width or index["columns"] != ATLAS_COLUMNS:
+                return False
+            atlas = Image.open(io.BytesIO(data[8 + header_length:])).convert("RGB")
+        except (OSError, ValueError, KeyError, struct.error):
+            return False
+
+        with self._lock:
+            self.times = index["times"]
+            self.thumb_height = index["height"]
+            self._atlas = atlas
+            self._done = sorted((time, slot) for time, slot, _, _ in index["entries"])
+        self._pool.report(atlas.width * atlas.height * 3)
+        return True
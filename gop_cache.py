@@ -0,0 +1,232 @@
+"""
+Decoded-GOP cache for reverse playback and backward frame stepping.
+
+Stepping backwards with seek() redecodes from the previous keyframe for
+every frame. Instead, the frames between two keyframes (a GOP) are decoded
+once, in order, and kept as display-ready frames, so reverse playback
+serves each frame from memory. Long GOPs are stored as sub-blocks of at
+most `max_block_frames`, so memory can be given back a block at a time;
+a miss decodes from the keyframe in one pass and stores every sub-block
+up to the one needed, so the GOP is still decoded only once.
+
+The cache decodes with its own decoder, so it never holds up the player's.
+While one block is being played, the block before it is decoded in the
+background, so reverse playback does not stall at block boundaries.
+Blocks are kept until the memory governor asks for room, least recently
+used first.
+"""
+
+import bisect
+import collections
+import threading
+from memory_governor import PRIORITY_FRAME_CACHE, governor
+
+class GOPCache:
+    def __init__(self, open_decoder, prepare_frame, total_frames, max_block_frames=32):
+        """`open_decoder()` returns a new decoder for the video; it is called on first use."""
+        self.open_decoder = open_decoder
+        self.prepare_frame = prepare_frame
+        self.total_frames = total_frames
+        self.max_block_frames = max_block_frames
+
+        self.keyframes = []
+        self._blocks = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Bumped whenever cached frames become invalid, so decodes in flight are not stored
+        self._generation = 0
+        self._inflight = {}  # block start -> Event set when its decode finishes
+
+        self._decoder = None
+        self._decode_lock = threading.Lock()
+
+        self._prefetch_wanted = None
+        self._prefetch_ready = threading.Condition(self._lock)
+        self._prefetch_thread = None
+        self._closed = False
+        self._pool = governor.register("player.frame_cache", PRIORITY_FRAME_CACHE, self._shrink)
+
+    def set_keyframes(self, frame_indices):
+        """Use real keyframe positions for block boundaries."""
+        keyframes = sorted(set(index for index in frame_indices if 0 <= index < self.total_frames))
+        with self._lock:
+            self.keyframes = keyframes
+        self.clear()
+
+    def gop_range(self, index):
+        """Frame range [start, end) of the GOP containing `index`, or None if keyframes are unknown."""
+        keyframes = self.keyframes
+        if not keyframes:
+            return None
+        position = bisect.bisect_right(keyframes, index) - 1
+        gop_start = keyframes[position] if position >= 0 else 0
+        gop_end = keyframes[position + 1] if position + 1 < len(keyframes) else self.total_frames
+        return gop_start, gop_end
+
+    def block_range(self, index):
+        """Frame range [start, end) of the block containing `index`."""
+        # Unknown GOP structure: fixed-size blocks still decode each frame only once
+        gop_start, gop_end = self.gop_range(index) or (0, self.total_frames)
+        start = gop_start + (index - gop_start) // self.max_block_frames * self.max_block_frames
+        return start, min(start + self.max_block_frames, gop_end)
+
+    def get(self, index):
+        """Display-ready frame at `index`, decoding its block on a miss; the block before it is prefetched."""
+        while True:
+            generation = self._generation
+            start, end = self.block_range(index)
+            frames = self._load(start, end)
+            # A clear (new keyframes or display size) mid-decode leaves a partial block; load it again
+            if generation == self._generation or self._closed:
+                break
+        if start > 0:
+            self.prefetch(start - 1)
+
+        offset = index - start
+        return frames[offset] if offset < len(frames) else None
+
+    def prefetch(self, index):
+        """Decode the block containing `index` in the background, if it is not cached yet."""
+        start, end = self.block_range(index)
+        with self._lock:
+            if self._closed or start in self._blocks or start in self._inflight:
+                return
+            # Only the latest request matters; playback has moved on from older ones
+            self._prefetch_wanted = (start, end)
+            if self._prefetch_thread is None:
+                self._prefetch_thread = threading.Thread(target=self._prefetch_loop, daemon=True)
+                self._prefetch_thread.start()
+            self._prefetch_ready.notify()
+
+    def _prefetch_loop(self):
+        while True:
+            with self._lock:
+                while self._prefetch_wanted is None and not self._closed:
+                    self._prefetch_ready.wait()
+                if self._closed:
+                    return
+                start, end = self._prefetch_wanted
+                self._prefetch_wanted = None
+            try:
+                self._load(start, end)
+            except Exception as e:
+                print(f"GOP prefetch failed: {e}")
+
+    def _load(self, start, end):
+        """Cached frames of a block, decoding them (or waiting for a decode in flight) on a miss."""
+        while True:
+            with self._lock:
+                frames = self._blocks.get(start)
+                if frames is not None:
+                    self._blocks.move_to_end(start)
+                    return frames
+                pending = self._inflight.get(start)
+                if pending is None:
+                    # One pass from the keyframe yields every block before this one in the GOP too
+                    gop = self.gop_range(start)
+                    pass_start = gop[0] if gop else start
+                    pending = threading.Event()
+                    claimed = [
+                        block for block in range(pass_start, end, self.max_block_frames)
+                        if block not in self._blocks and block not in self._inflight
+                    ]
+                    for block in claimed:
+                        self._inflight[block] = pending
+                    generation = self._generation
+                    break
+            # Another thread is already decoding this block; use its result
+            pending.wait()
+            with self._lock:
+                frames = self._blocks.get(start)
+            if frames is not None:
+                return frames
+
+        try:
+            decoded = self._decode_pass(pass_start, end, generation, claimed)
+            return decoded.get(start, [])
+        finally:
+            with self._lock:
+                for block in claimed:
+                    if self._inflight.get(block) is pending:
+                        del self._inflight[block]
+            pending.set()
+
+    def _decode_pass(self, start, end, generation, store):
+        """Decode frames [start, end) in order, storing the blocks listed in `store` as they complete."""
+        decoded = {}
+        block_start = start
+        block = []
+        with self._decode_lock:
+            if self._closed:
+                return decoded
+            if self._decoder is None:
+                self._decoder = self.open_decoder()
+            self._decoder.seek_frame(start)
+            for index in range(start, end):
+                if generation != self._generation:
+                    # Cleared or closed meanwhile; the frames would be thrown away
+                    break
+                frame = self._decoder.read_frame()
+                if frame is None:
+                    break
+                block.append(self.prepare_frame(frame))
+                if len(block) == self.max_block_frames or index + 1 == end:
+                    decoded[block_start] = block
+                    if block_start in store:
+                        # Stored in decode order, so under pressure the blocks furthest from playback go first
+                        self._store(block_start, block, generation)
+                    block_start = index + 1
+                    block = []
+        if block:
+            # The video ended early; keep what there is
+            decoded[block_start] = block
+            if block_start in store:
+                self._store(block_start, block, generation)
+        return decoded
+
+    def _store(self, start, frames, generation):
+        size = sum(frame.nbytes for frame in frames)
+        with self._lock:
+            if start in self._blocks or generation != self._generation or self._closed:
+                return
+            self._blocks[start] = frames
+            self._bytes += size
+            size = self._bytes
+        # Outside our lock: the governor may call back into _shrink
+        self._pool.report(size)
+
+    def _evict_to(self, target):
+        # The two newest blocks are kept; playback is reading one and the other was just prefetched
+        while self._bytes > target and len(self._blocks) > 2:
+            _, evicted = self._blocks.popitem(last=False)
+            self._bytes -= sum(frame.nbytes for frame in evicted)
+
+    def _shrink(self, target):
+        """Memory governor callback: drop least recently used blocks."""
+        with self._lock:
+            self._evict_to(target)
+            return self._bytes
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._blocks.clear()
+            self._bytes = 0
+            self._prefetch_wanted = None
+        self._pool.report(0)
+
+    def close(self):
+        """Drop all frames, stop prefetching and leave the memory budget."""
+        with self._lock:
+            self._closed = True
+            self._prefetch_ready.notify()
+        self.clear()
+        self._pool.close()
+        with self._decode_lock:
+            if self._decoder:
+                self._decoder.close()
+                self._decoder = None
+
+    @property
+    def size_bytes(self):
+        return self._bytes
@@ -0,0 +1,135 @@
+import collections
+import datetime
+import itertools
+import logging
+import logging.handlers
+import queue
+import tkinter as tk
+
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+class LogSink:
+    """
+    Thread-safe buffer between log producers and the GUI log panel.
+
+    Any thread may call write(); messages go into a queue that the Tk loop
+    drains in timed batches, so worker threads never touch widgets. Only the
+    most recent `max_lines` entries are kept on screen, and older entries can
+    be spilled to a rotating log file.
+    """
+
+    def __init__(self, min_level="info", max_lines=1000, spill_path=None,
+                 spill_max_bytes=1024 * 1024, spill_backups=3,
+                 drain_interval_ms=100, max_batch=500):
+        self.min_level = LOG_LEVELS.get(min_level, 20)
+        self.max_lines = max_lines
+        self.drain_interval_ms = drain_interval_ms
+        self.max_batch = max_batch
+
+        self._queue = queue.SimpleQueue()
+        self.lines = collections.deque(maxlen=max_lines)
+        self.text_widget = None
+        self._after_id = None
+
+        self._spill = None
+        if spill_path:
+            self._spill = logging.handlers.RotatingFileHandler(
+                spill_path, maxBytes=spill_max_bytes, backupCount=spill_backups, delay=True
+            )
+
+    def set_level(self, level):
+        """Set the minimum level that reaches the panel."""
+        self.min_level = LOG_LEVELS.get(level, 20)
+
+    def write(self, message, level="info"):
+        """Queue a message from any thread."""
+        if LOG_LEVELS.get(level, 20) < self.min_level:
+            return
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        self._queue.put((f"[{timestamp}] {level.upper()}: {message}\n", level))
+
+    def attach(self, text_widget):
+        """Start draining into a Text widget. Must be called on the Tk thread."""
+        self.text_widget = text_widget
+        text_widget.tag_config("error", foreground="red")
+        text_widget.tag_config("warning", foreground="orange")
+        self._schedule()
+
+    def detach(self):
+        """Stop draining, write everything still held to the spill file and close it."""
+        if self._after_id and self.text_widget:
+            self.text_widget.after_cancel(self._after_id)
+        self._after_id = None
+        self.text_widget = None
+        if self._spill:
+            # Nothing will reach the panel any more, so the retained tail goes to disk too
+            while not self._queue.empty():
+                self.drain()
+            for message, level in self.lines:
+                self._spill_line(message, level)
+            self._spill.close()
+            self._spill = None
+
+    def clear(self):
+        """Remove all retained lines and clear the widget."""
+        self.lines.clear()
+        if self.text_widget:
+            self.text_widget.config(state=tk.NORMAL)
+            self.text_widget.delete(1.0, tk.END)
+            self.text_widget.config(state=tk.DISABLED)
+
+    def _schedule(self):
+        self._after_id = self.text_widget.after(self.drain_interval_ms, self._drain_loop)
+
+    def _drain_loop(self):
+        if not self.text_widget:
+            return
+        try:
+            self.drain()
+        finally:
+            if self.text_widget:
+                self._schedule()
+
+    def drain(self):
+        """Move queued messages into the widget in a single insert."""
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+
+        # Retain only the newest lines (the deque drops the oldest); spill those to disk first
+        evicted = len(self.lines) + len(batch) - self.max_lines
+        if evicted > 0 and self._spill:
+            for message, level in itertools.islice(itertools.chain(self.lines, batch), evicted):
+                self._spill_line(message, level)
+        self.lines.extend(batch)
+
+        if not self.text_widget:
+            return
+
+        # Only the newest max_lines of this batch can end up visible
+        visible = batch[-self.max_lines:]
+        args = []
+        for message, level in visible:
+            args.extend((message, level if level in ("error", "warning") else ()))
+
+        self.text_widget.config(state=tk.NORMAL)
+        self.text_widget.insert(tk.END, *args)
+
+        line_count = int(self.text_widget.index("end-1c").split(".")[0]) - 1
+        if line_count > self.max_lines:
+            self.text_widget.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+
+        self.text_widget.config(state=tk.DISABLED)
+        self.text_widget.see(tk.END)
+
+    def _spill_line(self, message, level):
+        if not self._spill:
+            return
+        record = logging.LogRecord("video_editor", LOG_LEVELS.get(level, 20), "", 0,
+                                   message.rstrip("\n"), None, None)
+        self._spill.emit(record)
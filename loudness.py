@@ -0,0 +1,202 @@
+"""
+EBU R128 / ITU-R BS.1770 loudness measurement for export normalization.
+
+Source audio is streamed from the video's decoder (decode_backends) in
+fixed-size chunks and K-weighted with vectorized SciPy filters whose state
+carries across chunks, so memory stays bounded however long the file is. The analysis keeps only one mean
+square value and one true-peak value per 100 ms, which is cached per
+source; integrated loudness, loudness range and true peak for any cut of
+the same file are then computed from the cache without rescanning.
+"""
+
+import hashlib
+import os
+import subprocess
+import threading
+from memory_governor import PRIORITY_ANALYSIS, governor
+from utils import find_ffprobe, user_data_path
+
+SAMPLE_RATE = 48000
+SUB_BLOCK = SAMPLE_RATE // 10  # 100 ms
+
+# BS.1770 K-weighting at 48 kHz: high-shelf pre-filter then RLB high-pass
+K_WEIGHTING_SOS = [
+    [1.53512485958697, -2.69169618940638, 1.19839281085285, 1.0, -1.69065929318241, 0.73248077421585],
+    [1.0, -2.0, 1.0, 1.0, -1.99004745483398, 0.99007225036621],
+]
+
+ABSOLUTE_GATE = -70.0
+INTEGRATED_RELATIVE_GATE = -10.0
+RANGE_RELATIVE_GATE = -20.0
+
+def _power_to_lufs(power):
+    import numpy as np
+    return -0.691 + 10 * np.log10(np.maximum(power, 1e-20))
+
+def probe_audio_channels(path):
+    """Number of audio channels in the first audio stream, 0 if none, None if unknown."""
+    ffprobe = find_ffprobe()
+    if not ffprobe:
+        return None
+    output = subprocess.check_output([
+        ffprobe, "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "stream=channels", "-of", "csv=p=0", path
+    ], text=True).strip()
+    return int(output.strip(",")) if output else 0
+
+class LoudnessAnalyzer:
+    def __init__(self, cache_dir=None, chunk_seconds=10):
+        if cache_dir is None:
+            cache_dir = user_data_path("loudness_cache")
+        self.cache_dir = cache_dir
+        self.chunk_seconds = chunk_seconds
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._pool = governor.register("analysis.loudness", PRIORITY_ANALYSIS, self._shrink)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, path):
+        stat = os.stat(path)
+        identity = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        return os.path.join(self.cache_dir, hashlib.sha1(identity.encode()).hexdigest() + ".npz")
+
+    def analyze(self, path):
+        """Return per-100ms (power, true_peak) arrays for the whole source, cached."""
+        import numpy as np
+
+        cache_path = self._cache_path(path)
+        with self._lock:
+            if cache_path in self._memory:
+                return self._memory[cache_path]
+
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as data:
+                result = (data["power"], data["peak"])
+        else:
+            result = self._scan(path)
+            temp_path = cache_path + ".partial.npz"
+            np.savez(temp_path, power=result[0], peak=result[1])
+            os.replace(temp_path, cache_path)
+
+        with self._lock:
+            # Keep only a handful of sources in memory; the disk cache holds the rest
+            if len(self._memory) >= 16:
+                self._memory.pop(next(iter(self._memory)))
+            self._memory[cache_path] = result
+            size = self._memory_bytes()
+        self._pool.report(size)
+        return result
+
+    def _memory_bytes(self):
+        return sum(power.nbytes + peak.nbytes for power, peak in self._memory.values())
+
+    def close(self):
+        """Drop the in-memory measurements and leave the memory budget."""
+        with self._lock:
+            self._memory.clear()
+        self._pool.close()
+
+    def _shrink(self, target):
+        """Memory governor callback: forget the oldest sources; they reload from disk."""
+        with self._lock:
+            while self._memory and self._memory_bytes() > target:
+                self._memory.pop(next(iter(self._memory)))
+            return self._memory_bytes()
+
+    def _scan(self, path):
+        """Stream the source audio once and reduce it to per-100ms statistics."""
+        import numpy as np
+        from scipy import signal
+        from decode_backends import open_decoder
+
+        channels = probe_audio_channels(path)
+        if channels == 0:
+            return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.float32)
+        # Unknown or surround layouts are measured as a stereo downmix
+        if channels is None or channels > 2:
+            channels = 2
+
+        sos = np.array(K_WEIGHTING_SOS)
+        zi = np.zeros((sos.shape[0], 2, channels))
+        chunk_samples = SUB_BLOCK * 10 * self.chunk_seconds
+        leftover = np.zeros((0, channels), dtype=np.float32)
+        powers = []
+        peaks = []
+
+        # Decoded through the shared decode layer, in chunks so memory stays bounded
+        decoder = open_decoder(path)
+        try:
+            for samples in decoder.read_audio(sample_rate=SAMPLE_RATE, channels=channels, chunk_frames=chunk_samples):
+                samples = np.concatenate([leftover, samples])
+
+                # Only whole 100 ms sub-blocks are processed; the rest waits for the next chunk
+                whole = len(samples) - len(samples) % SUB_BLOCK
+                leftover = samples[whole:]
+                samples = samples[:whole]
+                if not whole:
+                    continue
+                blocks = whole // SUB_BLOCK
+
+                weighted, zi = signal.sosfilt(sos, samples, axis=0, zi=zi)
+                # Mean square per channel per sub-block, summed over channels (L/R weight 1.0)
+                powers.append((weighted.reshape(blocks, SUB_BLOCK, channels) ** 2).mean(axis=1).sum(axis=1))
+
+                # True peak from 4x oversampling
+                oversampled = signal.resample_poly(samples, 4, 1, axis=0)
+                peaks.append(np.abs(oversampled).reshape(blocks, SUB_BLOCK * 4 * channels).max(axis=1).astype(np.float32))
+        finally:
+            decoder.close()
+
+        if not powers:
+            return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.float32)
+        return np.concatenate(powers), np.concatenate(peaks)
+
+    def measure(self, path, start_time=0.0, end_time=None):
+        """Integrated loudness (LUFS), loudness range (LU) and true peak (dBTP) of a range."""
+        import numpy as np
+
+        power, peak = self.analyze(path)
+        first = int(start_time * 10)
+        last = len(power) if end_time is None else min(len(power), int(np.ceil(end_time * 10)))
+        power = power[first:last]
+        peak = peak[first:last]
+
+        if len(power) < 4:
+            return {"integrated": None, "range": 0.0, "true_peak": None}
+
+        # 400 ms gating blocks with 75% overlap are the mean of 4 consecutive sub-blocks
+        block_power = np.convolve(power, np.ones(4) / 4, mode="valid")
+        block_lufs = _power_to_lufs(block_power)
+        gated = block_power[block_lufs > ABSOLUTE_GATE]
+        integrated = None
+        if len(gated):
+            relative_gate = _power_to_lufs(gated.mean()) + INTEGRATED_RELATIVE_GATE
+            gated = gated[_power_to_lufs(gated) > relative_gate]
+            if len(gated):
+                integrated = float(_power_to_lufs(gated.mean()))
+
+        # Loudness range from 3 s short-term blocks taken every second
+        loudness_range = 0.0
+        if len(power) >= 30:
+            short_term = np.convolve(power, np.ones(30) / 30, mode="valid")[::10]
+            short_term = short_term[_power_to_lufs(short_term) > ABSOLUTE_GATE]
+            if len(short_term):
+                relative_gate = _power_to_lufs(short_term.mean()) + RANGE_RELATIVE_GATE
+                short_term = short_term[_power_to_lufs(short_term) > relative_gate]
+            if len(short_term):
+                low, high = np.percentile(_power_to_lufs(short_term), [10, 95])
+                loudness_range = float(high - low)
+
+        max_peak = float(peak.max())
+        true_peak = float(20 * np.log10(max_peak)) if max_peak > 0 else None
+
+        return {"integrated": integrated, "range": loudness_range, "true_peak": true_peak}
+
+def normalization_gain(measurement, target_lufs=-14.0, max_true_peak=-1.0):
+    """Gain in dB that brings a measurement to the target without exceeding the peak ceiling."""
+    if measurement["integrated"] is None:
+        return 0.0
+    gain = target_lufs - measurement["integrated"]
+    if measurement["true_peak"] is not None:
+        gain = min(gain, max_true_peak - measurement["true_peak"])
+    return gain
@@ -8,7 +8,7 @@ import tkinter as tk
 import sys
 import os
 import platform
-from video_editor_gui import VideoEditorGUI
+from startup_profiler import StartupProfiler, NullProfiler
 
 def check_environment():
     """Check and configure environment for cross-platform compatibility."""
@@ -29,17 +29,45 @@ def check_environment():
         # Ensure proper focus behavior on macOS
         os.environ['TK_SILENCE_DEPRECATION'] = '1'
 
+def parse_args():
+    """Command-line options."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Voice-Controlled Video Editor")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print a per-import and per-phase startup timing breakdown")
+    parser.add_argument("--trace", nargs="?", const="trace.json", metavar="PATH",
+                        help="record hot-path spans and write a Chrome trace on exit (default: trace.json)")
+    parser.add_argument("--stats-overlay", action="store_true",
+                        help="show the performance overlay on start")
+    parser.add_argument("--api-port", type=int, nargs="?", const=8770, metavar="PORT",
+                        help="start the local automation API (default port: 8770)")
+    return parser.parse_args()
+
 def main():
     """Initialize and run the Video Editor GUI application."""
+    args = parse_args()
+    
+    # Optional per-import and per-phase timing breakdown
+    profile_startup = args.profile_startup
+    trace_path = args.trace
+    profiler = StartupProfiler() if profile_startup else NullProfiler()
+    profiler.install()
+    
     try:
         print("Video Editor GUI - Cross Platform Version")
         print("=" * 45)
         
         # Check environment
-        check_environment()
+        with profiler.phase("check environment"):
+            check_environment()
+        
+        with profiler.phase("import GUI module"):
+            from video_editor_gui import VideoEditorGUI
         
         # Create root window with cross-platform settings
-        root = tk.Tk()
+        with profiler.phase("create root window"):
+            root = tk.Tk()
         
         # Set window properties for better cross-platform behavior
         root.title("Voice-Controlled Video Editor")
@@ -62,14 +90,44 @@ def main():
         
         # Initialize the application
         print("Initializing GUI components...")
-        app = VideoEditorGUI(root)
+        with profiler.phase("build GUI"):
+            app = VideoEditorGUI(root)
+        
+        # Hot-path tracing, exported as Chrome trace JSON on exit
+        if trace_path:
+            from perf_trace import tracer
+            tracer.enable()
+            print(f"Tracing enabled, trace will be written to {trace_path}")
+        if args.stats_overlay:
+            app.toggle_stats_overlay()
+        
+        # Optional local automation API
+        api_port = args.api_port or os.getenv("VIDEO_EDITOR_API_PORT")
+        if api_port:
+            app.start_automation_api(int(api_port), os.getenv("VIDEO_EDITOR_API_TOKEN"))
         
         print("Video Editor GUI started successfully!")
         print("You can now use the application.")
         
+        if profile_startup:
+            def report_startup():
+                profiler.mark("window interactive (since start)")
+                profiler.uninstall()
+                print(profiler.report())
+            
+            # Report once the first frame has been drawn and events are flowing
+            root.after_idle(lambda: root.after(0, report_startup))
+        else:
+            profiler.uninstall()
+        
         # Start the main loop
         root.mainloop()
         
+        if trace_path:
+            from perf_trace import tracer
+            count = tracer.export_chrome_trace(trace_path)
+            print(f"Wrote {count} trace events to {trace_path}")
+        
     except ImportError as e:
         print(f"Missing dependency: {e}")
         print("Please run setup.py to install required packages.")
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+Media library catalog with perceptual-hash duplicate detection.
+
+Folders of clips are indexed into a local SQLite database holding probed
+metadata and, per shot, a small thumbnail and a 64-bit difference hash
+(dHash) of its first keyframe. Only keyframes are decoded, at thumbnail
+size, and a new shot starts wherever the hash jumps. Re-encodes of the
+same footage produce hashes a few bits apart.
+
+Near-duplicate lookups use multi-index hashing: each hash is split into
+four 16-bit bands stored in indexed columns. Two hashes within 3 bits of
+each other must agree exactly on at least one band, so a query only has
+to compare against the rows sharing a band instead of the whole table.
+
+Indexing is incremental: files whose size and modification time are
+unchanged are skipped, and changed files are analyzed by a pool of
+workers while a single writer commits results in batches.
+
+Usage:
+    python media_catalog.py index FOLDER [FOLDER ...]
+    python media_catalog.py dupes FILE
+    python media_catalog.py where FILE TIME
+"""
+
+import argparse
+import concurrent.futures
+import io
+import os
+import queue
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+from utils import find_ffmpeg, probe_media, user_data_path
+
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv", ".webm", ".m4v", ".mpg", ".mpeg", ".mts"}
+
+HASH_BANDS = 4
+BAND_BITS = 64 // HASH_BANDS
+MAX_INDEXED_DISTANCE = HASH_BANDS - 1
+
+THUMBNAIL_WIDTH = 160
+# Hash distance between consecutive keyframes that starts a new shot
+SHOT_CHANGE_DISTANCE = 12
+# Nearly uniform frames (black, fades) all hash alike, so they are not indexed
+MIN_FRAME_CONTRAST = 4.0
+
+SHOWINFO_PTS = re.compile(r"Parsed_showinfo.*\bpts_time:\s*(-?[0-9.]+(?:e[-+]?[0-9]+)?)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL,
+    fps REAL,
+    width INTEGER,
+    height INTEGER,
+    codec TEXT,
+    has_audio INTEGER,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS shots (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    hash INTEGER,
+    band0 INTEGER,
+    band1 INTEGER,
+    band2 INTEGER,
+    band3 INTEGER,
+    thumbnail BLOB
+);
+CREATE INDEX IF NOT EXISTS shots_file ON shots(file_id);
+CREATE INDEX IF NOT EXISTS shots_band0 ON shots(band0);
+CREATE INDEX IF NOT EXISTS shots_band1 ON shots(band1);
+CREATE INDEX IF NOT EXISTS shots_band2 ON shots(band2);
+CREATE INDEX IF NOT EXISTS shots_band3 ON shots(band3);
+"""
+
+def hash_bands(value):
+    """Split a 64-bit hash into its index bands."""
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (BAND_BITS * i)) & mask for i in range(HASH_BANDS)]
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+def difference_hash(image):
+    """64-bit dHash of a PIL image, or None for nearly uniform frames."""
+    from PIL import Image, ImageStat
+
+    gray = image.convert("L")
+    if ImageStat.Stat(gray).stddev[0] < MIN_FRAME_CONTRAST:
+        return None
+    pixels = list(gray.resize((9, 8), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left < right)
+    return value
+
+def _read_frame_times(stream, times):
+    """Collect showinfo's pts_time for each frame, in output order, until ffmpeg exits."""
+    for line in stream:
+        match = SHOWINFO_PTS.search(line)
+        if match:
+            times.put(float(match.group(1)))
+    times.put(None)
+
+def extract_shots(path, info):
+    """
+    Decode keyframes at thumbnail size and group them into shots.
+
+    One ffmpeg pass yields both the pixels (stdout) and each frame's
+    timestamp (showinfo on stderr), so every hash is attached to the time
+    of the frame it was computed from.
+    """
+    from PIL import Image
+
+    width = THUMBNAIL_WIDTH
+    height = max(2, int(round(width * info["height"] / max(info["width"], 1) / 2)) * 2)
+    frame_bytes = width * height * 3
+
+    process = subprocess.Popen([
+        find_ffmpeg(), "-hide_banner", "-nostats", "-v", "info", "-skip_frame", "nokey", "-i", path,
+        "-an", "-fps_mode", "passthrough", "-vf", f"scale={width}:{height},showinfo",
+        "-pix_fmt", "rgb24", "-f", "rawvideo", "-"
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    times = queue.Queue()
+    reader = threading.Thread(
+        target=_read_frame_times, args=(io.TextIOWrapper(process.stderr, errors="replace"), times), daemon=True
+    )
+    reader.start()
+
+    shots = []
+    try:
+        while True:
+            data = process.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            # showinfo logs a frame before it is written out, so its time is already queued
+            keyframe_time = times.get(timeout=30)
+            if keyframe_time is None:
+                break
+            image = Image.frombytes("RGB", (width, height), data)
+            frame_hash = difference_hash(image)
+
+            if shots:
+                current = shots[-1]
+                reference = current["hash"]
+                # Stay in the shot while the picture is similar (or uniform)
+                if frame_hash is None or (reference is not None and hamming(frame_hash, reference) <= SHOT_CHANGE_DISTANCE):
+                    continue
+                if reference is None:
+                    # The shot started on a uniform frame; use its first real picture instead
+                    current["hash"] = frame_hash
+                    current["thumbnail"] = _encode_thumbnail(image)
+                    continue
+                current["end"] = keyframe_time
+
+            shots.append({
+                "start": keyframe_time,
+                "end": info["duration"],
+                "hash": frame_hash,
+                "thumbnail": _encode_thumbnail(image),
+            })
+    except queue.Empty:
+        raise Exception("ffmpeg stopped reporting frame times")
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+        reader.join(timeout=5)
+
+    return shots
+
+def _encode_thumbnail(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+def analyze_file(path, size, mtime_ns):
+    """Probe and hash one file. Runs on an indexer worker."""
+    info = probe_media(path)
+    return {
+        "path": path,
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "info": info,
+        "shots": extract_shots(path, info),
+    }
+
+class MediaCatalog:
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = user_data_path("catalog.sqlite")
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        # WAL lets queries run while the indexer commits
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def file_states(self, root=None):
+        """Map of path -> (size, mtime_ns) for catalogued files, optionally under one folder."""
+        query = "SELECT path, size, mtime_ns FROM files"
+        params = ()
+        if root:
+            query += " WHERE path >= ? AND path < ?"
+            prefix = os.path.join(os.path.abspath(root), "")
+            params = (prefix, prefix + "\uffff")
+        with self._lock:
+            return {row["path"]: (row["size"], row["mtime_ns"]) for row in self._db.execute(query, params)}
+
+    def store(self, records):
+        """Replace the catalog entries for analyzed files in one transaction."""
+        with self._lock, self._db:
+            for record in records:
+                info = record["info"]
+                self._db.execute("DELETE FROM files WHERE path = ?", (record["path"],))
+                cursor = self._db.execute(
+                    "INSERT INTO files (path, size, mtime_ns, duration, fps, width, height, codec, has_audio, indexed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (record["path"], record["size"], record["mtime_ns"], info["duration"], info["fps"],
+                     info["width"], info["height"], info["codec"], int(info["has_audio"]), time.time())
+                )
+                file_id = cursor.lastrowid
+                rows = []
+                for shot in record["shots"]:
+                    value = shot["hash"]
+                    bands = hash_bands(value) if value is not None else [None] * HASH_BANDS
+                    rows.append((file_id, shot["start"], shot["end"],
+                                 _to_signed(value) if value is not None else None, *bands, shot["thumbnail"]))
+                self._db.executemany(
+                    "INSERT INTO shots (file_id, start_time, end_time, hash, band0, band1, band2, band3, thumbnail)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+
+    def remove(self, paths):
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+
+    def get_file(self, path):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM files WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        return dict(row) if row else None
+
+    def shots_for(self, path):
+        """Shots of a catalogued file, in order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT shots.id, start_time, end_time, hash FROM shots JOIN files ON files.id = shots.file_id"
+                " WHERE files.path = ? ORDER BY start_time", (os.path.abspath(path),)
+            ).fetchall()
+        return [
+            {"id": row["id"], "start": row["start_time"], "end": row["end_time"],
+             "hash": _to_unsigned(row["hash"]) if row["hash"] is not None else None}
+            for row in rows
+        ]
+
+    def thumbnail(self, shot_id):
+        """JPEG bytes of a shot's thumbnail."""
+        with self._lock:
+            row = self._db.execute("SELECT thumbnail FROM shots WHERE id = ?", (shot_id,)).fetchone()
+        return row["thumbnail"] if row else None
+
+    def similar_shots(self, value, max_distance=MAX_INDEXED_DISTANCE):
+        """Shots whose hash is within max_distance bits of `value`, nearest first."""
+        if max_distance > MAX_INDEXED_DISTANCE:
+            raise ValueError(f"The hash index only covers distances up to {MAX_INDEXED_DISTANCE}")
+
+        bands = hash_bands(value)
+        condition = " OR ".join(f"band{i} = ?" for i in range(HASH_BANDS))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT shots.id, shots.hash, start_time, end_time, files.path FROM shots"
+                f" JOIN files ON files.id = shots.file_id WHERE {condition}", bands
+            ).fetchall()
+
+        matches = []
+        for row in rows:
+            distance = hamming(value, _to_unsigned(row["hash"]))
+            if distance <= max_distance:
+                matches.append({"id": row["id"], "path": row["path"], "start": row["start_time"],
+                                "end": row["end_time"], "distance": distance})
+        matches.sort(key=lambda match: (match["distance"], match["path"], match["start"]))
+        return matches
+
+    def where_else(self, path, position, max_distance=MAX_INDEXED_DISTANCE):
+        """Other places the shot playing at `position` seconds in `path` appears."""
+        path = os.path.abspath(path)
+        shots = [shot for shot in self.shots_for(path) if shot["start"] <= position and shot["hash"] is not None]
+        if not shots:
+            return []
+        shot = shots[-1]
+        return [match for match in self.similar_shots(shot["hash"], max_distance) if match["id"] != shot["id"]]
+
+    def near_duplicates(self, path, max_distance=MAX_INDEXED_DISTANCE, min_shared=0.5):
+        """Other files sharing at least `min_shared` of this file's shots, best match first."""
+        path = os.path.abspath(path)
+        shots = [shot for shot in self.shots_for(path) if shot["hash"] is not None]
+        if not shots:
+            return []
+
+        shared = {}
+        for shot in shots:
+            # Count each of our shots at most once per other file
+            for other_path in {match["path"] for match in self.similar_shots(shot["hash"], max_distance)}:
+                if other_path != path:
+                    shared[other_path] = shared.get(other_path, 0) + 1
+
+        results = [
+            {"path": other_path, "shared_shots": count, "score": count / len(shots)}
+            for other_path, count in shared.items() if count / len(shots) >= min_shared
+        ]
+        results.sort(key=lambda result: -result["score"])
+        return results
+
+    def stats(self):
+        with self._lock:
+            files = self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            shots = self._db.execute("SELECT COUNT(*) FROM shots").fetchone()[0]
+        return {"files": files, "shots": shots}
+
+class CatalogIndexer:
+    """Walks folders and analyzes new or changed files in parallel."""
+
+    def __init__(self, catalog, workers=None, batch_size=50):
+        self.catalog = catalog
+        self.workers = workers or os.cpu_count() or 2
+        self.batch_size = batch_size
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def scan(self, root, unreadable=None):
+        """
+        Yield (path, size, mtime_ns) for every video file under root.
+        Directories and files that could not be read are appended to
+        `unreadable`, if given.
+        """
+        stack = [os.path.abspath(root)]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                if unreadable is not None:
+                    unreadable.append(directory)
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif os.path.splitext(entry.name)[1].lower() in VIDEO_EXTENSIONS:
+                            stat = entry.stat()
+                            yield entry.path, stat.st_size, stat.st_mtime_ns
+                    except OSError:
+                        if unreadable is not None:
+                            unreadable.append(entry.path)
+                        continue
+
+    def index(self, roots, progress_callback=None):
+        """Bring the catalog up to date with the given folders."""
+        counts = {"scanned": 0, "indexed": 0, "skipped": 0, "failed": 0, "removed": 0}
+        self._cancelled.clear()
+
+        pending = []
+        seen = set()
+        for root in roots:
+            known = self.catalog.file_states(root)
+            unreadable = []
+            for path, size, mtime_ns in self.scan(root, unreadable):
+                counts["scanned"] += 1
+                seen.add(path)
+                if known.get(path) == (size, mtime_ns):
+                    counts["skipped"] += 1
+                else:
+                    pending.append((path, size, mtime_ns))
+            # Files that disappeared from disk leave the catalog too; ones we could not look at stay
+            skipped = set(unreadable)
+            prefixes = tuple(os.path.join(path, "") for path in unreadable)
+            missing = [
+                path for path in known
+                if path not in seen and path not in skipped and not path.startswith(prefixes)
+            ]
+            if missing:
+                self.catalog.remove(missing)
+                counts["removed"] += len(missing)
+
+        batch = []
+        done = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Keep a bounded number of files in flight so huge folders don't queue everything at once
+            queued = iter(pending)
+            in_flight = set()
+            while True:
+                while len(in_flight) < self.workers * 2 and not self._cancelled.is_set():
+                    item = next(queued, None)
+                    if item is None:
+                        break
+                    in_flight.add(executor.submit(analyze_file, *item))
+                if not in_flight:
+                    break
+
+                finished, in_flight = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    done += 1
+                    try:
+                        batch.append(future.result())
+                        counts["indexed"] += 1
+                    except Exception:
+                        counts["failed"] += 1
+
+                if len(batch) >= self.batch_size:
+                    self.catalog.store(batch)
+                    batch = []
+                if progress_callback:
+                    progress_callback(done, len(pending))
+
+        if batch:
+            self.catalog.store(batch)
+        return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Media library catalog")
+    parser.add_argument("--db", help="Catalog database path")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    index_parser = subparsers.add_parser("index", help="Index (or re-index) folders")
+    index_parser.add_argument("folders", nargs="+")
+    index_parser.add_argument("--workers", type=int, default=None)
+
+    dupes_parser = subparsers.add_parser("dupes", help="List near-duplicates of a file")
+    dupes_parser.add_argument("file")
+    dupes_parser.add_argument("--min-shared", type=float, default=0.5)
+
+    where_parser = subparsers.add_parser("where", help="Find other appearances of the shot at a time")
+    where_parser.add_argument("file")
+    where_parser.add_argument("time", type=float)
+
+    args = parser.parse_args()
+    catalog = MediaCatalog(args.db)
+
+    try:
+        if args.mode == "index":
+            started = time.time()
+            indexer = CatalogIndexer(catalog, workers=args.workers)
+            counts = indexer.index(args.folders, progress_callback=lambda done, total: print(
+                f"\rIndexed {done}/{total}", end="", flush=True))
+            elapsed = time.time() - started
+            print(f"\nScanned {counts['scanned']} files in {elapsed:.1f}s: {counts['indexed']} indexed, "
+                  f"{counts['skipped']} unchanged, {counts['failed']} failed, {counts['removed']} removed")
+        elif args.mode == "dupes":
+            for result in catalog.near_duplicates(args.file, min_shared=args.min_shared):
+                print(f"{result['score'] * 100:5.1f}%  {result['path']}")
+        else:
+            for match in catalog.where_else(args.file, args.time):
+                print(f"{match['start']:9.2f}s - {match['end']:9.2f}s  (distance {match['distance']})  {match['path']}")
+    finally:
+        catalog.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Process-wide memory budget for caches and buffers.
+
+Components that hold sizeable memory (decoded frame caches, read-ahead
+buffers, analysis caches, export buffers) register a pool with a priority
+and report their usage as it changes. When the total goes over the budget,
+the governor asks the lowest-priority pools to shrink first, so playback
+and exports keep working while caches degrade. Shrinking is done through a
+callback that drops whatever the pool can rebuild later and returns its new
+usage.
+
+The budget defaults to a quarter of physical memory and can be set with
+VIDEO_EDITOR_MEMORY_MB.
+"""
+
+import contextlib
+import inspect
+import os
+import threading
+import weakref
+
+# Higher numbers are kept longer
+PRIORITY_PLAYBACK = 100
+PRIORITY_EXPORT = 90
+PRIORITY_READ_AHEAD = 60
+PRIORITY_FRAME_CACHE = 40
+PRIORITY_THUMBNAILS = 30
+PRIORITY_ANALYSIS = 20
+
+def default_limit():
+    """VIDEO_EDITOR_MEMORY_MB, else a quarter of physical memory (2 GB if unknown)."""
+    configured = os.getenv("VIDEO_EDITOR_MEMORY_MB")
+    if configured:
+        return int(float(configured) * 1024 * 1024)
+    try:
+        physical = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        return max(physical // 4, 512 * 1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return 2 * 1024 * 1024 * 1024
+
+class MemoryPool:
+    """A component's registration with the governor."""
+
+    def __init__(self, governor, name, priority, shrink):
+        self.governor = governor
+        self.name = name
+        self.priority = priority
+        self.usage = 0
+        self._shrink = shrink
+        self._finalizer = None
+        if inspect.ismethod(shrink):
+            # Held weakly so the governor does not keep the owner alive; the pool
+            # leaves the budget when its owner is collected without closing it
+            self._shrink = weakref.WeakMethod(shrink)
+            self._finalizer = weakref.finalize(shrink.__self__, governor._unregister, self)
+
+    @property
+    def shrink(self):
+        """The shrink callback, or None if the pool has none (or its owner is gone)."""
+        if isinstance(self._shrink, weakref.WeakMethod):
+            return self._shrink()
+        return self._shrink
+
+    def report(self, nbytes):
+        """Set this pool's current usage; may shrink lower-priority pools (or this one)."""
+        self.governor._report(self, nbytes)
+
+    def close(self):
+        if self._finalizer:
+            self._finalizer.detach()
+        self.governor._unregister(self)
+
+class MemoryGovernor:
+    def __init__(self, limit_bytes=None):
+        self.limit = limit_bytes or default_limit()
+        self._pools = []
+        self._lock = threading.Lock()
+
+    def register(self, name, priority, shrink=None):
+        """
+        Register a pool. `shrink(target_bytes)` should free memory down to
+        about target_bytes and return the usage actually left; pools without
+        it are only counted.
+        """
+        pool = MemoryPool(self, name, priority, shrink)
+        with self._lock:
+            self._pools.append(pool)
+        return pool
+
+    def _unregister(self, pool):
+        with self._lock:
+            if pool in self._pools:
+                self._pools.remove(pool)
+
+    @property
+    def total(self):
+        with self._lock:
+            return sum(pool.usage for pool in self._pools)
+
+    def _report(self, pool, nbytes):
+        with self._lock:
+            pool.usage = nbytes
+            over = sum(p.usage for p in self._pools) - self.limit
+        if over > 0:
+            self._relieve(over)
+
+    def _relieve(self, over, below=None):
+        """Shrink pools, lowest priority first, until `over` bytes are freed. Returns what is still over."""
+        with self._lock:
+            candidates = sorted(
+                (p for p in self._pools if p.shrink and p.usage > 0 and (below is None or p.priority < below)),
+                key=lambda p: p.priority
+            )
+        # Callbacks run without the governor lock so pools can take their own locks
+        for pool in candidates:
+            if over <= 0:
+                break
+            shrink = pool.shrink
+            if shrink is None:
+                continue
+            before = pool.usage
+            remaining = shrink(max(0, before - over))
+            with self._lock:
+                pool.usage = remaining
+            over -= before - remaining
+        return over
+
+    @contextlib.contextmanager
+    def reserve(self, name, nbytes, priority=PRIORITY_EXPORT):
+        """Hold `nbytes` for the duration of a block, first making room from lower-priority pools."""
+        pool = self.register(name, priority)
+        with self._lock:
+            pool.usage = nbytes
+            over = sum(p.usage for p in self._pools) - self.limit
+        if over > 0:
+            self._relieve(over, below=priority)
+        try:
+            yield pool
+        finally:
+            pool.close()
+
+    def usage(self):
+        """Current usage per subsystem, plus the total and the limit, in bytes."""
+        with self._lock:
+            pools = list(self._pools)
+        subsystems = {}
+        for pool in pools:
+            entry = subsystems.setdefault(pool.name, {"bytes": 0, "priority": pool.priority, "pools": 0})
+            entry["bytes"] += pool.usage
+            entry["pools"] += 1
+        return {
+            "limit": self.limit,
+            "total": sum(entry["bytes"] for entry in subsystems.values()),
+            "subsystems": subsystems,
+        }
+
+governor = MemoryGovernor()
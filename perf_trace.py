@@ -0,0 +1,155 @@
+"""
+Lightweight timing spans for the playback, export and transcription hot paths.
+
+Tracing is off by default and `span()` then returns a shared no-op context
+manager, so instrumented code pays only a function call and an attribute
+check. When enabled, spans are kept in a bounded ring and can be exported
+as Chrome trace-event JSON (open in chrome://tracing or Perfetto).
+"""
+
+import collections
+import json
+import os
+import threading
+import time
+
+class _NullSpan:
+    """No-op span used while tracing is disabled."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    def __init__(self, tracer, name, category):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        self.tracer._record(self.name, self.category, self.start, end - self.start)
+        return False
+
+class Tracer:
+    def __init__(self, max_events=200000, stats_window=300):
+        self.enabled = False
+        self.pid = os.getpid()
+        self._events = collections.deque(maxlen=max_events)
+        self._durations = collections.defaultdict(lambda: collections.deque(maxlen=stats_window))
+        self._counters = collections.Counter()
+        self._frame_times = collections.deque(maxlen=120)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+
+    def enable(self):
+        """Start recording spans."""
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording spans; recorded data is kept."""
+        self.enabled = False
+
+    def reset(self):
+        """Discard all recorded data."""
+        with self._lock:
+            self._events.clear()
+            self._durations.clear()
+            self._counters.clear()
+            self._frame_times.clear()
+
+    def span(self, name, category="app"):
+        """Return a context manager timing the enclosed block."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category)
+
+    def count(self, name, amount=1):
+        """Increment a named counter (e.g. dropped frames)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] += amount
+            total = self._counters[name]
+            self._events.append(("C", name, "counter", time.perf_counter_ns(), total, threading.get_ident()))
+
+    def frame_presented(self):
+        """Mark that a frame reached the screen, for the fps readout."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._frame_times.append(time.perf_counter())
+
+    def _record(self, name, category, start_ns, duration_ns):
+        with self._lock:
+            self._events.append(("X", name, category, start_ns, duration_ns, threading.get_ident()))
+            self._durations[name].append(duration_ns)
+
+    def fps(self):
+        """Frames presented per second over the recent window."""
+        with self._lock:
+            times = list(self._frame_times)
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def stats(self):
+        """Per-span latency percentiles in milliseconds over the recent window."""
+        with self._lock:
+            snapshot = {name: sorted(values) for name, values in self._durations.items() if values}
+
+        result = {}
+        for name, values in snapshot.items():
+            def percentile(p):
+                return values[min(len(values) - 1, int(p / 100 * len(values)))] / 1e6
+            result[name] = {
+                "count": len(values),
+                "p50_ms": percentile(50),
+                "p95_ms": percentile(95),
+                "p99_ms": percentile(99),
+            }
+        return result
+
+    def counters(self):
+        """Current counter values."""
+        with self._lock:
+            return dict(self._counters)
+
+    def export_chrome_trace(self, path):
+        """Write recorded spans and counters as Chrome trace-event JSON."""
+        with self._lock:
+            events = list(self._events)
+
+        trace_events = []
+        for phase, name, category, start_ns, value, tid in events:
+            timestamp = (start_ns - self._origin) / 1000
+            if phase == "X":
+                trace_events.append({
+                    "name": name, "cat": category, "ph": "X",
+                    "ts": timestamp, "dur": value / 1000,
+                    "pid": self.pid, "tid": tid,
+                })
+            else:
+                trace_events.append({
+                    "name": name, "cat": category, "ph": "C",
+                    "ts": timestamp, "args": {name: value},
+                    "pid": self.pid, "tid": tid,
+                })
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        return len(trace_events)
+
+# Process-wide tracer used by the player, processors and GUI
+tracer = Tracer()
+
+if os.getenv("VIDEO_EDITOR_TRACE"):
+    tracer.enable()
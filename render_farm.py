@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Distributed rendering for video exports.
+
+A coordinator splits an export into keyframe-aligned segments and sends
+them over HTTP to render workers. Workers read the source from shared
+storage and encode the video of their segment into their own scratch
+directory; the coordinator downloads each finished segment from the worker.
+Failed segments are retried on other workers, and a worker that cannot be
+reached is dropped from the rotation. The coordinator then joins the
+segments without re-encoding and adds the audio, encoded once over the
+whole range so there are no gaps at segment boundaries.
+
+Workers listen on localhost unless given --host, and only accept requests
+carrying the shared secret from VIDEO_EDITOR_RENDER_SECRET (a worker
+started without one generates and prints a secret to use).
+
+Usage:
+    python render_farm.py worker --port 8765
+    python render_farm.py render --workers http://host1:8765 http://host2:8765 INPUT START END OUTPUT
+    python render_farm.py local --count 4 INPUT START END OUTPUT
+"""
+
+import argparse
+import hmac
+import http.server
+import json
+import os
+import queue
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from utils import find_ffmpeg, probe_keyframes, validate_time_range
+
+DEFAULT_PORT = 8765
+
+def plan_segments(start_time, end_time, keyframes, target_length=10.0):
+    """Split [start_time, end_time] into segments that begin on keyframes."""
+    if end_time <= start_time:
+        raise Exception("Invalid time codes")
+
+    # Cut at the first keyframe at least target_length after the previous cut
+    cuts = [start_time]
+    candidates = [k for k in keyframes if start_time < k < end_time]
+    if not candidates:
+        # No keyframe information; fall back to evenly spaced cuts
+        t = start_time + target_length
+        while t < end_time - target_length / 2:
+            cuts.append(t)
+            t += target_length
+    else:
+        for keyframe in candidates:
+            if keyframe - cuts[-1] >= target_length and end_time - keyframe >= target_length / 2:
+                cuts.append(keyframe)
+    cuts.append(end_time)
+
+    return [
+        {"index": i, "start": cuts[i], "end": cuts[i + 1]}
+        for i in range(len(cuts) - 1)
+    ]
+
+def render_segment(ffmpeg, input_video, start, end, output_path):
+    """Encode the video of one segment to its own MP4 file (audio is added once, after joining)."""
+    subprocess.check_call([
+        ffmpeg, "-y", "-loglevel", "error",
+        "-ss", f"{start:.6f}", "-i", input_video, "-t", f"{end - start:.6f}",
+        "-an", "-c:v", "libx264", "-preset", "medium", "-pix_fmt", "yuv420p",
+        "-avoid_negative_ts", "make_zero", output_path
+    ])
+
+def add_audio(ffmpeg, video_path, input_video, start, end, output_path, gain_db=0.0):
+    """Copy the joined video and encode the source's audio for [start, end] alongside it in one pass."""
+    cmd = [
+        ffmpeg, "-y", "-loglevel", "error",
+        "-i", video_path,
+        "-ss", f"{start:.6f}", "-t", f"{end - start:.6f}", "-i", input_video,
+        "-map", "0:v:0", "-map", "1:a:0?",
+        "-c:v", "copy", "-c:a", "aac", "-ar", "48000", "-ac", "2",
+    ]
+    if gain_db:
+        cmd += ["-af", f"volume={gain_db:.3f}dB"]
+    cmd += ["-movflags", "+faststart", output_path]
+    subprocess.check_call(cmd)
+
+def concat_segments(ffmpeg, segment_paths, output_path):
+    """Join encoded segments without re-encoding."""
+    list_file = tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False)
+    try:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\n")
+        list_file.close()
+        subprocess.check_call([
+            ffmpeg, "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_file.name,
+            "-c", "copy", "-movflags", "+faststart", output_path
+        ])
+    finally:
+        os.unlink(list_file.name)
+
+def render_secret():
+    """Shared secret between coordinator and workers, from VIDEO_EDITOR_RENDER_SECRET."""
+    return os.getenv("VIDEO_EDITOR_RENDER_SECRET") or None
+
+class WorkerUnreachable(Exception):
+    """The worker could not be contacted (or refused our secret); it will not be tried again."""
+
+class RenderWorkerHandler(http.server.BaseHTTPRequestHandler):
+    """
+    HTTP endpoint of a render worker.
+
+    POST /render renders one segment into the worker's scratch directory and
+    returns its id; GET /segments/<id> downloads it (and removes it from the
+    worker). Both need the shared secret; GET /health does not.
+    """
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        expected = f"Bearer {self.server.secret}".encode()
+        given = self.headers.get("Authorization", "").encode()
+        if not hmac.compare_digest(given, expected):
+            self._reply(401, {"ok": False, "error": "Unauthorized"})
+            return False
+        return True
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, {"ok": True, "busy": self.server.busy})
+        elif self.path.startswith("/segments/"):
+            if self._authorized():
+                self._send_segment(self.path[len("/segments/"):])
+        else:
+            self._reply(404, {"ok": False, "error": "Not found"})
+
+    def _send_segment(self, segment_id):
+        with self.server.segments_lock:
+            path = self.server.segments.pop(segment_id, None)
+        if path is None:
+            self._reply(404, {"ok": False, "error": "Segment not found"})
+            return
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile, 1024 * 1024)
+        finally:
+            os.remove(path)
+
+    def do_POST(self):
+        if self.path != "/render":
+            self._reply(404, {"ok": False, "error": "Not found"})
+            return
+        if not self._authorized():
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = json.loads(self.rfile.read(length))
+            # Only plain files are read; ffmpeg protocols (http:, concat:, ...) are refused
+            input_video = os.path.abspath(job["input"])
+            if not os.path.isfile(input_video):
+                raise Exception(f"Input file not found: {job['input']}")
+
+            # Output always goes to the scratch directory, under a name the worker picks
+            segment_id = uuid.uuid4().hex
+            output_path = os.path.join(self.server.scratch_dir, f"{segment_id}.mp4")
+            started = time.time()
+            with self.server.render_lock:
+                self.server.busy = True
+                try:
+                    render_segment(self.server.ffmpeg, input_video, float(job["start"]), float(job["end"]),
+                                   output_path)
+                except Exception:
+                    if os.path.exists(output_path):
+                        os.remove(output_path)
+                    raise
+                finally:
+                    self.server.busy = False
+            with self.server.segments_lock:
+                self.server.segments[segment_id] = output_path
+            self._reply(200, {"ok": True, "segment": segment_id, "elapsed": time.time() - started})
+        except Exception as e:
+            self._reply(500, {"ok": False, "error": str(e)})
+
+    def log_message(self, format, *args):
+        pass
+
+def run_worker(host="127.0.0.1", port=DEFAULT_PORT, scratch_dir=None):
+    """Serve render requests until interrupted."""
+    secret = render_secret()
+    if not secret:
+        secret = secrets.token_urlsafe(24)
+        print(f"No VIDEO_EDITOR_RENDER_SECRET set; generated one for this worker: {secret}")
+
+    own_scratch = scratch_dir is None
+    if own_scratch:
+        scratch_dir = tempfile.mkdtemp(prefix="render_worker_")
+    os.makedirs(scratch_dir, exist_ok=True)
+
+    server = http.server.ThreadingHTTPServer((host, port), RenderWorkerHandler)
+    server.ffmpeg = find_ffmpeg()
+    server.secret = secret
+    server.scratch_dir = scratch_dir
+    server.segments = {}
+    server.segments_lock = threading.Lock()
+    # One encode at a time per worker; ffmpeg already uses every core
+    server.render_lock = threading.Lock()
+    server.busy = False
+    print(f"Render worker listening on {host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if own_scratch:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+class RenderCoordinator:
+    def __init__(self, workers, segment_length=10.0, max_attempts=3, request_timeout=3600, secret=None):
+        if not workers:
+            raise Exception("No render workers configured")
+        self.workers = [url.rstrip("/") for url in workers]
+        self.segment_length = segment_length
+        self.max_attempts = max_attempts
+        self.request_timeout = request_timeout
+        self.secret = secret or render_secret()
+        if not self.secret:
+            raise Exception("No render secret configured. Set VIDEO_EDITOR_RENDER_SECRET to the workers' secret.")
+
+    def _request(self, worker, path, data=None):
+        """Open an authenticated request; connection failures raise WorkerUnreachable."""
+        headers = {"Authorization": f"Bearer {self.secret}"}
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(f"{worker}{path}", data=data, headers=headers)
+        try:
+            return urllib.request.urlopen(request, timeout=self.request_timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 401:
+                raise WorkerUnreachable(f"{worker} rejected the render secret")
+            raise
+        except (urllib.error.URLError, ConnectionError, socket.timeout) as e:
+            raise WorkerUnreachable(f"{worker} is unreachable: {e}")
+
+    def _post(self, worker, job):
+        try:
+            with self._request(worker, "/render", json.dumps(job).encode()) as response:
+                result = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            result = json.loads(e.read() or b"{}")
+        if not result.get("ok"):
+            raise Exception(result.get("error", "Worker failed"))
+        return result
+
+    def _fetch(self, worker, segment_id, path):
+        """Download a finished segment from the worker's scratch directory."""
+        try:
+            with self._request(worker, f"/segments/{segment_id}") as response, open(path, "wb") as f:
+                shutil.copyfileobj(response, f, 1024 * 1024)
+        except (ConnectionError, socket.timeout) as e:
+            raise WorkerUnreachable(f"{worker} dropped the connection: {e}")
+
+    def render(self, input_video, start_time, end_time, output_path, progress_callback=None, segment_dir=None, gain_db=0.0):
+        """Render [start_time, end_time] of input_video to output_path across workers."""
+        from decode_backends import probe
+
+        input_video = os.path.abspath(input_video)
+        output_path = os.path.abspath(output_path)
+        # Same checks as a local export, so an out-of-range cut fails instead of coming out short
+        validate_time_range(start_time, end_time, probe(input_video)["duration"])
+        segments = plan_segments(start_time, end_time, probe_keyframes(input_video), self.segment_length)
+
+        # Downloaded segments are kept locally until they are joined
+        own_dir = segment_dir is None
+        if own_dir:
+            segment_dir = tempfile.mkdtemp(prefix=".segments_", dir=os.path.dirname(output_path))
+        for segment in segments:
+            segment["output"] = os.path.join(segment_dir, f"segment_{segment['index']:05d}.mp4")
+            segment["attempts"] = 0
+            segment["done"] = False
+            segment["failed_on"] = set()
+
+        pending = queue.Queue()
+        for segment in segments:
+            pending.put(segment)
+
+        lock = threading.Lock()
+        # "raised" holds an exception from progress_callback (e.g. a cancelled job) for render() to re-raise
+        state = {"done": 0, "error": None, "raised": None, "live": set(self.workers), "unreachable": []}
+        total_duration = end_time - start_time
+
+        def worker_loop(worker):
+            while True:
+                with lock:
+                    if state["error"] or state["raised"] or state["done"] == len(segments):
+                        return
+                try:
+                    segment = pending.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+
+                # Prefer leaving a retried segment to a live worker that has not failed it
+                with lock:
+                    others = state["live"] - segment["failed_on"]
+                if worker in segment["failed_on"] and others:
+                    pending.put(segment)
+                    time.sleep(0.05)
+                    continue
+
+                job = {"input": input_video, "start": segment["start"], "end": segment["end"]}
+                try:
+                    result = self._post(worker, job)
+                    self._fetch(worker, result["segment"], segment["output"])
+                except WorkerUnreachable as e:
+                    # Not the segment's fault: hand it back and take this worker out of the rotation
+                    pending.put(segment)
+                    with lock:
+                        state["live"].discard(worker)
+                        state["unreachable"].append(str(e))
+                    print(f"Dropping render worker: {e}")
+                    return
+                except Exception as e:
+                    with lock:
+                        segment["attempts"] += 1
+                        segment["failed_on"].add(worker)
+                        if segment["attempts"] >= self.max_attempts:
+                            state["error"] = f"Segment {segment['index']} failed after {segment['attempts']} attempts: {e}"
+                            return
+                    pending.put(segment)
+                    continue
+
+                with lock:
+                    segment["done"] = True
+                    state["done"] += 1
+                    done_seconds = sum(s["end"] - s["start"] for s in segments if s["done"])
+                if progress_callback:
+                    try:
+                        # Leave the last 15% for joining the segments and adding the audio
+                        progress_callback(0.85 * done_seconds / total_duration)
+                    except BaseException as e:
+                        # Stops every worker loop; render() raises it
+                        with lock:
+                            state["raised"] = e
+                        return
+
+        threads = [threading.Thread(target=worker_loop, args=(worker,), daemon=True) for worker in self.workers]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                # Workers still waiting on a segment stop once it is done; no need to wait for them
+                while thread.is_alive() and not state["raised"]:
+                    thread.join(0.2)
+
+            if state["raised"]:
+                raise state["raised"]
+            if state["error"]:
+                raise Exception(state["error"])
+            if state["done"] < len(segments):
+                raise Exception(f"No render workers left ({'; '.join(state['unreachable'])})")
+
+            ffmpeg = find_ffmpeg()
+            joined_path = os.path.join(segment_dir, "joined.mp4")
+            concat_segments(ffmpeg, [s["output"] for s in segments], joined_path)
+            if progress_callback:
+                progress_callback(0.95)
+            add_audio(ffmpeg, joined_path, input_video, start_time, end_time, output_path, gain_db)
+            if progress_callback:
+                progress_callback(1.0)
+            return True
+        finally:
+            if own_dir:
+                shutil.rmtree(segment_dir, ignore_errors=True)
+
+def start_local_workers(count, base_port=DEFAULT_PORT, secret=None):
+    """Launch worker processes on localhost; returns (processes, urls)."""
+    # Passed through the environment so the secret does not show up in process listings
+    env = dict(os.environ, VIDEO_EDITOR_RENDER_SECRET=secret or render_secret() or "")
+    processes = []
+    urls = []
+    for i in range(count):
+        port = base_port + i
+        processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), "worker",
+                                           "--host", "127.0.0.1", "--port", str(port)], env=env))
+        urls.append(f"http://127.0.0.1:{port}")
+
+    # Wait for every worker to answer its health check
+    deadline = time.time() + 30
+    for url in urls:
+        while True:
+            try:
+                with urllib.request.urlopen(f"{url}/health", timeout=1):
+                    break
+            except Exception:
+                if time.time() > deadline:
+                    for process in processes:
+                        process.terminate()
+                    raise Exception(f"Worker at {url} did not start")
+                time.sleep(0.2)
+    return processes, urls
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed video rendering")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    worker_parser = subparsers.add_parser("worker", help="Run a render worker")
+    worker_parser.add_argument("--host", default="127.0.0.1",
+                               help="Interface to listen on (use 0.0.0.0 to accept other machines)")
+    worker_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    worker_parser.add_argument("--scratch-dir", help="Where segments are rendered (default: a temporary directory)")
+
+    for name, help_text in (("render", "Render using remote workers"), ("local", "Render using workers on this machine")):
+        job_parser = subparsers.add_parser(name, help=help_text)
+        if name == "render":
+            job_parser.add_argument("--workers", nargs="+", required=True, help="Worker URLs")
+        else:
+            job_parser.add_argument("--count", type=int, default=os.cpu_count() or 2, help="Number of local workers")
+            job_parser.add_argument("--base-port", type=int, default=DEFAULT_PORT)
+        job_parser.add_argument("--segment-length", type=float, default=10.0)
+        job_parser.add_argument("input")
+        job_parser.add_argument("start", type=float)
+        job_parser.add_argument("end", type=float)
+        job_parser.add_argument("output")
+
+    args = parser.parse_args()
+
+    if args.mode == "worker":
+        run_worker(args.host, args.port, args.scratch_dir)
+        return
+
+    processes = []
+    secret = render_secret()
+    if args.mode == "local":
+        secret = secret or secrets.token_urlsafe(24)
+        processes, workers = start_local_workers(args.count, args.base_port, secret)
+    else:
+        workers = args.workers
+
+    try:
+        coordinator = RenderCoordinator(workers, segment_length=args.segment_length, secret=secret)
+        started = time.time()
+        coordinator.render(args.input, args.start, args.end, args.output,
+                           progress_callback=lambda p: print(f"\rProgress: {p * 100:5.1f}%", end="", flush=True))
+        print(f"\nRendered {args.output} in {time.time() - started:.1f}s using {len(workers)} worker(s)")
+    finally:
+        for process in processes:
+            process.terminate()
+
+if __name__ == "__main__":
+    main()
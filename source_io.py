@@ -0,0 +1,526 @@
+"""
+Read-ahead I/O for source media on network and slow storage.
+
+Decoders issue many small reads, and each one stalls for a round trip on
+NFS/SMB. This module keeps the storage streaming instead:
+
+- ReadAheadReader is a file object for decoders that accept one (PyAV).
+  Local files are memory-mapped. Network files are read in large chunks
+  by a background thread that stays a bounded window ahead of the
+  consumer. If the consumer jumps elsewhere, the window moves with it.
+- Prefetcher serves decoders that only take a path (OpenCV, MoviePy,
+  ffmpeg). It keeps the OS page cache warm ahead of the play position,
+  using posix_fadvise hints on local disks and background reads on
+  network mounts.
+- StagingCache keeps hot data on local disk with LRU eviction. It holds
+  network chunks read by ReadAheadReader, and whole sources staged
+  before an export.
+
+Time spent waiting on reads and the staging/read-ahead hit rate are
+accumulated in `io_stats`.
+"""
+
+import collections
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import time
+from memory_governor import PRIORITY_READ_AHEAD, governor
+from utils import user_data_path
+
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p", "afs", "ceph", "glusterfs"}
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Exports stage a network source locally only if the cut covers at least this fraction of it
+STAGE_MIN_FRACTION = 0.5
+
+class IOStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.read_wait = 0.0
+            self.bytes_read = 0
+            self.hits = 0
+            self.misses = 0
+
+    def record(self, wait=0.0, nbytes=0, hit=None):
+        with self._lock:
+            self.read_wait += wait
+            self.bytes_read += nbytes
+            if hit is True:
+                self.hits += 1
+            elif hit is False:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "read_wait_s": self.read_wait,
+                "bytes_read": self.bytes_read,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+io_stats = IOStats()
+
+_mounts = None
+
+def _load_mounts():
+    mounts = []
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3:
+                    mounts.append((fields[1].replace("\\040", " "), fields[2]))
+    except OSError:
+        pass
+    # Longest mount point first so nested mounts win
+    mounts.sort(key=lambda mount: len(mount[0]), reverse=True)
+    return mounts
+
+def is_network_path(path):
+    """Whether `path` lives on a network filesystem."""
+    global _mounts
+    path = os.path.abspath(path)
+    if path.startswith("\\\\"):
+        # Windows UNC share
+        return True
+    if _mounts is None:
+        _mounts = _load_mounts()
+    for mount_point, fs_type in _mounts:
+        if path == mount_point or path.startswith(mount_point.rstrip("/") + "/"):
+            return fs_type in NETWORK_FILESYSTEMS
+    return False
+
+def advise(fd, offset, length, advice):
+    """posix_fadvise where the platform supports it; a no-op elsewhere."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, offset, length, getattr(os, advice))
+        except (OSError, AttributeError):
+            pass
+
+def source_key(path):
+    """Stable identity of a source file's current contents."""
+    stat = os.stat(path)
+    identity = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+class StagingCache:
+    """Local-disk LRU of staged source data (whole files or chunks)."""
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        if cache_dir is None:
+            cache_dir = os.getenv("VIDEO_EDITOR_STAGING_DIR") or user_data_path("staging")
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("VIDEO_EDITOR_STAGING_GB", "20")) * 1024 ** 3)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Entries in least-recently-used order, rebuilt from file times on start
+        entries = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            # Another process may evict or finish writing entries while we look
+            try:
+                stat = os.stat(path)
+                if name.endswith(".partial"):
+                    # Leftover from an interrupted copy (recent ones may belong to another process)
+                    if time.time() - stat.st_mtime > 3600:
+                        os.remove(path)
+                    continue
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+        self._entries = collections.OrderedDict((name, size) for _, name, size in sorted(entries))
+        self._bytes = sum(self._entries.values())
+
+    def lookup(self, name):
+        """Path of a staged entry, marking it recently used, or None."""
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        path = os.path.join(self.cache_dir, name)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._bytes -= self._entries.pop(name, 0)
+            return None
+        return path
+
+    def read(self, name):
+        path = self.lookup(name)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, name, data):
+        """Stage bytes under `name`."""
+        def write(temp_path):
+            with open(temp_path, "wb") as f:
+                f.write(data)
+        return self.put_with(name, len(data), write)
+
+    def put_with(self, name, size, write):
+        """Stage an entry produced by write(temp_path); returns its path, or None if it does not fit."""
+        if size > self.max_bytes:
+            return None
+        self._make_room(size)
+        path = os.path.join(self.cache_dir, name)
+        # Unique per writer, so concurrent stages of the same entry do not share a temp file
+        fd, temp_path = tempfile.mkstemp(prefix=name + ".", suffix=".partial", dir=self.cache_dir)
+        os.close(fd)
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        except BaseException as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if isinstance(e, OSError):
+                return None
+            raise
+        with self._lock:
+            self._bytes += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+        return path
+
+    def _make_room(self, size):
+        with self._lock:
+            while self._entries and self._bytes + size > self.max_bytes:
+                name, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def stage_file(self, path, chunk_size=16 * 1024 * 1024, progress_callback=None):
+        """
+        Local copy of a whole source, made with large sequential reads. None
+        if it cannot be staged. `progress_callback(fraction)` follows the copy.
+        """
+        key = source_key(path)
+        name = key + os.path.splitext(path)[1].lower()
+        staged = self.lookup(name)
+        if staged:
+            io_stats.record(hit=True)
+            return staged
+        io_stats.record(hit=False)
+
+        size = os.path.getsize(path)
+
+        def copy(temp_path):
+            copied = 0
+            with open(path, "rb") as source, open(temp_path, "wb") as target:
+                advise(source.fileno(), 0, 0, "POSIX_FADV_SEQUENTIAL")
+                while True:
+                    started = time.perf_counter()
+                    data = source.read(chunk_size)
+                    io_stats.record(wait=time.perf_counter() - started, nbytes=len(data))
+                    if not data:
+                        break
+                    target.write(data)
+                    copied += len(data)
+                    if progress_callback and size:
+                        progress_callback(min(copied / size, 1.0))
+        return self.put_with(name, size, copy)
+
+class ReadAheadReader:
+    """Seekable, read-only file object with large sequential read-ahead."""
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE, max_chunks=16, staging=None, network=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.staging = staging
+        self.size = os.path.getsize(path)
+        self.network = is_network_path(path) if network is None else network
+        self._position = 0
+        self._closed = False
+
+        self._file = open(path, "rb")
+        self._mmap = None
+        if not self.network and self.size:
+            # Local files: let the kernel page in behind a read-only mapping
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self._mmap, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+            return
+
+        advise(self._file.fileno(), 0, 0, "POSIX_FADV_SEQUENTIAL")
+        self._key = source_key(path) if staging else None
+        self._chunks = collections.OrderedDict()
+        self._buffered = 0
+        self._window = max_chunks  # shrinks under memory pressure
+        self._lock = threading.Condition()
+        self._want = 0  # chunk index the consumer is reading
+        self._pool = governor.register("io.read_ahead", PRIORITY_READ_AHEAD, self._shrink)
+        self._thread = threading.Thread(target=self._fill_loop, daemon=True)
+        self._thread.start()
+
+    # File object protocol
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def writable(self):
+        return False
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self._position = max(0, offset)
+        return self._position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self._position
+        size = min(size, max(0, self.size - self._position))
+        if size == 0:
+            return b""
+
+        if self._mmap is not None:
+            data = self._mmap[self._position:self._position + size]
+            self._position += len(data)
+            return data
+
+        parts = []
+        while size > 0:
+            index, offset = divmod(self._position, self.chunk_size)
+            chunk = self._chunk(index)
+            part = chunk[offset:offset + size]
+            if not part:
+                break
+            parts.append(part)
+            self._position += len(part)
+            size -= len(part)
+        return b"".join(parts)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._mmap is not None:
+            self._mmap.close()
+        else:
+            with self._lock:
+                self._lock.notify_all()
+            self._thread.join(timeout=1)
+            with self._lock:
+                self._chunks.clear()
+                self._buffered = 0
+            self._pool.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # Read-ahead
+
+    def _chunk(self, index):
+        """Chunk `index`, waiting for the read-ahead thread if it is not buffered yet."""
+        with self._lock:
+            if index in self._chunks:
+                io_stats.record(hit=True)
+                self._chunks.move_to_end(index)
+                self._want = index
+                self._lock.notify_all()
+                return self._chunks[index]
+
+            io_stats.record(hit=False)
+            self._want = index
+            self._lock.notify_all()
+            started = time.perf_counter()
+            while index not in self._chunks and not self._closed:
+                self._lock.wait(0.5)
+            io_stats.record(wait=time.perf_counter() - started)
+            return self._chunks.get(index, b"")
+
+    def _next_missing(self):
+        """First chunk at or after the consumer that is not buffered, within the window."""
+        last = (self.size - 1) // self.chunk_size
+        for index in range(self._want, min(self._want + self._window, last + 1)):
+            if index not in self._chunks:
+                return index
+        return None
+
+    def _fill_loop(self):
+        while True:
+            with self._lock:
+                while not self._closed and self._next_missing() is None:
+                    self._lock.wait(0.5)
+                if self._closed:
+                    return
+                index = self._next_missing()
+                # Make room by dropping chunks outside the window, least recently used first
+                while len(self._chunks) >= self._window:
+                    self._drop_one()
+                # Win back window space given up under memory pressure once there is headroom again
+                if self._window < self.max_chunks and governor.total + self.chunk_size <= governor.limit * 3 // 4:
+                    self._window += 1
+
+            data = self._load_chunk(index)
+            with self._lock:
+                self._buffered += len(data) - len(self._chunks.pop(index, b""))
+                self._chunks[index] = data
+                self._lock.notify_all()
+                buffered = self._buffered
+            self._pool.report(buffered)
+
+    def _drop_one(self):
+        # Outside the window first, then anything but the chunk the consumer is on
+        candidates = ([i for i in self._chunks if not self._want <= i < self._want + self._window]
+                      or [i for i in self._chunks if i != self._want] or list(self._chunks))
+        self._buffered -= len(self._chunks.pop(candidates[0]))
+
+    def _shrink(self, target):
+        """Memory governor callback: narrow the read-ahead window and drop buffered chunks."""
+        with self._lock:
+            self._window = max(2, min(self._window, target // self.chunk_size))
+            while self._buffered > target and len(self._chunks) > 1:
+                self._drop_one()
+            return self._buffered
+
+    def _load_chunk(self, index):
+        name = f"{self._key}.{index}.chunk" if self.staging else None
+        if name:
+            data = self.staging.read(name)
+            if data is not None:
+                return data
+        self._file.seek(index * self.chunk_size)
+        data = self._file.read(self.chunk_size)
+        io_stats.record(nbytes=len(data))
+        if name and data:
+            self.staging.put(name, data)
+        return data
+
+class Prefetcher:
+    """Keeps the page cache warm ahead of a path-based decoder's read position."""
+
+    def __init__(self, path, window_bytes=64 * 1024 * 1024, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.window_bytes = window_bytes
+        self.chunk_size = chunk_size
+        self.size = os.path.getsize(path)
+        self.network = is_network_path(path)
+        self._file = open(path, "rb")
+        self._target = 0
+        self._done_until = 0
+        self._last_offset = None
+        self._closed = False
+        self._wake = threading.Condition()
+        self._thread = None
+        if self.network:
+            self._thread = threading.Thread(target=self._read_loop, daemon=True)
+            self._thread.start()
+        self.update(0.0)
+
+    def update(self, fraction):
+        """Report the decoder's approximate position as a fraction of the file."""
+        offset = int(max(0.0, min(fraction, 1.0)) * self.size)
+        # Called per frame; only act once the position has moved a chunk or jumped back
+        if self._last_offset is not None and 0 <= offset - self._last_offset < self.chunk_size:
+            return
+        self._last_offset = offset
+        if self.network:
+            with self._wake:
+                if not (self._target <= offset < self._done_until):
+                    # Jumped outside the warmed range; start over from here
+                    self._done_until = offset
+                self._target = offset
+                self._wake.notify_all()
+        else:
+            advise(self._file.fileno(), offset, self.window_bytes, "POSIX_FADV_WILLNEED")
+
+    def _read_loop(self):
+        """Read the window ahead of the target; the data lands in the OS page cache."""
+        while True:
+            with self._wake:
+                while not self._closed and (self._done_until >= min(self._target + self.window_bytes, self.size)):
+                    self._wake.wait(0.5)
+                if self._closed:
+                    return
+                offset = self._done_until
+            started = time.perf_counter()
+            self._file.seek(offset)
+            data = self._file.read(self.chunk_size)
+            io_stats.record(wait=time.perf_counter() - started, nbytes=len(data))
+            with self._wake:
+                if self._done_until == offset:
+                    self._done_until = offset + max(len(data), 1)
+
+    def close(self):
+        self._closed = True
+        if self._thread:
+            with self._wake:
+                self._wake.notify_all()
+            self._thread.join(timeout=1)
+        self._file.close()
+
+_staging = None
+_staging_lock = threading.Lock()
+
+def get_staging_cache():
+    """Shared staging cache, or None when disabled with VIDEO_EDITOR_STAGING_GB=0."""
+    global _staging
+    with _staging_lock:
+        if _staging is None and float(os.getenv("VIDEO_EDITOR_STAGING_GB", "20")) > 0:
+            _staging = StagingCache()
+        return _staging
+
+def open_source(path):
+    """File object for a source, with read-ahead (and staging) on network storage."""
+    network = is_network_path(path)
+    return ReadAheadReader(path, staging=get_staging_cache() if network else None, network=network)
+
+def local_source(path, start_time=None, end_time=None, duration=None, progress_callback=None):
+    """
+    Path to export from. Network sources are copied to the staging cache
+    first when the cut [start_time, end_time] covers most of a `duration`
+    seconds long file (or no range is given) and the copy fits; a short cut
+    is read straight from the share, since copying the whole file would
+    take longer than reading just the part needed. `progress_callback`
+    follows the copy.
+    """
+    if not is_network_path(path):
+        return path
+    staging = get_staging_cache()
+    if staging is None:
+        return path
+    if None not in (start_time, end_time) and duration:
+        if (end_time - start_time) / duration < STAGE_MIN_FRACTION:
+            return path
+    return staging.stage_file(path, progress_callback=progress_callback) or path
@@ -0,0 +1,104 @@
+"""
+Startup timing for the Video Editor GUI.
+Records how long each module import and each startup phase takes so slow
+launches can be diagnosed with `python main.py --profile-startup`.
+"""
+
+import builtins
+import sys
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.phases = []
+        self.imports = []
+        self._depth = 0
+        self._original_import = None
+
+    def install(self):
+        """Start timing first-time imports."""
+        if self._original_import is not None:
+            return
+        self._original_import = builtins.__import__
+        original_import = self._original_import
+        profiler = self
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            # Only time modules that are not loaded yet; cached imports are free
+            if level != 0 or name in sys.modules:
+                return original_import(name, globals, locals, fromlist, level)
+
+            profiler._depth += 1
+            start = time.perf_counter()
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                elapsed = time.perf_counter() - start
+                profiler._depth -= 1
+                profiler.imports.append((name, elapsed, profiler._depth))
+
+        builtins.__import__ = timed_import
+
+    def uninstall(self):
+        """Stop timing imports."""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    @contextmanager
+    def phase(self, name):
+        """Time a named startup phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def mark(self, name):
+        """Record a point in time relative to profiler creation."""
+        self.phases.append((name, time.perf_counter() - self.start_time))
+
+    def report(self, min_import_ms=1.0, top_level_only=True):
+        """Build a printable timing breakdown."""
+        lines = ["Startup profile", "=" * 45, "Phases:"]
+        for name, elapsed in self.phases:
+            lines.append(f"  {name:<32} {elapsed * 1000:8.1f} ms")
+
+        lines.append("Imports (first load, inclusive):")
+        shown = 0
+        for name, elapsed, depth in sorted(self.imports, key=lambda item: -item[1]):
+            if top_level_only and depth > 0:
+                continue
+            if elapsed * 1000 < min_import_ms:
+                continue
+            lines.append(f"  {name:<32} {elapsed * 1000:8.1f} ms")
+            shown += 1
+        if not shown:
+            lines.append("  (none above threshold)")
+
+        total = time.perf_counter() - self.start_time
+        lines.append(f"Total since start: {total * 1000:.1f} ms")
+        return "\n".join(lines)
+
+
+class NullProfiler:
+    """Stand-in used when startup profiling is disabled."""
+
+    def install(self):
+        pass
+
+    def uninstall(self):
+        pass
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def mark(self, name):
+        pass
+
+    def report(self, *args, **kwargs):
+        return ""
@@ -0,0 +1,81 @@
+import tkinter as tk
+from memory_governor import governor
+from perf_trace import tracer
+from source_io import io_stats
+
+# Spans shown in the overlay, in pipeline order
+OVERLAY_SPANS = [
+    ("decode", "player.decode"),
+    ("convert", "player.convert"),
+    ("resize", "player.resize"),
+    ("blit", "player.blit"),
+]
+
+class StatsOverlay:
+    def __init__(self, parent_frame, refresh_ms=500):
+        self.parent_frame = parent_frame
+        self.refresh_ms = refresh_ms
+        self.visible = False
+        self._after_id = None
+
+        self.label = tk.Label(
+            parent_frame, justify=tk.LEFT, anchor=tk.NW,
+            bg='black', fg='#00ff00', font=('Courier', 9)
+        )
+
+    def show(self):
+        """Show the overlay and start refreshing it."""
+        if self.visible:
+            return
+        tracer.enable()
+        self.visible = True
+        self.label.place(x=5, y=5)
+        self.label.lift()
+        self._refresh()
+
+    def hide(self):
+        """Hide the overlay. Tracing stays enabled."""
+        self.visible = False
+        if self._after_id:
+            self.parent_frame.after_cancel(self._after_id)
+            self._after_id = None
+        self.label.place_forget()
+
+    def toggle(self):
+        """Toggle overlay visibility."""
+        if self.visible:
+            self.hide()
+        else:
+            self.show()
+
+    def _refresh(self):
+        """Redraw the overlay text from the tracer's recent window."""
+        if not self.visible:
+            return
+
+        stats = tracer.stats()
+        counters = tracer.counters()
+        lines = [
+            f"fps {tracer.fps():5.1f}   dropped {counters.get('player.dropped_frames', 0)}",
+            "stage     p50    p95   (ms)",
+        ]
+        for label, name in OVERLAY_SPANS:
+            stage = stats.get(name)
+            if stage:
+                lines.append(f"{label:<7} {stage['p50_ms']:6.2f} {stage['p95_ms']:6.2f}")
+            else:
+                lines.append(f"{label:<7}    -      -")
+
+        io = io_stats.snapshot()
+        hit_rate = f"{io['hit_rate'] * 100:3.0f}%" if io["hit_rate"] is not None else "  -"
+        lines.append(f"io wait {io['read_wait_s'] * 1000:7.0f}ms  hit {hit_rate}")
+
+        memory = governor.usage()
+        lines.append(f"mem {memory['total'] / 2**20:6.0f} / {memory['limit'] / 2**20:.0f} MB")
+        for name, entry in sorted(memory["subsystems"].items(), key=lambda item: -item[1]["bytes"]):
+            if entry["bytes"]:
+                lines.append(f"  {name:<20} {entry['bytes'] / 2**20:6.1f}")
+
+        self.label.config(text="\n".join(lines))
+        self.label.lift()
+        self._after_id = self.parent_frame.after(self.refresh_ms, self._refresh)
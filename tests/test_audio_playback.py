@@ -0,0 +1,56 @@
+import threading
+import time
+
+import numpy as np
+
+from audio_playback import AudioPlayback
+
+class FakeDecoder:
+    """Endless audio whose samples hold the position decoding started at; notes open and closed decodes."""
+
+    def __init__(self):
+        self.open_decodes = 0
+        self.threads = set()
+
+    def read_audio(self, start_time=0.0, end_time=None, sample_rate=48000, channels=2, chunk_frames=4096):
+        self.open_decodes += 1
+        self.threads.add(threading.current_thread())
+        try:
+            while True:
+                time.sleep(0.001)
+                yield np.full((chunk_frames, channels), start_time, dtype=np.float32)
+        finally:
+            self.open_decodes -= 1
+
+def start(playback, decoder):
+    # What open() does, minus the sound device
+    playback.decoder = decoder
+    playback._reader = threading.Thread(target=playback._read_loop, daemon=True)
+    playback._reader.start()
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+def test_seek_hands_off_to_the_reader():
+    playback = AudioPlayback(buffer_seconds=0.5)
+    decoder = FakeDecoder()
+    start(playback, decoder)
+    try:
+        playback.seek(1.0)
+        assert wait_for(lambda: playback._buffered >= playback.max_buffered)
+
+        started = time.perf_counter()
+        playback.seek(5.0)
+        assert time.perf_counter() - started < 0.01
+        assert wait_for(lambda: playback._chunks and playback._chunks[0][0, 0] == 5.0)
+        with playback._lock:
+            assert all(chunk[0, 0] == 5.0 for chunk in playback._chunks)
+        # The old decode was closed, by the reader thread itself
+        assert wait_for(lambda: decoder.open_decodes == 1)
+        assert decoder.threads == {playback._reader}
+    finally:
+        playback.close()
+    assert decoder.open_decodes == 0
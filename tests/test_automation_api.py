@@ -0,0 +1,30 @@
+import time
+
+from automation_api import EventHub, JobManager
+
+class RecordingProcessor:
+    def __init__(self):
+        self.loudness_target = None
+        self.exports = []
+
+    def edit_video(self, input_video, start_time, end_time, output_path, progress_callback=None):
+        self.exports.append((output_path, self.loudness_target))
+
+def wait_for(jobs, job):
+    deadline = time.time() + 5
+    while job.status in ("queued", "running") and time.time() < deadline:
+        time.sleep(0.01)
+    return job.status
+
+def test_jobs_carry_their_loudness_target(tmp_path):
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"x")
+    processor = RecordingProcessor()
+    jobs = JobManager(lambda: processor, EventHub(), workers=1)
+
+    normalized = jobs.submit(str(source), 0, 1, "a.mp4", loudness_target=-14.0)
+    plain = jobs.submit(str(source), 0, 1, "b.mp4")
+    assert wait_for(jobs, normalized) == "done"
+    assert wait_for(jobs, plain) == "done"
+    assert processor.exports == [("a.mp4", -14.0), ("b.mp4", None)]
+    assert normalized.to_dict()["loudness"] == -14.0
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from gop_cache import GOPCache
+
+class FakeDecoder:
+    """Decodes frame N as a 1x1 frame holding N, counting frames read."""
+
+    def __init__(self, total_frames):
+        self.total_frames = total_frames
+        self.position = 0
+        self.frames_read = 0
+
+    def seek_frame(self, index):
+        self.position = index
+
+    def read_frame(self):
+        if self.position >= self.total_frames:
+            return None
+        frame = np.full((1, 1, 3), self.position, dtype=np.int64)
+        self.position += 1
+        self.frames_read += 1
+        return frame
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def make_cache():
+    caches = []
+
+    def make(total_frames, keyframes=None, max_block_frames=32):
+        decoder = FakeDecoder(total_frames)
+        cache = GOPCache(lambda: decoder, lambda frame: frame, total_frames, max_block_frames)
+        if keyframes is not None:
+            cache.set_keyframes(keyframes)
+        caches.append(cache)
+        return cache, decoder
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+def test_block_range_follows_keyframes(make_cache):
+    cache, _ = make_cache(100, keyframes=[0, 10, 25])
+    assert cache.block_range(0) == (0, 10)
+    assert cache.block_range(9) == (0, 10)
+    assert cache.block_range(10) == (10, 25)
+    assert cache.block_range(30) == (25, 57)
+    assert cache.block_range(99) == (89, 100)
+
+def test_long_gops_are_split_into_sub_blocks(make_cache):
+    cache, _ = make_cache(300, keyframes=[0, 250], max_block_frames=32)
+    assert cache.block_range(31) == (0, 32)
+    assert cache.block_range(32) == (32, 64)
+    assert cache.block_range(249) == (224, 250)
+    assert cache.block_range(250) == (250, 282)
+
+def test_unknown_gops_use_fixed_blocks(make_cache):
+    cache, _ = make_cache(100, max_block_frames=16)
+    assert cache.block_range(0) == (0, 16)
+    assert cache.block_range(47) == (32, 48)
+    assert cache.block_range(99) == (96, 100)
+
+def test_keyframes_out_of_range_are_ignored(make_cache):
+    cache, _ = make_cache(50, keyframes=[-5, 0, 20, 20, 80])
+    assert cache.keyframes == [0, 20]
+
+def test_get_returns_frames_and_decodes_each_once(make_cache):
+    cache, decoder = make_cache(40, keyframes=[0, 20], max_block_frames=32)
+    # Background prefetch of the previous block would make the counts racy
+    cache.prefetch = lambda index: None
+    for index in range(39, 19, -1):
+        assert cache.get(index)[0, 0, 0] == index
+    assert decoder.frames_read == 20
+    assert cache.size_bytes == 20 * 3 * 8
+
+def test_shrink_keeps_the_two_newest_blocks(make_cache):
+    cache, _ = make_cache(40, keyframes=[0, 10, 20, 30])
+    cache.prefetch = lambda index: None
+    for index in (35, 25, 15, 5):
+        cache.get(index)
+    assert cache._shrink(0) == 20 * 3 * 8
+    assert list(cache._blocks) == [10, 0]
+
+def test_long_gop_is_decoded_in_one_pass(make_cache):
+    cache, decoder = make_cache(300, keyframes=[0, 250], max_block_frames=32)
+    cache.prefetch = lambda index: None
+    for index in range(249, -1, -1):
+        assert cache.get(index)[0, 0, 0] == index
+    # Every sub-block came out of the pass started for the GOP's last one
+    assert decoder.frames_read == 250
+    assert sorted(cache._blocks) == list(range(0, 250, 32))
+
+def test_unknown_gops_decode_only_the_block(make_cache):
+    cache, decoder = make_cache(1000, max_block_frames=16)
+    cache.prefetch = lambda index: None
+    assert cache.get(999)[0, 0, 0] == 999
+    assert decoder.frames_read == 8
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from loudness import K_WEIGHTING_SOS, SAMPLE_RATE, LoudnessAnalyzer, _power_to_lufs, normalization_gain
+
+def lufs_to_power(lufs):
+    return 10 ** ((lufs + 0.691) / 10)
+
+def sine(frequency, seconds=1.0):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return np.sin(2 * np.pi * frequency * t)
+
+def k_weighted_lufs(samples):
+    signal = pytest.importorskip("scipy.signal")
+    weighted = signal.sosfilt(np.array(K_WEIGHTING_SOS), samples)
+    # Skip the filter's settling time
+    return float(_power_to_lufs((weighted[SAMPLE_RATE // 2:] ** 2).mean()))
+
+def test_k_weighting_full_scale_1khz_sine():
+    # BS.1770 reference: a 0 dBFS 1 kHz sine in one channel measures -3.01 LKFS
+    assert k_weighted_lufs(sine(1000)) == pytest.approx(-3.01, abs=0.05)
+
+def test_k_weighting_shelves_and_cuts():
+    reference = k_weighted_lufs(sine(1000))
+    # The +4 dB high shelf already lifts 1 kHz by about 0.7 dB; below 100 Hz the high-pass cuts hard
+    assert k_weighted_lufs(sine(8000)) - reference == pytest.approx(3.3, abs=0.1)
+    assert k_weighted_lufs(sine(20)) - reference < -10
+
+@pytest.fixture
+def analyzer(tmp_path):
+    analyzer = LoudnessAnalyzer(cache_dir=str(tmp_path))
+    yield analyzer
+    analyzer.close()
+
+def measure(analyzer, monkeypatch, levels, **kwargs):
+    """Measure per-100ms sub-blocks at the given loudness levels (None for silence)."""
+    power = np.array([0.0 if level is None else lufs_to_power(level) for level in levels])
+    peak = np.full(len(power), 0.5, dtype=np.float32)
+    monkeypatch.setattr(analyzer, "analyze", lambda path: (power, peak))
+    return analyzer.measure("source.mp4", **kwargs)
+
+def test_constant_level(analyzer, monkeypatch):
+    result = measure(analyzer, monkeypatch, [-23.0] * 100)
+    assert result["integrated"] == pytest.approx(-23.0)
+    assert result["range"] == pytest.approx(0.0, abs=1e-6)
+    assert result["true_peak"] == pytest.approx(20 * np.log10(0.5))
+
+def test_absolute_gate_ignores_silence(analyzer, monkeypatch):
+    result = measure(analyzer, monkeypatch, [-23.0] * 100 + [None] * 100)
+    assert result["integrated"] == pytest.approx(-23.0, abs=0.1)
+
+def test_relative_gate_ignores_quiet_passages(analyzer, monkeypatch):
+    # -40 LUFS is more than 10 LU below the ungated mean, so it is gated out
+    result = measure(analyzer, monkeypatch, [-23.0] * 100 + [-40.0] * 100)
+    assert result["integrated"] == pytest.approx(-23.0, abs=0.1)
+
+def test_relative_gate_keeps_nearby_levels(analyzer, monkeypatch):
+    result = measure(analyzer, monkeypatch, [-20.0] * 100 + [-26.0] * 100)
+    expected = _power_to_lufs((lufs_to_power(-20.0) + lufs_to_power(-26.0)) / 2)
+    assert result["integrated"] == pytest.approx(expected, abs=0.1)
+
+def test_measure_uses_only_the_cut(analyzer, monkeypatch):
+    result = measure(analyzer, monkeypatch, [-30.0] * 100 + [-15.0] * 100, start_time=10.0, end_time=20.0)
+    assert result["integrated"] == pytest.approx(-15.0)
+
+def test_silence_has_no_integrated_loudness(analyzer, monkeypatch):
+    result = measure(analyzer, monkeypatch, [None] * 100)
+    assert result["integrated"] is None
+    assert normalization_gain(result) == 0.0
+
+def test_normalization_gain_respects_true_peak():
+    assert normalization_gain({"integrated": -20.0, "true_peak": -10.0}, -14.0) == pytest.approx(6.0)
+    assert normalization_gain({"integrated": -20.0, "true_peak": -3.0}, -14.0) == pytest.approx(2.0)
+
+def test_scan_reads_audio_through_the_decoder(analyzer, monkeypatch):
+    pytest.importorskip("scipy.signal")
+    import decode_backends
+    import loudness
+
+    class FakeDecoder:
+        closed = False
+
+        def read_audio(self, start_time=0.0, end_time=None, sample_rate=48000, channels=2, chunk_frames=4096):
+            # 2 s of a full-scale 1 kHz sine in the left channel, in uneven chunks
+            samples = np.zeros((2 * SAMPLE_RATE, channels), dtype=np.float32)
+            samples[:, 0] = sine(1000, 2.0)
+            for start in range(0, len(samples), 7000):
+                yield samples[start:start + 7000]
+
+        def close(self):
+            FakeDecoder.closed = True
+
+    monkeypatch.setattr(loudness, "probe_audio_channels", lambda path: 2)
+    monkeypatch.setattr(decode_backends, "open_decoder", lambda path: FakeDecoder())
+    power, peak = analyzer._scan("source.mp4")
+    assert len(power) == 20
+    assert FakeDecoder.closed
+    # Past the filter's settling time, each sub-block measures the reference -3.01 LKFS
+    assert _power_to_lufs(power[5:]) == pytest.approx(-3.01, abs=0.05)
+    assert peak.max() == pytest.approx(1.0, abs=0.01)
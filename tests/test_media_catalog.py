@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+from media_catalog import (
+    HASH_BANDS, MAX_INDEXED_DISTANCE, MediaCatalog, _to_signed, _to_unsigned, difference_hash, hamming, hash_bands
+)
+
+INFO = {"duration": 10.0, "fps": 25.0, "width": 320, "height": 180, "codec": "h264", "has_audio": False}
+
+def flip_bits(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+def test_hash_bands_split_and_rejoin():
+    value = 0x0123456789ABCDEF
+    bands = hash_bands(value)
+    assert bands == [0xCDEF, 0x89AB, 0x4567, 0x0123]
+    assert sum(band << (16 * i) for i, band in enumerate(bands)) == value
+
+def test_nearby_hashes_share_a_band():
+    # Pigeonhole: flipping fewer bits than there are bands leaves at least one band intact
+    rng = random.Random(1)
+    for _ in range(200):
+        value = rng.getrandbits(64)
+        other = flip_bits(value, rng.sample(range(64), MAX_INDEXED_DISTANCE))
+        assert hamming(value, other) == MAX_INDEXED_DISTANCE
+        assert any(a == b for a, b in zip(hash_bands(value), hash_bands(other)))
+
+def test_signed_conversion_round_trips():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = _to_signed(value)
+        assert -(1 << 63) <= signed < 1 << 63
+        assert _to_unsigned(signed) == value
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = MediaCatalog(str(tmp_path / "catalog.sqlite"))
+    yield catalog
+    catalog.close()
+
+def store_file(catalog, path, hashes):
+    shots = [{"start": float(i), "end": float(i + 1), "hash": value, "thumbnail": None}
+             for i, value in enumerate(hashes)]
+    catalog.store([{"path": path, "size": 1, "mtime_ns": 1, "info": INFO, "shots": shots}])
+
+def test_similar_shots_finds_hashes_within_indexed_distance(catalog, tmp_path):
+    value = 0xF0F0F0F0F0F0F0F0
+    near = flip_bits(value, [0, 20, 40])  # one flip in each of three bands
+    far = flip_bits(value, [0, 20, 40, 60])  # every band differs
+    store_file(catalog, str(tmp_path / "a.mp4"), [near, far])
+
+    matches = catalog.similar_shots(value)
+    assert [match["distance"] for match in matches] == [3]
+    assert catalog.shots_for(str(tmp_path / "a.mp4"))[0]["hash"] == near
+
+def test_similar_shots_rejects_unindexed_distance(catalog):
+    with pytest.raises(ValueError):
+        catalog.similar_shots(0, HASH_BANDS)
+
+def test_near_duplicates_across_encodes(catalog, tmp_path):
+    rng = random.Random(2)
+    original = [rng.getrandbits(64) | 1 << 63 for _ in range(4)]
+    reencoded = [flip_bits(value, [5]) for value in original]
+    store_file(catalog, str(tmp_path / "original.mp4"), original)
+    store_file(catalog, str(tmp_path / "reencoded.mp4"), reencoded)
+    store_file(catalog, str(tmp_path / "other.mp4"), [rng.getrandbits(64) for _ in range(4)])
+
+    results = catalog.near_duplicates(str(tmp_path / "original.mp4"))
+    assert [result["path"] for result in results] == [str(tmp_path / "reencoded.mp4")]
+    assert results[0]["score"] == 1.0
+
+def test_difference_hash_skips_uniform_frames():
+    Image = pytest.importorskip("PIL.Image")
+    assert difference_hash(Image.new("RGB", (64, 36), (128, 128, 128))) is None
+    gradient = Image.linear_gradient("L").rotate(90).convert("RGB")
+    assert difference_hash(gradient) == (1 << 64) - 1
+
+def test_index_keeps_files_of_unreadable_directories(catalog, tmp_path, monkeypatch):
+    import os
+
+    import media_catalog
+    from media_catalog import CatalogIndexer
+
+    shared = tmp_path / "share"
+    (shared / "offline").mkdir(parents=True)
+    store_file(catalog, str(shared / "offline" / "clip.mp4"), [1])
+    store_file(catalog, str(shared / "deleted.mp4"), [2])
+
+    scandir = os.scandir
+
+    def flaky_scandir(path):
+        if os.path.basename(path) == "offline":
+            raise OSError("Stale file handle")
+        return scandir(path)
+
+    monkeypatch.setattr(media_catalog.os, "scandir", flaky_scandir)
+    counts = CatalogIndexer(catalog, workers=1).index([str(shared)])
+    assert counts["removed"] == 1
+    assert catalog.get_file(str(shared / "offline" / "clip.mp4"))
+    assert catalog.get_file(str(shared / "deleted.mp4")) is None
@@ -0,0 +1,80 @@
+import gc
+
+from memory_governor import (
+    PRIORITY_ANALYSIS, PRIORITY_EXPORT, PRIORITY_FRAME_CACHE, PRIORITY_PLAYBACK, PRIORITY_THUMBNAILS, MemoryGovernor
+)
+
+class Cache:
+    """Pool owner that frees memory down to whatever target it is given."""
+
+    def __init__(self, governor, name, priority, calls):
+        self.name = name
+        self.calls = calls
+        self.pool = governor.register(name, priority, self._shrink)
+
+    def _shrink(self, target):
+        self.calls.append(self.name)
+        return target
+
+def test_lowest_priority_pools_shrink_first():
+    governor = MemoryGovernor(1000)
+    calls = []
+    frames = Cache(governor, "frames", PRIORITY_FRAME_CACHE, calls)
+    analysis = Cache(governor, "analysis", PRIORITY_ANALYSIS, calls)
+    thumbnails = Cache(governor, "thumbnails", PRIORITY_THUMBNAILS, calls)
+    frames.pool.report(400)
+    analysis.pool.report(300)
+    thumbnails.pool.report(300)
+    assert calls == []
+
+    # 500 bytes over: analysis gives up all 300, thumbnails the remaining 200
+    frames.pool.report(900)
+    assert calls == ["analysis", "thumbnails"]
+    assert analysis.pool.usage == 0
+    assert thumbnails.pool.usage == 100
+    assert governor.total == 1000
+
+def test_shrink_stops_once_under_budget():
+    governor = MemoryGovernor(1000)
+    calls = []
+    analysis = Cache(governor, "analysis", PRIORITY_ANALYSIS, calls)
+    frames = Cache(governor, "frames", PRIORITY_FRAME_CACHE, calls)
+    analysis.pool.report(600)
+    frames.pool.report(400)
+    frames.pool.report(500)
+    assert calls == ["analysis"]
+    assert analysis.pool.usage == 500
+    assert frames.pool.usage == 500
+
+def test_counted_pools_are_never_shrunk():
+    governor = MemoryGovernor(1000)
+    calls = []
+    playback = governor.register("playback", PRIORITY_PLAYBACK)
+    frames = Cache(governor, "frames", PRIORITY_FRAME_CACHE, calls)
+    frames.pool.report(500)
+    playback.report(900)
+    assert calls == ["frames"]
+    assert frames.pool.usage == 100
+    assert playback.usage == 900
+
+def test_reserve_only_shrinks_lower_priorities():
+    governor = MemoryGovernor(1000)
+    calls = []
+    frames = Cache(governor, "frames", PRIORITY_FRAME_CACHE, calls)
+    playback = Cache(governor, "playback", PRIORITY_PLAYBACK, calls)
+    frames.pool.report(300)
+    playback.pool.report(600)
+    with governor.reserve("export", 400, PRIORITY_EXPORT):
+        assert calls == ["frames"]
+        assert frames.pool.usage == 0
+        assert governor.usage()["subsystems"]["export"]["bytes"] == 400
+    assert "export" not in governor.usage()["subsystems"]
+
+def test_pools_leave_the_budget_with_their_owner():
+    governor = MemoryGovernor(1000)
+    cache = Cache(governor, "frames", PRIORITY_FRAME_CACHE, [])
+    cache.pool.report(500)
+    del cache
+    gc.collect()
+    assert governor.total == 0
+    assert governor.usage()["subsystems"] == {}
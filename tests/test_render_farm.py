@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+import decode_backends
+import render_farm
+from automation_api import EventHub, JobCancelled, JobManager
+from render_farm import RenderCoordinator, plan_segments
+from video_processor import VideoProcessor
+
+WORKERS = ["http://worker1:8765", "http://worker2:8765"]
+
+@pytest.fixture
+def fake_farm(monkeypatch):
+    """Render workers that take a moment per segment; returns the list of rendered segment starts."""
+    rendered = []
+    lock = threading.Lock()
+
+    def post(self, worker, job):
+        time.sleep(0.05)
+        with lock:
+            rendered.append(job["start"])
+        return {"ok": True, "segment": "id"}
+
+    def fetch(self, worker, segment_id, path):
+        with open(path, "wb") as f:
+            f.write(b"segment")
+
+    monkeypatch.setenv("VIDEO_EDITOR_RENDER_SECRET", "secret")
+    monkeypatch.setattr(decode_backends, "probe", lambda path: {"duration": 100.0})
+    monkeypatch.setattr(render_farm, "probe_keyframes", lambda path: [])
+    monkeypatch.setattr(RenderCoordinator, "_post", post)
+    monkeypatch.setattr(RenderCoordinator, "_fetch", fetch)
+    return rendered
+
+def test_plan_segments_cut_on_keyframes():
+    segments = plan_segments(0, 30, [0, 4, 11, 19, 23, 28])
+    assert [(s["start"], s["end"]) for s in segments] == [(0, 11), (11, 23), (23, 30)]
+
+def test_progress_exception_stops_every_worker(fake_farm, tmp_path):
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"x")
+
+    def progress_callback(progress):
+        raise JobCancelled()
+
+    coordinator = RenderCoordinator(WORKERS)
+    with pytest.raises(JobCancelled):
+        coordinator.render(str(source), 0, 100, str(tmp_path / "out.mp4"), progress_callback)
+    # The segments already sent out finish; no new ones are started
+    time.sleep(0.2)
+    assert len(fake_farm) <= len(WORKERS) + 1
+
+def test_cancel_distributed_job(fake_farm, tmp_path):
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"x")
+    jobs = JobManager(lambda: VideoProcessor(render_workers=WORKERS), EventHub(), workers=1)
+    job = jobs.submit(str(source), 0, 100, str(tmp_path / "out.mp4"))
+
+    deadline = time.time() + 5
+    while job.progress == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    jobs.cancel(job.id)
+    while job.status == "running" and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert job.status == "cancelled"
+    time.sleep(0.2)
+    # At most one more segment per worker after the cancel is seen, instead of the whole export
+    assert len(fake_farm) <= 2 * len(WORKERS)
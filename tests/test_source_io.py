@@ -0,0 +1,83 @@
+import os
+import pathlib
+
+import pytest
+
+import source_io
+from source_io import StagingCache
+
+def test_lru_evicts_least_recently_used(tmp_path):
+    cache = StagingCache(str(tmp_path), max_bytes=300)
+    for name in ("a", "b", "c"):
+        cache.put(name, b"x" * 100)
+    assert cache.lookup("a")  # now most recently used
+    cache.put("d", b"x" * 100)
+    assert cache.lookup("b") is None
+    assert sorted(os.listdir(tmp_path)) == ["a", "c", "d"]
+    assert cache.read("a") == b"x" * 100
+
+def test_oversized_entries_are_not_staged(tmp_path):
+    cache = StagingCache(str(tmp_path), max_bytes=100)
+    cache.put("a", b"x" * 50)
+    assert cache.put("big", b"x" * 101) is None
+    assert cache.lookup("a")
+
+def test_replacing_an_entry_keeps_size_accounting(tmp_path):
+    cache = StagingCache(str(tmp_path), max_bytes=1000)
+    cache.put("a", b"x" * 100)
+    cache.put("a", b"x" * 300)
+    assert cache._bytes == 300
+
+def test_restart_rebuilds_order_and_cleans_stale_partials(tmp_path):
+    for index, name in enumerate(["old", "new"]):
+        (tmp_path / name).write_bytes(b"x" * 100)
+        os.utime(tmp_path / name, (index + 1, index + 1))
+    stale = tmp_path / "new.1234.partial"
+    stale.write_bytes(b"x")
+    os.utime(stale, (1, 1))
+    recent = tmp_path / "new.5678.partial"
+    recent.write_bytes(b"x")
+
+    cache = StagingCache(str(tmp_path), max_bytes=200)
+    assert list(cache._entries) == ["old", "new"]
+    assert not stale.exists() and recent.exists()
+    cache.put("next", b"x" * 100)
+    assert cache.lookup("old") is None and cache.lookup("new")
+
+def test_failed_write_leaves_no_temp_file(tmp_path):
+    cache = StagingCache(str(tmp_path), max_bytes=1000)
+
+    def write(temp_path):
+        raise OSError("disk full")
+
+    assert cache.put_with("a", 10, write) is None
+
+    def cancel(temp_path):
+        raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        cache.put_with("a", 10, cancel)
+    assert os.listdir(tmp_path) == []
+
+def test_stage_file_reports_progress_and_hits(tmp_path):
+    source = tmp_path / "source.MP4"
+    source.write_bytes(os.urandom(1000))
+    cache = StagingCache(str(tmp_path / "staging"), max_bytes=10000)
+    progress = []
+    staged = cache.stage_file(str(source), chunk_size=300, progress_callback=progress.append)
+    assert staged.endswith(".mp4")
+    assert pathlib.Path(staged).read_bytes() == source.read_bytes()
+    assert progress == [0.3, 0.6, 0.9, 1.0]
+    assert cache.stage_file(str(source)) == staged
+
+def test_local_source_stages_only_long_cuts(tmp_path, monkeypatch):
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"x" * 100)
+    cache = StagingCache(str(tmp_path / "staging"), max_bytes=10000)
+    monkeypatch.setattr(source_io, "is_network_path", lambda path: True)
+    monkeypatch.setattr(source_io, "get_staging_cache", lambda: cache)
+
+    assert source_io.local_source(str(source), 0, 10, 100) == str(source)
+    staged = source_io.local_source(str(source), 0, 90, 100)
+    assert staged != str(source) and os.path.dirname(staged) == cache.cache_dir
+    assert source_io.local_source(str(source)) == staged
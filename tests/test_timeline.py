@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from timeline import Clip, RenderCache, Timeline, clip_key
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.mp4"
+    path.write_bytes(b"\0" * 1024)
+    return str(path)
+
+def test_clip_key_is_stable(source):
+    settings = Timeline().output_settings()
+    assert clip_key(Clip(source, 1, 5), settings) == clip_key(Clip(source, 1, 5), settings)
+
+def test_clip_key_changes_with_range_settings_and_output(source):
+    settings = Timeline().output_settings()
+    key = clip_key(Clip(source, 1, 5), settings)
+    assert clip_key(Clip(source, 1, 6), settings) != key
+    assert clip_key(Clip(source, 1, 5, {"volume": 0.5}), settings) != key
+    assert clip_key(Clip(source, 1, 5), Timeline(width=1280, height=720).output_settings()) != key
+
+def test_clip_key_changes_when_source_is_modified(source):
+    settings = Timeline().output_settings()
+    key = clip_key(Clip(source, 1, 5), settings)
+    with open(source, "ab") as f:
+        f.write(b"\0")
+    assert clip_key(Clip(source, 1, 5), settings) != key
+
+def test_clip_key_ignores_position_in_timeline(source):
+    timeline = Timeline()
+    first = timeline.add_clip(Clip(source, 0, 2))
+    second = timeline.add_clip(Clip(source, 2, 4))
+    keys = [clip_key(clip, timeline.output_settings()) for clip in (first, second)]
+    timeline.move_clip(1, 0)
+    assert [clip_key(clip, timeline.output_settings()) for clip in timeline.clips] == keys[::-1]
+
+def write_segment(path):
+    with open(path, "wb") as f:
+        f.write(b"\0" * 100)
+
+def test_render_cache_evicts_least_recently_used(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=250)
+    for index, key in enumerate(["a", "b", "c"]):
+        path = cache.put(key, write_segment)
+        os.utime(path, (index, index))
+    cache.evict()
+    assert cache.get("a") is None
+    assert cache.get("b") and cache.get("c")
+    assert cache.usage() == 200
@@ -0,0 +1,62 @@
+from ui_update_bus import UIUpdateBus
+
+class FakeRoot:
+    """Records after() calls instead of running a Tk loop."""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay_ms, callback, *args):
+        self.scheduled.append((delay_ms, callback, args))
+        return len(self.scheduled)
+
+    def after_cancel(self, after_id):
+        pass
+
+def test_publish_coalesces_to_latest_value():
+    bus = UIUpdateBus(FakeRoot())
+    applied = []
+    bus.subscribe("progress", applied.append)
+    for value in range(100):
+        bus.publish("progress", value)
+    bus.flush()
+    assert applied == [99]
+
+def test_flush_applies_each_key_once_and_clears():
+    bus = UIUpdateBus(FakeRoot())
+    applied = []
+    bus.subscribe("position", lambda value: applied.append(("position", value)))
+    bus.subscribe("status", lambda value: applied.append(("status", value)))
+    bus.publish("position", 1.0)
+    bus.publish("status", "ready")
+    bus.publish("position", 2.0)
+    bus.flush()
+    assert sorted(applied) == [("position", 2.0), ("status", "ready")]
+    bus.flush()
+    assert len(applied) == 2
+
+def test_discard_drops_unapplied_value():
+    bus = UIUpdateBus(FakeRoot())
+    applied = []
+    bus.subscribe("position", applied.append)
+    bus.publish("position", 5.0)
+    bus.discard("position")
+    bus.flush()
+    assert applied == []
+
+def test_call_soon_runs_every_call_in_order():
+    bus = UIUpdateBus(FakeRoot())
+    calls = []
+    bus.call_soon(calls.append, 1)
+    bus.call_soon(calls.append, 2)
+    bus.flush()
+    assert calls == [1, 2]
+
+def test_call_after_flush_schedules_separate_event():
+    root = FakeRoot()
+    bus = UIUpdateBus(root)
+    calls = []
+    bus.call_after_flush(calls.append, "done")
+    bus.flush()
+    assert calls == []
+    assert root.scheduled == [(0, calls.append, ("done",))]
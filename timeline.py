@@ -0,0 +1,237 @@
+"""
+Multi-source timeline and the render cache used to export it.
+
+A timeline is an ordered list of clips, each a source file with in/out
+points and per-clip settings. Every clip is rendered to its own segment
+keyed by a content hash of everything that affects its output, and the
+segments are kept in a disk cache. Re-exporting after an edit re-encodes
+only clips whose hash changed and joins the rest without re-encoding.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+from utils import find_ffprobe, user_data_path
+
+# Bump when the segment encoding changes so stale cache entries are ignored
+CACHE_VERSION = 1
+
+DEFAULT_CLIP_SETTINGS = {
+    "volume": 1.0,
+}
+
+class Clip:
+    def __init__(self, source, in_point, out_point, settings=None):
+        if in_point < 0 or out_point <= in_point:
+            raise ValueError(f"Invalid clip range {in_point}-{out_point}")
+        self.source = os.path.abspath(source)
+        self.in_point = float(in_point)
+        self.out_point = float(out_point)
+        self.settings = dict(DEFAULT_CLIP_SETTINGS)
+        self.settings.update(settings or {})
+
+    @property
+    def duration(self):
+        return self.out_point - self.in_point
+
+    def to_dict(self):
+        return {
+            "source": self.source,
+            "in": self.in_point,
+            "out": self.out_point,
+            "settings": self.settings,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["source"], data["in"], data["out"], data.get("settings"))
+
+    def __repr__(self):
+        return f"Clip({os.path.basename(self.source)!r}, {self.in_point}, {self.out_point})"
+
+class Timeline:
+    def __init__(self, width=1920, height=1080, fps=30, sample_rate=48000, crf=20, preset="medium"):
+        # Output format shared by every segment so they can be joined without re-encoding
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.sample_rate = sample_rate
+        self.crf = crf
+        self.preset = preset
+        self.clips = []
+
+    @property
+    def duration(self):
+        return sum(clip.duration for clip in self.clips)
+
+    def add_clip(self, clip, index=None):
+        """Append a clip, or insert it at `index`."""
+        if index is None:
+            self.clips.append(clip)
+        else:
+            self.clips.insert(index, clip)
+        return clip
+
+    def remove_clip(self, index):
+        return self.clips.pop(index)
+
+    def move_clip(self, old_index, new_index):
+        self.clips.insert(new_index, self.clips.pop(old_index))
+
+    def replace_clip(self, index, clip):
+        self.clips[index] = clip
+
+    def output_settings(self):
+        return {
+            "width": self.width,
+            "height": self.height,
+            "fps": self.fps,
+            "sample_rate": self.sample_rate,
+            "crf": self.crf,
+            "preset": self.preset,
+        }
+
+    def to_dict(self):
+        data = self.output_settings()
+        data["clips"] = [clip.to_dict() for clip in self.clips]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        timeline = cls(data["width"], data["height"], data["fps"],
+                       data.get("sample_rate", 48000), data.get("crf", 20), data.get("preset", "medium"))
+        for clip_data in data.get("clips", []):
+            timeline.add_clip(Clip.from_dict(clip_data))
+        return timeline
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+def clip_key(clip, output_settings):
+    """Content hash of everything that determines a clip's rendered segment."""
+    stat = os.stat(clip.source)
+    identity = {
+        "version": CACHE_VERSION,
+        # Source identity: path plus size and mtime, so an edited source re-renders
+        "source": [clip.source, stat.st_size, stat.st_mtime_ns],
+        "range": [round(clip.in_point, 6), round(clip.out_point, 6)],
+        "settings": clip.settings,
+        "output": output_settings,
+    }
+    encoded = json.dumps(identity, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+def has_audio_stream(path):
+    """Return whether the file has an audio stream."""
+    ffprobe = find_ffprobe()
+    if ffprobe:
+        output = subprocess.check_output([
+            ffprobe, "-v", "error", "-select_streams", "a",
+            "-show_entries", "stream=index", "-of", "csv=p=0", path
+        ], text=True)
+        return bool(output.strip())
+
+    from moviepy.video.io.VideoFileClip import VideoFileClip
+    video = VideoFileClip(path)
+    try:
+        return video.audio is not None
+    finally:
+        video.close()
+
+def render_clip(ffmpeg, clip, output_settings, output_path):
+    """Encode one clip to the timeline's common output format."""
+    width = output_settings["width"]
+    height = output_settings["height"]
+    sample_rate = output_settings["sample_rate"]
+
+    # Letterbox to the timeline size and normalise frame rate
+    video_filter = (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={output_settings['fps']}"
+    )
+
+    cmd = [ffmpeg, "-y", "-loglevel", "error",
+           "-ss", f"{clip.in_point:.6f}", "-t", f"{clip.duration:.6f}", "-i", clip.source]
+    if has_audio_stream(clip.source):
+        audio_filter = f"volume={clip.settings.get('volume', 1.0)},aresample={sample_rate}"
+        cmd += ["-filter_complex", f"[0:v]{video_filter}[v];[0:a]{audio_filter}[a]"]
+    else:
+        # Add silence so every segment has the same stream layout
+        cmd += ["-f", "lavfi", "-t", f"{clip.duration:.6f}",
+                "-i", f"anullsrc=channel_layout=stereo:sample_rate={sample_rate}",
+                "-filter_complex", f"[0:v]{video_filter}[v];[1:a]anull[a]"]
+
+    cmd += ["-map", "[v]", "-map", "[a]",
+            "-c:v", "libx264", "-preset", output_settings["preset"], "-crf", str(output_settings["crf"]),
+            "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-ar", str(sample_rate), "-ac", "2",
+            "-t", f"{clip.duration:.6f}",
+            output_path]
+    subprocess.check_call(cmd)
+
+class RenderCache:
+    def __init__(self, cache_dir=None, max_bytes=20 * 1024 ** 3):
+        if cache_dir is None:
+            cache_dir = user_data_path("render_cache")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def get(self, key):
+        """Return the cached segment path, or None on a miss."""
+        path = self.path_for(key)
+        if os.path.exists(path):
+            # Touch so eviction keeps recently used segments
+            os.utime(path)
+            return path
+        return None
+
+    def put(self, key, render_func):
+        """Render a segment into the cache atomically and return its path."""
+        path = self.path_for(key)
+        temp_path = os.path.join(self.cache_dir, f"{key}.partial-{os.getpid()}.mp4")
+        try:
+            render_func(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return path
+
+    def _segments(self):
+        """Finished segment files, skipping renders still in progress."""
+        return [
+            entry for entry in os.scandir(self.cache_dir)
+            if entry.name.endswith(".mp4") and ".partial-" not in entry.name
+        ]
+
+    def usage(self):
+        """Total bytes held by cached segments."""
+        return sum(entry.stat().st_size for entry in self._segments())
+
+    def evict(self, keep=()):
+        """Delete least recently used segments until the cache fits in max_bytes."""
+        keep = {os.path.abspath(path) for path in keep}
+        entries = sorted(self._segments(), key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if os.path.abspath(entry.path) in keep:
+                continue
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def clear(self):
+        for entry in self._segments():
+            os.remove(entry.path)
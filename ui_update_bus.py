@@ -0,0 +1,82 @@
+import queue
+import threading
+
+class UIUpdateBus:
+    """
+    Coalescing bridge between worker threads and Tk widgets.
+
+    Producers publish keyed state (progress, position, status, ...) from any
+    thread. The Tk loop applies only the latest value for each key, at most
+    `refresh_hz` times per second, so a flood of per-frame updates costs one
+    widget update per refresh instead of one Tk event per update.
+    """
+
+    def __init__(self, root, refresh_hz=30):
+        self.root = root
+        self.interval_ms = max(1, int(1000 / refresh_hz))
+        self._handlers = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._calls = queue.SimpleQueue()
+        self._after_id = None
+
+    def subscribe(self, key, handler):
+        """Register the Tk-thread handler that applies values for `key`."""
+        self._handlers[key] = handler
+
+    def publish(self, key, value):
+        """Set the latest value for `key`; earlier unapplied values are dropped."""
+        with self._lock:
+            self._pending[key] = value
+
+    def discard(self, key):
+        """Drop the unapplied value for `key`, if any."""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def call_soon(self, callback, *args):
+        """Run a one-off callback on the Tk thread at the next refresh (not coalesced)."""
+        self._calls.put((callback, args))
+
+    def call_after_flush(self, callback, *args):
+        """
+        Run a callback on the Tk thread as its own event, after the refresh
+        that picks it up. Use this for anything that blocks, such as modal
+        dialogs, so it does not hold up the other updates in that refresh.
+        """
+        self.call_soon(self.root.after, 0, callback, *args)
+
+    def start(self):
+        """Begin applying updates from the Tk loop."""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._apply_loop)
+
+    def stop(self):
+        """Stop applying updates."""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def flush(self):
+        """Apply all pending updates now. Must be called on the Tk thread."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+
+        for key, value in pending.items():
+            handler = self._handlers.get(key)
+            if handler:
+                handler(value)
+
+        while True:
+            try:
+                callback, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+
+    def _apply_loop(self):
+        try:
+            self.flush()
+        finally:
+            self._after_id = self.root.after(self.interval_ms, self._apply_loop)
@@ -34,3 +34,109 @@ def sanitize_filename(filename):
     # Remove leading/trailing spaces and dots
     filename = filename.strip(' .')
     return filename
+
+def find_ffmpeg():
+    """Locate an ffmpeg binary, falling back to the one bundled with MoviePy."""
+    import shutil
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        return ffmpeg
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        raise Exception("ffmpeg not found. Install ffmpeg or imageio-ffmpeg.")
+
+def find_ffprobe():
+    """Locate an ffprobe binary, or return None if it is not installed."""
+    import shutil
+    return shutil.which("ffprobe")
+
+def probe_keyframes(input_video):
+    """
+    Keyframe timestamps in seconds from the start of the video stream (the
+    same origin as frame indices and ffmpeg's -ss), or an empty list if
+    ffprobe is unavailable.
+    """
+    import json
+    import subprocess
+    ffprobe = find_ffprobe()
+    if not ffprobe:
+        return []
+    output = subprocess.check_output([
+        ffprobe, "-v", "error", "-select_streams", "v:0",
+        "-skip_frame", "nokey", "-show_entries", "stream=start_time:frame=pts_time",
+        "-of", "json", input_video
+    ], text=True)
+    data = json.loads(output)
+    streams = data.get("streams") or [{}]
+    try:
+        start_time = float(streams[0].get("start_time") or 0)
+    except ValueError:
+        start_time = 0.0
+    keyframes = []
+    for frame in data.get("frames", []):
+        try:
+            keyframes.append(float(frame["pts_time"]) - start_time)
+        except (KeyError, ValueError):
+            continue
+    return sorted(keyframes)
+
+def probe_media(path):
+    """Container and first video/audio stream properties from ffprobe."""
+    import json
+    import subprocess
+    ffprobe = find_ffprobe()
+    if not ffprobe:
+        raise Exception("ffprobe not found. Install ffmpeg to probe media files.")
+    output = subprocess.check_output([
+        ffprobe, "-v", "error", "-show_entries",
+        "format=duration:stream=codec_type,codec_name,width,height,avg_frame_rate,nb_frames"
+        ":stream_tags=rotate:stream_side_data=rotation",
+        "-of", "json", path
+    ], text=True)
+    data = json.loads(output)
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None:
+        raise Exception("No video stream")
+
+    fps = 0.0
+    numerator, _, denominator = video.get("avg_frame_rate", "0/1").partition("/")
+    if float(denominator or 1):
+        fps = float(numerator) / float(denominator or 1)
+
+    # Display rotation: side data on current ffmpeg, a "rotate" tag on older versions
+    rotation = 0.0
+    for side_data in video.get("side_data_list", []):
+        if "rotation" in side_data:
+            rotation = float(side_data["rotation"])
+    if not rotation:
+        rotation = float(video.get("tags", {}).get("rotate") or 0)
+
+    duration = float(data.get("format", {}).get("duration") or 0)
+    # Not every container records a frame count
+    frame_count = int(video.get("nb_frames") or 0) or int(round(duration * fps))
+
+    return {
+        "duration": duration,
+        "fps": fps,
+        "frame_count": frame_count,
+        "width": int(video.get("width") or 0),
+        "height": int(video.get("height") or 0),
+        "codec": video.get("codec_name"),
+        "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+        "rotation": rotation,
+    }
+
+def user_data_path(name):
+    """Path of `name` (a cache directory or file) under the per-user ~/.video_editor directory."""
+    import os
+    return os.path.join(os.path.expanduser("~"), ".video_editor", name)
+
+def validate_time_range(start_time, end_time, duration):
+    """Raise if [start_time, end_time] is not a usable cut of a video `duration` seconds long."""
+    if start_time < 0 or end_time <= start_time:
+        raise Exception("Invalid time codes")
+    if end_time > duration:
+        raise Exception(f"End time {end_time}s exceeds video duration {duration:.1f}s")
@@ -3,8 +3,8 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
 import os
 from video_player import VideoPlayer
-from audio_processor import AudioProcessor
-from video_processor import VideoProcessor
+from log_sink import LogSink
+from ui_update_bus import UIUpdateBus
 from utils import format_time, validate_time_input
 
 class VideoEditorGUI:
@@ -14,9 +14,19 @@ class VideoEditorGUI:
         self.root.geometry("1200x800")
         self.root.configure(bg='#f0f0f0')
         
-        # Initialize processors
-        self.audio_processor = AudioProcessor()
-        self.video_processor = VideoProcessor()
+        self._updating_scale = False
+        self._dragging_scale = False
+        
+        # Processors are created on first use (see the properties below)
+        self._audio_processor = None
+        self._video_processor = None
+        self._processor_lock = threading.Lock()
+        
+        # Log messages from any thread are queued and drained by the Tk loop
+        self.log_sink = LogSink(
+            min_level=os.getenv("VIDEO_EDITOR_LOG_LEVEL", "info"),
+            spill_path=os.getenv("VIDEO_EDITOR_LOG_FILE")
+        )
         
         # State variables
         self.current_video_file = None
@@ -29,11 +39,102 @@ class VideoEditorGUI:
         # Create GUI components
         self.create_widgets()
         
+        # Worker threads publish progress/position/status here; the Tk loop
+        # applies only the latest value per key at a capped rate
+        self.ui_bus = UIUpdateBus(self.root, refresh_hz=30)
+        self.ui_bus.subscribe("progress", self.progress_var.set)
+        self.ui_bus.subscribe("status", lambda text: self.status_label.config(text=text))
+        self.ui_bus.subscribe("position", self._apply_position)
+        self.ui_bus.subscribe("transcribed", self.transcribed_command.set)
+        self.ui_bus.subscribe("start_time", self.start_time.set)
+        self.ui_bus.subscribe("end_time", self.end_time.set)
+        self.ui_bus.subscribe("filmstrip", lambda _: self._draw_filmstrip())
+        self.ui_bus.start()
+        
         # Initialize video player
-        self.video_player = VideoPlayer(self.video_frame, self.on_position_change)
+        if os.getenv("VIDEO_EDITOR_DECODER_PROCESS") == "1":
+            # Decode in a subprocess so exports and codec crashes cannot stall the UI
+            from decoder_process import ProcessVideoPlayer
+            self.video_player = ProcessVideoPlayer(self.video_frame, self.on_position_change)
+            self.video_player.error_callback = lambda message: self.log(message, "error")
+        else:
+            self.video_player = VideoPlayer(
+                self.video_frame, self.on_position_change,
+                audio_enabled=os.getenv("VIDEO_EDITOR_PREVIEW_AUDIO", "1") != "0"
+            )
+        
+        # Performance overlay, toggled with F12
+        self.stats_overlay = None
+        self.root.bind("<F12>", lambda event: self.toggle_stats_overlay())
+        
+        # J/K/L shuttle (Shift for slower speeds) and arrow-key frame stepping
+        self.root.bind("<Key-j>", lambda event: self._transport_key(self.shuttle_video, -1))
+        self.root.bind("<Key-l>", lambda event: self._transport_key(self.shuttle_video, 1))
+        self.root.bind("<Key-J>", lambda event: self._transport_key(self.shuttle_video, -1, True))
+        self.root.bind("<Key-L>", lambda event: self._transport_key(self.shuttle_video, 1, True))
+        self.root.bind("<Key-k>", lambda event: self._transport_key(self.pause_video))
+        self.root.bind("<Left>", lambda event: self._transport_key(self.step_video, -1))
+        self.root.bind("<Right>", lambda event: self._transport_key(self.step_video, 1))
         
         # Set up logging
         self.setup_logging()
+        
+        self.automation_server = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Probe audio support without blocking the window from appearing
+        threading.Thread(target=self._probe_audio_thread, daemon=True).start()
+    
+    def on_close(self):
+        """Stop background work, flush the log file and close the window."""
+        self.ui_bus.stop()
+        if self.automation_server:
+            self.automation_server.stop()
+        if self.filmstrip:
+            self.filmstrip.cancel()
+        try:
+            self.video_player.release()
+            if self._video_processor:
+                self._video_processor.close()
+        finally:
+            self.log_sink.detach()
+            self.root.destroy()
+    
+    @property
+    def audio_processor(self):
+        """Audio processor, imported and created on first voice command."""
+        with self._processor_lock:
+            if self._audio_processor is None:
+                from audio_processor import AudioProcessor
+                self._audio_processor = AudioProcessor()
+            return self._audio_processor
+    
+    @property
+    def video_processor(self):
+        """Video processor, imported and created on first export."""
+        with self._processor_lock:
+            if self._video_processor is None:
+                from video_processor import VideoProcessor
+                workers = os.getenv("VIDEO_EDITOR_RENDER_WORKERS", "")
+                self._video_processor = VideoProcessor(
+                    render_workers=[url.strip() for url in workers.split(",") if url.strip()]
+                )
+            return self._video_processor
+    
+    def toggle_stats_overlay(self):
+        """Show or hide the fps / stage latency overlay on the video."""
+        if self.stats_overlay is None:
+            from stats_overlay import StatsOverlay
+            self.stats_overlay = StatsOverlay(self.video_frame)
+        self.stats_overlay.toggle()
+    
+    def _probe_audio_thread(self):
+        """Check for audio recording support in the background."""
+        from audio_processor import probe_audio
+        if probe_audio():
+            self.log("Audio recording support: Available")
+        else:
+            self.log("Audio recording support: Not available", "warning")
     
     def create_widgets(self):
         """Create and arrange all GUI widgets."""
@@ -126,6 +227,20 @@ class VideoEditorGUI:
         # Position scale
         self.position_scale = ttk.Scale(info_frame, from_=0, to=100, orient=tk.HORIZONTAL, command=self.on_scale_change)
         self.position_scale.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(5, 0))
+        self.position_scale.bind("<ButtonPress-1>", lambda event: self._set_scale_drag(True))
+        self.position_scale.bind("<ButtonRelease-1>", lambda event: self._set_scale_drag(False))
+        
+        # Filmstrip of keyframe thumbnails; hovering either shows a preview, clicking the strip seeks
+        self.filmstrip = None
+        self._filmstrip_images = []
+        self._preview_window = None
+        self.filmstrip_canvas = tk.Canvas(info_frame, height=54, bg='black', highlightthickness=0)
+        self.filmstrip_canvas.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(5, 0))
+        self.filmstrip_canvas.bind("<Configure>", lambda event: self._draw_filmstrip())
+        self.filmstrip_canvas.bind("<Button-1>", self._on_filmstrip_click)
+        for widget in (self.position_scale, self.filmstrip_canvas):
+            widget.bind("<Motion>", self._show_hover_preview)
+            widget.bind("<Leave>", lambda event: self._hide_hover_preview())
     
     def create_controls_section(self, parent):
         """Create video control buttons."""
@@ -135,6 +250,11 @@ class VideoEditorGUI:
         ttk.Button(controls_frame, text="Play", command=self.play_video).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(controls_frame, text="Pause", command=self.pause_video).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(controls_frame, text="Stop", command=self.stop_video).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(controls_frame, text="< Frame", command=lambda: self.step_video(-1)).pack(side=tk.LEFT, padx=(10, 5))
+        ttk.Button(controls_frame, text="Frame >", command=lambda: self.step_video(1)).pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.rate_label = ttk.Label(controls_frame, text="paused", width=7)
+        self.rate_label.pack(side=tk.LEFT, padx=(10, 0))
     
     def create_voice_section(self, parent):
         """Create voice command section."""
@@ -176,6 +296,15 @@ class VideoEditorGUI:
         
         self.status_label = ttk.Label(process_frame, text="Ready")
         self.status_label.grid(row=0, column=2)
+        
+        # Loudness normalization target applied during export
+        ttk.Label(process_frame, text="Loudness:").grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        self.loudness_target = tk.StringVar(value=os.getenv("VIDEO_EDITOR_LOUDNESS_TARGET", "Off"))
+        ttk.Combobox(
+            process_frame, textvariable=self.loudness_target, width=10,
+            values=["Off", "-14", "-16", "-23"]
+        ).grid(row=1, column=1, sticky=tk.W, pady=(5, 0))
+        ttk.Label(process_frame, text="LUFS").grid(row=1, column=2, sticky=tk.W, pady=(5, 0))
     
     def create_log_section(self, parent):
         """Create error/status log section."""
@@ -191,36 +320,16 @@ class VideoEditorGUI:
     
     def setup_logging(self):
         """Set up logging functionality."""
+        self.log_sink.attach(self.log_text)
         self.log("Video Editor GUI initialized successfully")
     
     def log(self, message, level="info"):
-        """Add message to log display."""
-        import datetime
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        log_message = f"[{timestamp}] {level.upper()}: {message}\n"
-        
-        self.log_text.config(state=tk.NORMAL)
-        
-        # Color coding for different log levels
-        if level == "error":
-            self.log_text.insert(tk.END, log_message, "error")
-        elif level == "warning":
-            self.log_text.insert(tk.END, log_message, "warning")
-        else:
-            self.log_text.insert(tk.END, log_message)
-        
-        # Configure text tags for colors
-        self.log_text.tag_config("error", foreground="red")
-        self.log_text.tag_config("warning", foreground="orange")
-        
-        self.log_text.config(state=tk.DISABLED)
-        self.log_text.see(tk.END)
+        """Add message to log display. Safe to call from any thread."""
+        self.log_sink.write(message, level)
     
     def clear_log(self):
         """Clear the log display."""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.log_sink.clear()
     
     def test_api(self):
         """Test the Hugging Face API connection."""
@@ -254,24 +363,103 @@ class VideoEditorGUI:
         )
         
         if file_path:
-            self.current_video_file = file_path
-            self.file_label.config(text=os.path.basename(file_path))
-            self.log(f"Selected video file: {os.path.basename(file_path)}")
-            
-            # Load video in player
             try:
-                self.video_player.load_video(file_path)
-                duration = self.video_player.get_duration()
-                self.log(f"Video loaded successfully. Duration: {format_time(duration)}")
-                self.position_scale.config(to=duration)
+                self.load_video_file(file_path)
             except Exception as e:
                 self.log(f"Error loading video: {str(e)}", "error")
     
+    def load_video_file(self, file_path):
+        """Load a video file into the player and update the display."""
+        self.current_video_file = file_path
+        self.file_label.config(text=os.path.basename(file_path))
+        self.log(f"Selected video file: {os.path.basename(file_path)}")
+        
+        # Load video in player
+        self.video_player.load_video(file_path)
+        duration = self.video_player.get_duration()
+        self.log(f"Video loaded successfully. Duration: {format_time(duration)}")
+        self.position_scale.config(to=duration)
+        self._start_filmstrip(file_path, duration)
+    
+    def _start_filmstrip(self, file_path, duration):
+        """Replace the filmstrip with one for the newly loaded video."""
+        from filmstrip import Filmstrip
+        
+        if self.filmstrip:
+            self.filmstrip.cancel()
+        self.filmstrip = Filmstrip(file_path, duration)
+        self._draw_filmstrip()
+        self.filmstrip.start(lambda: self.ui_bus.publish("filmstrip", None))
+    
+    def _draw_filmstrip(self):
+        """Fill the strip with the nearest available thumbnail for each tile."""
+        from PIL import ImageTk
+        
+        canvas = self.filmstrip_canvas
+        canvas.delete("all")
+        self._filmstrip_images = []
+        if not self.filmstrip or self.filmstrip.duration <= 0:
+            return
+        
+        width = canvas.winfo_width()
+        tile_height = canvas.winfo_height()
+        if width <= 1 or tile_height <= 1:
+            return
+        
+        sample = self.filmstrip.nearest(0)
+        if sample is None:
+            return
+        tile_width = max(1, int(tile_height * sample.width / sample.height))
+        count = max(1, width // tile_width)
+        
+        for i in range(count):
+            image = self.filmstrip.nearest((i + 0.5) * self.filmstrip.duration / count)
+            photo = ImageTk.PhotoImage(image.resize((tile_width, tile_height)))
+            self._filmstrip_images.append(photo)  # Keep a reference
+            canvas.create_image(i * width / count, 0, image=photo, anchor=tk.NW)
+    
+    def _on_filmstrip_click(self, event):
+        if self.filmstrip and self.filmstrip_canvas.winfo_width() > 1:
+            position = event.x / self.filmstrip_canvas.winfo_width() * self.filmstrip.duration
+            self.video_player.seek(max(0, min(position, self.filmstrip.duration)))
+    
+    def _show_hover_preview(self, event):
+        """Show the thumbnail nearest the hovered time, without touching the decoder."""
+        from PIL import ImageTk
+        
+        if not self.filmstrip or event.widget.winfo_width() <= 1:
+            return
+        position = max(0, min(event.x / event.widget.winfo_width(), 1)) * self.filmstrip.duration
+        image = self.filmstrip.nearest(position)
+        if image is None:
+            return
+        
+        if self._preview_window is None:
+            self._preview_window = tk.Toplevel(self.root)
+            self._preview_window.overrideredirect(True)
+            self._preview_label = tk.Label(self._preview_window, bg='black', fg='white', compound=tk.TOP)
+            self._preview_label.pack()
+        
+        photo = ImageTk.PhotoImage(image)
+        self._preview_label.config(image=photo, text=format_time(position))
+        self._preview_label.image = photo  # Keep a reference
+        x = event.x_root - image.width // 2
+        y = event.widget.winfo_rooty() - image.height - 30
+        self._preview_window.geometry(f"+{x}+{y}")
+        self._preview_window.deiconify()
+        self._preview_window.lift()
+    
+    def _hide_hover_preview(self):
+        if self._preview_window is not None:
+            self._preview_window.withdraw()
+    
     def play_video(self):
         """Play the loaded video."""
         if self.current_video_file:
             try:
+                self.video_player.set_rate(1.0)
                 self.video_player.play()
+                self._show_rate()
                 self.log("Video playback started")
             except Exception as e:
                 self.log(f"Error playing video: {str(e)}", "error")
@@ -282,6 +470,7 @@ class VideoEditorGUI:
         """Pause video playback."""
         try:
             self.video_player.pause()
+            self._show_rate()
             self.log("Video playback paused")
         except Exception as e:
             self.log(f"Error pausing video: {str(e)}", "error")
@@ -290,19 +479,77 @@ class VideoEditorGUI:
         """Stop video playback."""
         try:
             self.video_player.stop()
+            self._show_rate()
             self.log("Video playback stopped")
         except Exception as e:
             self.log(f"Error stopping video: {str(e)}", "error")
     
+    def shuttle_video(self, direction, slower=False):
+        """Shuttle forwards (1) or backwards (-1); repeated presses speed up, Shift slows down."""
+        if not self.current_video_file:
+            return
+        try:
+            if slower:
+                self.video_player.shuttle_slower(direction)
+            else:
+                self.video_player.shuttle(direction)
+            self._show_rate()
+        except Exception as e:
+            self.log(f"Error changing playback speed: {str(e)}", "error")
+    
+    def step_video(self, frames):
+        """Pause and step by a number of frames."""
+        if not self.current_video_file:
+            return
+        try:
+            self.video_player.step(frames)
+            self._show_rate()
+        except Exception as e:
+            self.log(f"Error stepping video: {str(e)}", "error")
+    
+    def _transport_key(self, action, *args):
+        # Leave typing in the time and option fields alone
+        if isinstance(self.root.focus_get(), (tk.Entry, ttk.Entry, ttk.Combobox)):
+            return
+        action(*args)
+    
+    def _show_rate(self):
+        rate = self.video_player.playback_rate
+        text = f"{rate:g}x" if self.video_player.is_playing else "paused"
+        self.rate_label.config(text=text)
+    
     def on_position_change(self, position, duration):
         """Update position display when video position changes."""
+        self.ui_bus.publish("position", (position, duration))
+    
+    def _apply_position(self, value):
+        """Apply the latest published position to the label and scale."""
+        position, duration = value
         self.position_label.config(text=f"{format_time(position)} / {format_time(duration)}")
-        self.position_scale.set(position)
+        if self._dragging_scale:
+            # The user is holding the slider; don't pull it out from under them
+            return
+        # Setting the scale fires its command; don't treat that as a user seek
+        self._updating_scale = True
+        try:
+            self.position_scale.set(position)
+        finally:
+            self._updating_scale = False
+    
+    def _set_scale_drag(self, dragging):
+        self._dragging_scale = dragging
+        if not dragging:
+            # Positions published during the drag are older than where the user let go
+            self.ui_bus.discard("position")
     
     def on_scale_change(self, value):
         """Handle position scale changes."""
+        if self._updating_scale:
+            return
         try:
             position = float(value)
+            # Positions queued before this seek would snap the slider back
+            self.ui_bus.discard("position")
             self.video_player.seek(position)
         except Exception as e:
             self.log(f"Error seeking video: {str(e)}", "error")
@@ -329,14 +576,14 @@ class VideoEditorGUI:
             
             # Transcribe audio
             command = self.audio_processor.transcribe_audio(audio_file)
-            self.transcribed_command.set(command)
+            self.ui_bus.publish("transcribed", command)
             self.log(f"Transcribed command: '{command}'")
             
             # Parse time codes from command
             start_time, end_time = self.audio_processor.parse_time_codes(command)
             if start_time is not None and end_time is not None:
-                self.start_time.set(str(start_time))
-                self.end_time.set(str(end_time))
+                self.ui_bus.publish("start_time", str(start_time))
+                self.ui_bus.publish("end_time", str(end_time))
                 self.log(f"Parsed time codes: {start_time}s to {end_time}s")
             else:
                 self.log("Could not parse time codes from command. Use manual input or try again.", "warning")
@@ -345,11 +592,11 @@ class VideoEditorGUI:
             if os.path.exists(audio_file):
                 os.remove(audio_file)
             
-            self.root.after(0, lambda: self.status_label.config(text="Ready"))
+            self.ui_bus.publish("status", "Ready")
             
         except Exception as e:
             self.log(f"Voice recording error: {str(e)}", "error")
-            self.root.after(0, lambda: self.status_label.config(text="Error"))
+            self.ui_bus.publish("status", "Error")
     
     def set_current_as_start(self):
         """Set current video position as start time."""
@@ -375,6 +622,41 @@ class VideoEditorGUI:
         else:
             self.log("No video file loaded", "warning")
     
+    def set_markers(self, start=None, end=None):
+        """Set the start and/or end markers in seconds."""
+        if start is not None:
+            self.start_time.set(str(validate_time_input(str(start))))
+        if end is not None:
+            self.end_time.set(str(validate_time_input(str(end))))
+    
+    def get_automation_status(self):
+        """Snapshot of editor state for the automation API."""
+        def marker(var):
+            try:
+                return validate_time_input(var.get())
+            except ValueError:
+                return None
+        
+        return {
+            "video": self.current_video_file,
+            "duration": self.video_player.get_duration() if self.current_video_file else 0,
+            "position": self.video_player.get_position() if self.current_video_file else 0,
+            "playing": self.video_player.is_playing,
+            "start": marker(self.start_time),
+            "end": marker(self.end_time),
+        }
+    
+    def start_automation_api(self, port=8770, token=None):
+        """Start the local automation API server."""
+        from automation_api import AutomationServer
+        self.automation_server = AutomationServer(self, port=port, token=token)
+        port = self.automation_server.start()
+        self.log(f"Automation API listening on http://127.0.0.1:{port}")
+        if not token:
+            self.log(f"Automation API token: {self.automation_server.token}")
+        self.log(f"Automation API exports go to {self.automation_server.export_dir}")
+        return port
+    
     def cut_and_save_video(self):
         """Cut and save the video based on time markers."""
         if not self.current_video_file:
@@ -413,13 +695,20 @@ class VideoEditorGUI:
         self.status_label.config(text="Processing...")
         self.progress_var.set(0)
         
+        try:
+            target = self.loudness_target.get().strip()
+            self.video_processor.loudness_target = None if target.lower() in ("", "off") else float(target)
+        except ValueError:
+            self.log(f"Invalid loudness target: '{self.loudness_target.get()}'", "error")
+            return
+        
         threading.Thread(target=self._cut_video_thread, args=(start, end, output_path), daemon=True).start()
     
     def _cut_video_thread(self, start_time, end_time, output_path):
         """Cut video in separate thread."""
         try:
             def progress_callback(progress):
-                self.root.after(0, lambda: self.progress_var.set(progress * 100))
+                self.ui_bus.publish("progress", progress * 100)
             
             success = self.video_processor.edit_video(
                 self.current_video_file, 
@@ -431,14 +720,14 @@ class VideoEditorGUI:
             
             if success:
                 self.log(f"Video saved successfully: {os.path.basename(output_path)}")
-                self.root.after(0, lambda: messagebox.showinfo("Success", f"Video saved to:\n{output_path}"))
+                self.ui_bus.call_after_flush(messagebox.showinfo, "Success", f"Video saved to:\n{output_path}")
             else:
                 self.log("Video processing failed", "error")
             
-            self.root.after(0, lambda: self.status_label.config(text="Ready"))
-            self.root.after(0, lambda: self.progress_var.set(0))
+            self.ui_bus.publish("status", "Ready")
+            self.ui_bus.publish("progress", 0)
             
         except Exception as e:
             self.log(f"Video processing error: {str(e)}", "error")
-            self.root.after(0, lambda: self.status_label.config(text="Error"))
-            self.root.after(0, lambda: self.progress_var.set(0))
+            self.ui_bus.publish("status", "Error")
+            self.ui_bus.publish("progress", 0)
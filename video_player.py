@@ -1,16 +1,21 @@
-import cv2
 import tkinter as tk
-from PIL import Image, ImageTk
 import threading
 import time
+from memory_governor import PRIORITY_PLAYBACK, governor
+from perf_trace import tracer
+
+# Shuttle speeds, applied forwards or in reverse
+RATE_LADDER = [0.25, 0.5, 1.0, 2.0, 4.0, 8.0]
 
 class VideoPlayer:
-    def __init__(self, parent_frame, position_callback=None):
+    def __init__(self, parent_frame, position_callback=None, audio_enabled=True):
         self.parent_frame = parent_frame
         self.position_callback = position_callback
+        self.audio_enabled = audio_enabled
+        self.audio = None
         
         # Video properties
-        self.cap = None
+        self.decoder = None
         self.video_path = None
         self.fps = 30
         self.total_frames = 0
@@ -20,6 +25,26 @@ class VideoPlayer:
         # Playback control
         self.is_playing = False
         self.playback_thread = None
+        self._display_pending = False
+        self._pending_frame = None
+        self._presented_bytes = 0
+        # The frame waiting for the Tk thread plus the one on screen; needed for playback, so never shrunk
+        self._frames_pool = governor.register("player.frames", PRIORITY_PLAYBACK)
+        self._decoder_lock = threading.RLock()
+        self._display_size = (640, 480)
+        
+        # Master clock reference: position and monotonic time at play/seek
+        self._clock_position = 0.0
+        self._clock_started = 0.0
+        self._seek_generation = 0
+        self._audio_ended = False
+        
+        # Shuttle state: negative rates play in reverse from the GOP cache
+        self.playback_rate = 1.0
+        self.gop_cache = None
+        self.keyframe_indices = []
+        self._decoder_dirty = False  # decoder read position no longer follows current_frame
+        self.prefetcher = None
         
         # Create video display label
         self.video_label = tk.Label(parent_frame, bg='black')
@@ -36,69 +61,174 @@ class VideoPlayer:
     def load_video(self, video_path):
         """Load a video file."""
         try:
+            from decode_backends import open_decoder
+            
             # Release previous video if any
-            if self.cap:
-                self.cap.release()
+            self._stop_playback()
+            self._close_media()
             
             self.video_path = video_path
-            self.cap = cv2.VideoCapture(video_path)
-            
-            if not self.cap.isOpened():
-                raise Exception("Could not open video file")
+            # Fastest backend for this codec and resolution
+            decoder = open_decoder(video_path)
+            with self._decoder_lock:
+                self.decoder = decoder
+            if not self.decoder.reads_ahead:
+                # Path-based decoders read the file themselves; keep the page cache ahead of them
+                from source_io import Prefetcher
+                self.prefetcher = Prefetcher(video_path)
             
             # Get video properties
-            self.fps = self.cap.get(cv2.CAP_PROP_FPS)
-            self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            self.duration = self.total_frames / self.fps if self.fps > 0 else 0
+            self.fps = self.decoder.fps
+            self.total_frames = self.decoder.frame_count
+            self.duration = self.decoder.duration
             
             # Reset position
             self.current_frame = 0
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.decoder.seek_frame(0)
+            self.playback_rate = 1.0
+            self._decoder_dirty = False
+            
+            # Backward motion is served from whole decoded GOPs
+            from gop_cache import GOPCache
+            self.keyframe_indices = []
+            self.gop_cache = GOPCache(self._cache_decoder_opener(video_path), self._prepare_frame, self.total_frames)
+            threading.Thread(target=self._probe_keyframes, args=(video_path, self.gop_cache), daemon=True).start()
             
             # Display first frame
             self.display_current_frame()
             
+            # Preview audio is optional; without it playback follows the wall clock
+            if self.audio_enabled:
+                self._open_audio()
+            
             return True
             
         except Exception as e:
             raise Exception(f"Failed to load video: {str(e)}")
     
+    def _open_audio(self):
+        """Open preview audio output if a device is available."""
+        from audio_playback import AudioPlayback
+        
+        if not AudioPlayback.available():
+            return
+        try:
+            self.audio = AudioPlayback()
+            self.audio.open(self.decoder)
+        except Exception as e:
+            print(f"Preview audio not available: {e}")
+            self.audio = None
+    
+    def _cache_decoder_opener(self, video_path):
+        """Opener for the GOP cache's own decoder: same backend and probe results as the player's."""
+        backend_class = type(self.decoder)
+        info = self.decoder.probe()
+        
+        def open_decoder():
+            decoder = backend_class()
+            decoder.open(video_path, info)
+            return decoder
+        return open_decoder
+    
+    def _probe_keyframes(self, video_path, gop_cache):
+        """Find keyframe positions in the background so GOP blocks match the stream."""
+        from utils import probe_keyframes
+        
+        try:
+            # Keyframe times are relative to the stream start, like frame indices
+            indices = [int(round(t * self.fps)) for t in probe_keyframes(video_path)]
+        except Exception:
+            return
+        if gop_cache is self.gop_cache and indices:
+            self.keyframe_indices = sorted(set(indices))
+            gop_cache.set_keyframes(indices)
+    
     def display_current_frame(self):
-        """Display the current frame."""
-        if not self.cap:
+        """Decode and display the frame at the current read position."""
+        self._update_display_size()
+        if not self.decoder:
             return
         
-        ret, frame = self.cap.read()
-        if ret:
-            # Convert BGR to RGB
+        with self._decoder_lock:
+            with tracer.span("player.decode", "player"):
+                frame = self.decoder.read_frame()
+        if frame is not None:
+            self._present(self._prepare_frame(frame), self.current_frame)
+    
+    def _prepare_frame(self, frame):
+        """Convert a decoded BGR frame to a display-sized RGB frame."""
+        import cv2
+        
+        # Convert BGR to RGB
+        with tracer.span("player.convert", "player"):
             frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Resize frame to fit display
-            frame_resized = self.resize_frame(frame_rgb)
-            
-            # Convert to PhotoImage
-            image = Image.fromarray(frame_resized)
+        
+        # Resize frame to fit display
+        with tracer.span("player.resize", "player"):
+            return self.resize_frame(frame_rgb)
+    
+    def _present(self, frame_rgb, frame_index):
+        """Show a prepared frame. Must run on the Tk thread."""
+        from PIL import Image, ImageTk
+        
+        # Convert to PhotoImage and update label
+        with tracer.span("player.blit", "player"):
+            image = Image.fromarray(frame_rgb)
             photo = ImageTk.PhotoImage(image)
-            
-            # Update label
             self.video_label.config(image=photo, text="")
             self.video_label.image = photo  # Keep a reference
-            
-            # Update position callback
-            if self.position_callback:
-                position = self.current_frame / self.fps if self.fps > 0 else 0
-                self.position_callback(position, self.duration)
+        tracer.frame_presented()
+        # The frame array (shared by the PIL image) and Tk's copy in the PhotoImage
+        self._presented_bytes = frame_rgb.nbytes * 2
+        self._report_frames()
+        
+        # Update position callback
+        if self.position_callback:
+            position = frame_index / self.fps if self.fps > 0 else 0
+            self.position_callback(position, self.duration)
+    
+    def _present_pending(self):
+        """Show the newest frame handed over by the playback thread."""
+        self._display_pending = False
+        self._update_display_size()
+        pending = self._pending_frame
+        self._pending_frame = None
+        if pending is not None:
+            self._present(*pending)
+    
+    def _queue_frame(self, frame_rgb, frame_index):
+        """Hand a frame to the Tk thread, replacing one that has not been shown yet."""
+        if self._display_pending:
+            # The previous frame has not been shown yet, so the UI is behind
+            tracer.count("player.dropped_frames")
+            self._pending_frame = (frame_rgb, frame_index)
+            return
+        self._pending_frame = (frame_rgb, frame_index)
+        self._display_pending = True
+        self._report_frames()
+        self.parent_frame.after(0, self._present_pending)
+    
+    def _report_frames(self):
+        """Tell the memory governor how much the pending and presented frames hold."""
+        pending = self._pending_frame
+        self._frames_pool.report(self._presented_bytes + (pending[0].nbytes if pending else 0))
+    
+    def _update_display_size(self):
+        """Cache the display area size for use off the Tk thread."""
+        width = self.parent_frame.winfo_width()
+        height = self.parent_frame.winfo_height()
+        if width > 1 and height > 1 and (width, height) != self._display_size:
+            self._display_size = (width, height)
+            # Cached frames were prepared for the old size
+            if self.gop_cache:
+                self.gop_cache.clear()
     
     def resize_frame(self, frame):
         """Resize frame to fit the display area while maintaining aspect ratio."""
-        # Get display area size
-        display_width = self.parent_frame.winfo_width()
-        display_height = self.parent_frame.winfo_height()
+        import cv2
         
-        if display_width <= 1 or display_height <= 1:
-            # Use default size if window not yet rendered
-            display_width = 640
-            display_height = 480
+        # Display area size, cached on the Tk thread (640x480 until the window is rendered)
+        display_width, display_height = self._display_size
         
         # Get frame dimensions
         frame_height, frame_width = frame.shape[:2]
@@ -117,10 +247,13 @@ class VideoPlayer:
     
     def play(self):
         """Start video playback."""
-        if not self.cap:
+        if not self.decoder:
             raise Exception("No video loaded")
         
         if not self.is_playing:
+            # A loop paused a moment ago may not have exited yet; never run two
+            self._stop_playback()
+            self._reset_clock(self.get_position())
             self.is_playing = True
             self.playback_thread = threading.Thread(target=self._playback_loop, daemon=True)
             self.playback_thread.start()
@@ -128,18 +261,25 @@ class VideoPlayer:
     def pause(self):
         """Pause video playback."""
         self.is_playing = False
+        if self.audio:
+            self.audio.pause()
     
     def stop(self):
         """Stop video playback and reset to beginning."""
         self.is_playing = False
-        if self.cap:
-            self.current_frame = 0
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        if self.audio:
+            self.audio.pause()
+        if self.decoder:
+            with self._decoder_lock:
+                self._seek_generation += 1
+                self._decoder_dirty = False
+                self.current_frame = 0
+                self.decoder.seek_frame(0)
             self.display_current_frame()
     
     def seek(self, position_seconds):
         """Seek to specific position in seconds."""
-        if not self.cap:
+        if not self.decoder:
             return
         
         # Calculate frame number
@@ -147,15 +287,24 @@ class VideoPlayer:
         target_frame = max(0, min(target_frame, self.total_frames - 1))
         
         # Set position
-        self.current_frame = target_frame
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
-        
-        # Display frame
-        self.display_current_frame()
+        with tracer.span("player.seek", "player"):
+            with self._decoder_lock:
+                self._seek_generation += 1
+                self._pending_frame = None
+                self._decoder_dirty = False
+                self.current_frame = target_frame
+                self._prefetch()
+                self.decoder.seek_frame(target_frame)
+                
+                # Display frame
+                self.display_current_frame()
+            
+            if self.is_playing:
+                self._reset_clock(self.get_position())
     
     def get_position(self):
         """Get current position in seconds."""
-        if not self.cap or self.fps <= 0:
+        if not self.decoder or self.fps <= 0:
             return 0
         return self.current_frame / self.fps
     
@@ -163,32 +312,227 @@ class VideoPlayer:
         """Get video duration in seconds."""
         return self.duration
     
+    def set_rate(self, rate):
+        """Set playback speed; negative values play in reverse."""
+        sign = -1 if rate < 0 else 1
+        magnitude = min(max(abs(rate), RATE_LADDER[0]), RATE_LADDER[-1])
+        self.playback_rate = sign * magnitude
+        if self.is_playing:
+            self._reset_clock(self.get_position())
+    
+    def shuttle(self, direction):
+        """J/L shuttle: start at 1x in `direction` (1 or -1), or double the speed if already going that way."""
+        if not self.video_path:
+            return
+        going = self.is_playing and (self.playback_rate > 0) == (direction > 0)
+        if going:
+            faster = [r for r in RATE_LADDER if r > abs(self.playback_rate)]
+            rate = faster[0] if faster else RATE_LADDER[-1]
+        else:
+            rate = 1.0
+        self.set_rate(direction * rate)
+        self.play()
+    
+    def shuttle_slower(self, direction):
+        """Step down the shuttle speed in `direction` (down to 0.25x)."""
+        if not self.video_path:
+            return
+        if self.is_playing and (self.playback_rate > 0) == (direction > 0):
+            slower = [r for r in RATE_LADDER if r < abs(self.playback_rate)]
+            rate = slower[-1] if slower else RATE_LADDER[0]
+        else:
+            rate = 0.5
+        self.set_rate(direction * rate)
+        self.play()
+    
+    def step(self, frames):
+        """Pause and move by a number of frames (negative steps backwards)."""
+        if not self.decoder:
+            return
+        self.pause()
+        target_frame = max(0, min(self.current_frame + frames, self.total_frames - 1))
+        if target_frame == self.current_frame:
+            return
+        
+        self._update_display_size()
+        with self._decoder_lock:
+            self._seek_generation += 1
+            if 0 < target_frame - self.current_frame <= 8 and not self._decoder_dirty:
+                # Short forward step: just keep decoding
+                for _ in range(target_frame - self.current_frame - 1):
+                    self.decoder.grab()
+                frame = self.decoder.read_frame()
+                frame = self._prepare_frame(frame) if frame is not None else None
+            else:
+                frame = self.gop_cache.get(target_frame)
+                self._decoder_dirty = True
+            self.current_frame = target_frame
+        
+        if frame is not None:
+            self._present(frame, target_frame)
+    
+    def _reset_clock(self, position):
+        """Restart the master clock (and audio, if any) at `position` seconds."""
+        self._clock_position = position
+        self._clock_started = time.monotonic()
+        self._audio_ended = False
+        if self.audio:
+            # Audio only follows normal-speed forward playback
+            if self.playback_rate == 1.0:
+                self.audio.play(position)
+            else:
+                self.audio.pause()
+    
+    def _master_clock(self):
+        """Current playback position: the audio clock when audio is playing, else wall time."""
+        now = time.monotonic()
+        if self.audio and not self._audio_ended and self.playback_rate == 1.0:
+            position = self.audio.position()
+            if self.audio.finished:
+                # Audio ended (or the file has none); continue on the wall clock from there
+                self._audio_ended = True
+                if position is not None:
+                    self._clock_position = position
+                    self._clock_started = now
+            elif position is not None:
+                return position
+            elif now - self._clock_started < 0.25:
+                # Hold the first frame briefly while audio starts
+                return self._clock_position
+        return self._clock_position + (now - self._clock_started) * self.playback_rate
+    
     def _playback_loop(self):
         """Main playback loop running in separate thread."""
         frame_time = 1.0 / self.fps if self.fps > 0 else 1.0 / 30
+        decoder = self.decoder
         
-        while self.is_playing and self.cap:
-            start_time = time.time()
+        while self.is_playing and decoder is not None and self.decoder is decoder:
+            generation = self._seek_generation
+            rate = self.playback_rate
+            clock = self._master_clock()
+            target_frame = int(clock / frame_time)
+            
+            # Check if we've reached either end
+            if target_frame >= self.total_frames or clock < 0:
+                self.is_playing = False
+                if self.audio:
+                    self.audio.pause()
+                break
+            
+            # Ahead of the clock: keep showing the current frame
+            if (rate > 0 and target_frame <= self.current_frame) or (rate < 0 and target_frame >= self.current_frame):
+                boundary = (self.current_frame + 1) * frame_time if rate > 0 else self.current_frame * frame_time
+                wait = abs(boundary - clock) / abs(rate)
+                time.sleep(min(max(wait, 0.001), frame_time))
+                continue
+            
+            if rate < 0:
+                frame = self._reverse_frame(generation, target_frame)
+            else:
+                frame = self._forward_frame(generation, target_frame)
             
-            # Check if we've reached the end
-            if self.current_frame >= self.total_frames - 1:
+            if frame is False:
+                # A seek landed since the target was computed; start over from the new position
+                continue
+            if frame is None:
                 self.is_playing = False
                 break
             
-            # Move to next frame
-            self.current_frame += 1
+            self._queue_frame(frame, target_frame)
+    
+    def _forward_frame(self, generation, target_frame):
+        """Decode forward to target_frame and return it prepared for display."""
+        with self._decoder_lock:
+            if generation != self._seek_generation:
+                return False
+            
+            if self._decoder_dirty:
+                self.decoder.seek_frame(self.current_frame + 1)
+                self._decoder_dirty = False
             
-            # Display frame (need to use after() for thread-safe GUI updates)
-            self.parent_frame.after(0, self.display_current_frame)
+            skip = target_frame - self.current_frame - 1
+            keyframe = self._keyframe_before(target_frame)
+            if skip > 0 and keyframe is not None and keyframe > self.current_frame + 1:
+                # Fast forward: jump straight to the last keyframe instead of decoding the GOPs between
+                self.decoder.seek_frame(keyframe)
+                tracer.count("player.dropped_frames", keyframe - self.current_frame - 1)
+                skip = target_frame - keyframe
             
-            # Control playback speed
-            elapsed = time.time() - start_time
-            sleep_time = max(0, frame_time - elapsed)
-            time.sleep(sleep_time)
+            # Behind the clock: skip frames without converting them to pixels
+            for _ in range(skip):
+                self.decoder.grab()
+                tracer.count("player.dropped_frames")
+            with tracer.span("player.decode", "player"):
+                frame = self.decoder.read_frame()
+            self.current_frame = target_frame
+        self._prefetch()
+        
+        # Convert off the Tk thread; only the blit happens there
+        return self._prepare_frame(frame) if frame is not None else None
+    
+    def _reverse_frame(self, generation, target_frame):
+        """Serve target_frame from the decoded-GOP cache (which decodes with its own decoder)."""
+        gop_cache = self.gop_cache
+        if generation != self._seek_generation or gop_cache is None:
+            return False
+        # Not under the decoder lock: a block decode on a miss must not hold up seeks
+        with tracer.span("player.gop_cache", "player"):
+            frame = gop_cache.get(target_frame)
+        with self._decoder_lock:
+            if generation != self._seek_generation:
+                return False
+            skipped = self.current_frame - target_frame - 1
+            if skipped > 0:
+                tracer.count("player.dropped_frames", skipped)
+            # The player's decoder no longer sits right after current_frame
+            self._decoder_dirty = True
+            self.current_frame = target_frame
+        return frame
+    
+    def _prefetch(self):
+        """Tell the prefetcher roughly where in the file the decoder is reading."""
+        if self.prefetcher and self.total_frames > 0:
+            self.prefetcher.update(self.current_frame / self.total_frames)
+    
+    def _keyframe_before(self, frame_index):
+        """Last known keyframe at or before frame_index, or None."""
+        import bisect
+        
+        keyframes = self.keyframe_indices
+        position = bisect.bisect_right(keyframes, frame_index) - 1
+        return keyframes[position] if position >= 0 else None
+    
+    def _stop_playback(self):
+        """Stop playback and wait for the playback thread to finish its current frame."""
+        self.is_playing = False
+        thread = self.playback_thread
+        if thread and thread is not threading.current_thread():
+            # Bounded: the thread may be waiting for the Tk thread to accept a frame
+            thread.join(timeout=1.0)
+        self.playback_thread = None
+    
+    def _close_media(self):
+        """Close the decoder, GOP cache, prefetcher and audio; playback must be stopped first."""
+        with self._decoder_lock:
+            # Anything still holding a generation from before gives up instead of decoding
+            self._seek_generation += 1
+            if self.audio:
+                self.audio.close()
+                self.audio = None
+            if self.decoder:
+                self.decoder.close()
+                self.decoder = None
+            if self.prefetcher:
+                self.prefetcher.close()
+                self.prefetcher = None
+            if self.gop_cache:
+                self.gop_cache.close()
+                self.gop_cache = None
     
     def release(self):
         """Release video resources."""
-        self.is_playing = False
-        if self.cap:
-            self.cap.release()
-            self.cap = None
+        self._stop_playback()
+        self._close_media()
+        self._pending_frame = None
+        self._presented_bytes = 0
+        self._frames_pool.report(0)
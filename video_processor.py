@@ -1,35 +1,102 @@
 import os
-from moviepy.video.io.VideoFileClip import VideoFileClip
 import tempfile
+from perf_trace import tracer
+
+# Decoded frames an export holds at once (reader buffer, clip, encoder pipe)
+EXPORT_BUFFER_FRAMES = 8
+
+def encode_progress_logger(callback):
+    """
+    MoviePy (proglog) logger that reports the fraction of frames written.
+
+    The callback runs for every encoded frame, so raising from it aborts the
+    encode straight away (used to cancel exports).
+    """
+    from proglog import ProgressBarLogger
+    
+    class EncodeProgressLogger(ProgressBarLogger):
+        def bars_callback(self, bar, attr, value, old_value=None):
+            # The video frame bar is "t" in MoviePy 1.x and "frame_index" in 2.x; audio chunks are ignored
+            if bar in ("t", "frame_index") and attr == "index":
+                total = self.bars[bar].get("total")
+                if total:
+                    callback(min(value / total, 1.0))
+    
+    return EncodeProgressLogger()
 
 class VideoProcessor:
-    def __init__(self):
-        pass
+    def __init__(self, render_workers=None, loudness_target=None, max_true_peak=-1.0):
+        # URLs of render_farm workers; when set, exports are distributed
+        self.render_workers = render_workers or []
+        # Integrated loudness (LUFS) to normalize exports to, or None to leave audio as is
+        self.loudness_target = loudness_target
+        self.max_true_peak = max_true_peak
+        self._loudness_analyzer = None
+    
+    def loudness_gain(self, input_video, start_time, end_time):
+        """Gain in dB that brings the cut to the loudness target (0 when disabled)."""
+        if self.loudness_target is None:
+            return 0.0
+        
+        from loudness import LoudnessAnalyzer, normalization_gain
+        
+        if self._loudness_analyzer is None:
+            self._loudness_analyzer = LoudnessAnalyzer()
+        with tracer.span("processor.loudness", "processor"):
+            measurement = self._loudness_analyzer.measure(input_video, start_time, end_time)
+        return normalization_gain(measurement, self.loudness_target, self.max_true_peak)
+    
+    def close(self):
+        """Release the loudness analyzer's cached measurements."""
+        if self._loudness_analyzer is not None:
+            self._loudness_analyzer.close()
+            self._loudness_analyzer = None
     
     def edit_video(self, input_video, start_time, end_time, output_path, progress_callback=None):
         """Cut video segment and save as new MP4 file."""
+        if self.render_workers:
+            return self.edit_video_distributed(input_video, start_time, end_time, output_path, progress_callback)
+        
         video = None
         edited_video = None
         
         try:
+            # MoviePy is heavy to import, so load it on first export
+            from moviepy.video.io.VideoFileClip import VideoFileClip
+            from decode_backends import probe
+            from utils import validate_time_range
+            
+            # Validate time codes against the same duration the player shows
+            info = probe(input_video)
+            validate_time_range(start_time, end_time, info["duration"])
+            
             # Load video
             if progress_callback:
                 progress_callback(0.1)
             
-            video = VideoFileClip(input_video)
-            
-            # Validate time codes
-            if start_time < 0 or end_time <= start_time:
-                raise Exception("Invalid time codes")
-            
-            if end_time > video.duration:
-                raise Exception(f"End time {end_time}s exceeds video duration {video.duration:.1f}s")
+            with tracer.span("processor.open", "processor"):
+                # Network sources are copied to the local staging cache with large sequential reads
+                # first, when the cut covers most of the file
+                from source_io import local_source
+                
+                def staging_progress(fraction):
+                    if progress_callback:
+                        progress_callback(0.1 + 0.1 * fraction)
+                
+                source = local_source(input_video, start_time, end_time, info["duration"], staging_progress)
+                video = VideoFileClip(source)
             
             if progress_callback:
                 progress_callback(0.2)
             
-            # Create video clip
-            edited_video = video.subclip(start_time, end_time)
+            # Create video clip; MoviePy's own duration can be a frame short of the probed one
+            edited_video = video.subclip(start_time, min(end_time, video.duration))
+            
+            # Apply loudness normalization in the same encode pass; measured on the staged copy if there is one
+            if video.audio is not None:
+                gain_db = self.loudness_gain(source, start_time, end_time)
+                if gain_db:
+                    edited_video = edited_video.volumex(10 ** (gain_db / 20))
             
             if progress_callback:
                 progress_callback(0.3)
@@ -41,16 +108,21 @@ class VideoProcessor:
                     mapped_progress = 0.3 + (progress * 0.7)
                     progress_callback(mapped_progress)
             
-            # Write the video file
-            edited_video.write_videofile(
-                output_path,
-                codec="libx264",
-                audio_codec="aac",
-                temp_audiofile=tempfile.mktemp(suffix='.m4a'),
-                remove_temp=True,
-                verbose=False,
-                logger=None
-            )
+            # Write the video file, first making room in the memory budget for the frames in flight
+            from memory_governor import governor
+            
+            frame_bytes = info["width"] * info["height"] * 3
+            with governor.reserve("processor.export", frame_bytes * EXPORT_BUFFER_FRAMES):
+                with tracer.span("processor.encode", "processor"):
+                    edited_video.write_videofile(
+                        output_path,
+                        codec="libx264",
+                        audio_codec="aac",
+                        temp_audiofile=tempfile.mktemp(suffix='.m4a'),
+                        remove_temp=True,
+                        verbose=False,
+                        logger=encode_progress_logger(write_progress_callback) if progress_callback else None
+                    )
             
             if progress_callback:
                 progress_callback(1.0)
@@ -74,23 +146,74 @@ class VideoProcessor:
                 except:
                     pass
     
+    def edit_video_distributed(self, input_video, start_time, end_time, output_path, progress_callback=None):
+        """Cut video segment using the configured render workers."""
+        from render_farm import RenderCoordinator
+        
+        try:
+            coordinator = RenderCoordinator(self.render_workers)
+            gain_db = self.loudness_gain(input_video, start_time, end_time)
+            with tracer.span("processor.distributed_render", "processor"):
+                return coordinator.render(input_video, start_time, end_time, output_path, progress_callback,
+                                          gain_db=gain_db)
+        except Exception as e:
+            raise Exception(f"Distributed rendering failed: {str(e)}")
+    
+    def render_timeline(self, timeline, output_path, progress_callback=None, cache=None):
+        """Render a multi-clip timeline, re-encoding only clips not already in the cache."""
+        from render_farm import concat_segments
+        from timeline import RenderCache, clip_key, render_clip
+        from utils import find_ffmpeg
+        
+        if not timeline.clips:
+            raise Exception("Timeline is empty")
+        
+        try:
+            ffmpeg = find_ffmpeg()
+            cache = cache or RenderCache()
+            output_settings = timeline.output_settings()
+            total_duration = timeline.duration
+            done_duration = 0
+            segment_paths = []
+            rendered = 0
+            
+            for clip in timeline.clips:
+                key = clip_key(clip, output_settings)
+                path = cache.get(key)
+                if path is None:
+                    with tracer.span("processor.render_clip", "processor"):
+                        path = cache.put(key, lambda temp_path: render_clip(ffmpeg, clip, output_settings, temp_path))
+                    rendered += 1
+                segment_paths.append(path)
+                
+                done_duration += clip.duration
+                if progress_callback:
+                    # Leave the last 10% for joining the segments
+                    progress_callback(0.9 * done_duration / total_duration)
+            
+            with tracer.span("processor.join", "processor"):
+                concat_segments(ffmpeg, segment_paths, output_path)
+            cache.evict(keep=segment_paths)
+            
+            if progress_callback:
+                progress_callback(1.0)
+            
+            return {"clips": len(timeline.clips), "rendered": rendered, "reused": len(timeline.clips) - rendered}
+            
+        except Exception as e:
+            raise Exception(f"Timeline rendering failed: {str(e)}")
+    
     def get_video_info(self, video_path):
         """Get basic information about a video file."""
-        video = None
+        from decode_backends import probe
+        
         try:
-            video = VideoFileClip(video_path)
-            info = {
-                'duration': video.duration,
-                'fps': video.fps,
-                'size': video.size,
-                'has_audio': video.audio is not None
+            info = probe(video_path)
+            return {
+                'duration': info['duration'],
+                'fps': info['fps'],
+                'size': [info['width'], info['height']],
+                'has_audio': info['has_audio']
             }
-            return info
         except Exception as e:
             raise Exception(f"Could not get video info: {str(e)}")
-        finally:
-            if video:
-                try:
-                    video.close()
-                except:
-                    pass